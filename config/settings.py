@@ -3,6 +3,7 @@ Django settings for UFAS-Stock project.
 نظام إدارة المخزون والممتلكات الشامل - جامعة فرحات عباس سطيف 1
 """
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,6 +38,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'core.middleware.LegacyAuthBackendMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -71,6 +73,39 @@ DATABASES = {
     }
 }
 
+# Opt-in: tenants (by code) whose inventory and transactions tables live in
+# their own SQLite file, e.g. TENANT_DATABASE_CODES=FS,FM (see core/routers.py).
+# Move their rows with "manage.py move_tenant_database <code>" when enabling one.
+TENANT_DATABASES = {
+    code: f'tenant_{code.lower()}'
+    for code in filter(None, (code.strip() for code in os.environ.get('TENANT_DATABASE_CODES', '').split(',')))
+}
+for _alias in TENANT_DATABASES.values():
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'tenant_databases' / f'{_alias}.sqlite3',
+    }
+DATABASE_ROUTERS = ['core.routers.TenantDatabaseRouter']
+
+# Dashboard and statistics cache (tenant-scoped, versioned keys - see core/cache.py)
+# Use a shared backend (e.g. Redis/Memcached) when running several worker processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ufas-stock',
+    },
+    # Report results: least recently used entries are culled beyond MAX_ENTRIES
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ufas-reports',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 500,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -90,10 +125,32 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Result files of background report jobs (kept outside MEDIA_ROOT, served by reports views only)
+REPORT_JOBS_DIR = BASE_DIR / 'report_jobs'
+
+# Rendered PDFs of confirmed vouchers, keyed by voucher type, id and updated_at
+VOUCHER_PDF_CACHE_DIR = BASE_DIR / 'pdf_cache'
+
+# Processes of the warm WeasyPrint render pool (0 renders in the calling process).
+# The pool belongs to each web/worker process: N application processes start
+# N x PDF_RENDER_WORKERS renderers, so keep it small.
+PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', 2))
+
+# Notification emails (warranty digest) are printed to the console until SMTP is configured
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'UFAS-Stock <no-reply@univ-setif.dz>'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Loads the session user with its tenant in one query, cached between requests.
+# Sessions of the former ModelBackend are moved to it by LegacyAuthBackendMiddleware.
+AUTHENTICATION_BACKENDS = ['core.backends.TenantModelBackend']
+# Seconds a session user stays cached (0 disables the cache). Saves, deletes
+# and User.objects...update() drop the entries; raw SQL does not.
+AUTH_USER_CACHE_TIMEOUT = 60 * 5
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = 'bootstrap5'
 CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Connects the signals attaching the central database (per-tenant databases)
+        from . import routers  # noqa: F401
@@ -0,0 +1,27 @@
+"""
+Authentication backend - session user and tenant in a single query
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .cache import get_cached_user
+
+
+class TenantModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the session user with select_related('tenant'),
+    so the middleware, the context processors and the views read the tenant
+    without another query. The loaded user is cached between requests
+    (AUTH_USER_CACHE_TIMEOUT) and invalidated by the user and tenant signals.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id, self.load_user)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    def load_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            return UserModel._default_manager.select_related('tenant').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
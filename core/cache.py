@@ -0,0 +1,215 @@
+"""
+Tenant-scoped caching helpers
+مساعدات التخزين المؤقت الخاصة بكل وحدة
+
+Every tenant has a data version stored in the cache. Cache keys embed the
+version, so bumping it (from the model signals) invalidates every cached
+payload of that tenant at once. The super-admin global view has its own
+version which is bumped together with any tenant; tenants moved to their
+own database (core.routers) have a global scope per database. Versions are
+bumped once the transaction of the write commits, on the database it used.
+
+Report results live in their own LRU cache ('reports' alias, bounded by
+MAX_ENTRIES), keyed by tenant, data version and the report filters.
+
+Reference data (products, categories, departments, suppliers) behind form
+choices has its own version per tenant, bumped only when those rows change.
+JSON endpoints serving it (the product picker) derive their ETag from the
+reference and data versions, so a revalidation costs no database query.
+
+The authenticated user is cached together with its tenant (see
+core.backends) and dropped when the user or the tenant changes.
+"""
+import hashlib
+import pickle
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils import timezone
+
+from .routers import current_database, get_tenant_database
+
+GLOBAL_SCOPE = 'all'
+# Reference rows without a tenant (global categories) belong to every scope
+SHARED_SCOPE = 'shared'
+DASHBOARD_TIMEOUT = 60 * 60 * 24
+REFERENCE_TIMEOUT = 60 * 60 * 24
+
+REPORT_CACHE_ALIAS = 'reports'
+REPORT_TIMEOUT = 60 * 60
+# Larger results are not cached, so one big report cannot evict all the others
+MAX_REPORT_PAYLOAD_SIZE = 1024 * 1024
+
+
+def get_global_scope(database='default'):
+    """Cache scope of the global view of a database"""
+    return GLOBAL_SCOPE if database == 'default' else f'{GLOBAL_SCOPE}:{database}'
+
+
+def get_scope(tenant):
+    """Cache scope for a tenant (or the global view when tenant is None)"""
+    if tenant is None:
+        return get_global_scope(current_database())
+    return str(getattr(tenant, 'pk', tenant))
+
+
+def _version_key(scope, kind='data'):
+    return f'{kind}-version:{scope}'
+
+
+def _get_version(scope, kind='data'):
+    key = _version_key(scope, kind)
+    version = cache.get(key)
+    if version is None:
+        # Start from a timestamp so an evicted counter never reuses old keys
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_data_version(tenant):
+    """Current data version of a tenant, initialised on first use"""
+    return _get_version(get_scope(tenant))
+
+
+def _bump(scope, kind='data'):
+    key = _version_key(scope, kind)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def bump_data_version(tenant_id, using=None):
+    """
+    Invalidate cached data of a tenant and of the global view, once the
+    transaction on `using` (the tenant's database by default) commits
+    """
+    using = using or get_tenant_database(tenant_id)
+    scopes = [get_global_scope(using)]
+    if tenant_id is not None:
+        scopes.append(get_scope(tenant_id))
+
+    def bump():
+        for scope in scopes:
+            _bump(scope)
+
+    transaction.on_commit(bump, using=using)
+
+
+def bump_reference_version(tenant_id, using=None):
+    """
+    Invalidate cached reference data of a tenant and of the global view,
+    or of every tenant for shared rows (tenant_id None, e.g. global categories)
+    """
+    using = using or get_tenant_database(tenant_id)
+    if tenant_id is not None:
+        scopes = [get_global_scope(get_tenant_database(tenant_id)), get_scope(tenant_id)]
+    else:
+        scopes = [SHARED_SCOPE]
+
+    def bump():
+        for scope in scopes:
+            _bump(scope, 'reference')
+
+    transaction.on_commit(bump, using=using)
+
+
+def _reference_version(scope):
+    return f'{_get_version(scope, "reference")}:{_get_version(SHARED_SCOPE, "reference")}'
+
+
+def get_reference_data(name, tenant, builder):
+    """Return the cached reference rows of a tenant, building them on a miss"""
+    scope = get_scope(tenant)
+    key = f'refdata:{name}:{scope}:{_reference_version(scope)}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = builder(tenant)
+        cache.set(key, rows, REFERENCE_TIMEOUT)
+    return rows
+
+
+def tenant_cache_key(prefix, tenant):
+    """Versioned cache key for a tenant-scoped payload"""
+    return f'{prefix}:{get_scope(tenant)}:{get_data_version(tenant)}'
+
+
+def get_dashboard_payload(tenant, builder):
+    """Return the cached dashboard payload, building it on a miss"""
+    # Date-relative figures (last 30 days, expiring warranties) change daily
+    key = tenant_cache_key(f'dashboard:{timezone.localdate().isoformat()}', tenant)
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder(tenant)
+        cache.set(key, payload, DASHBOARD_TIMEOUT)
+    return payload
+
+
+def filter_signature(params, keys):
+    """
+    Stable digest of the filters that affect a report: parameters not in keys
+    and empty values are ignored, and the order does not matter
+    """
+    items = sorted(
+        (key, str(params.get(key)).strip())
+        for key in keys
+        if str(params.get(key) or '').strip()
+    )
+    if not items:
+        return 'none'
+    return hashlib.sha1(urlencode(items).encode('utf-8')).hexdigest()[:16]
+
+
+def reference_etag(name, tenant, params=None, keys=()):
+    """
+    ETag of a response built from the reference data and the live figures
+    (stock) of a tenant: changes with its reference and data versions
+    """
+    scope = get_scope(tenant)
+    tag = (
+        f'{name}:{scope}:{_reference_version(scope)}:{get_data_version(tenant)}'
+        f':{filter_signature(params or {}, keys)}'
+    )
+    return f'"{hashlib.sha1(tag.encode("utf-8")).hexdigest()[:24]}"'
+
+
+def get_report_payload(name, tenant, builder, params=None, keys=()):
+    """Return the cached result of a report, building it on a miss"""
+    report_cache = caches[REPORT_CACHE_ALIAS]
+    key = f'report:{name}:{get_scope(tenant)}:{get_data_version(tenant)}:{filter_signature(params or {}, keys)}'
+    payload = report_cache.get(key)
+    if payload is None:
+        payload = builder()
+        if len(pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)) <= MAX_REPORT_PAYLOAD_SIZE:
+            report_cache.set(key, payload, REPORT_TIMEOUT)
+    return payload
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def get_cached_user(user_id, loader):
+    """Return the cached user (with its tenant), loading it on a miss"""
+    timeout = settings.AUTH_USER_CACHE_TIMEOUT
+    if not timeout:
+        return loader(user_id)
+    key = _user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = loader(user_id)
+        if user is not None:
+            cache.set(key, user, timeout)
+    return user
+
+
+def invalidate_cached_users(user_ids):
+    """Drop cached users once the transaction of the central database commits"""
+    keys = [_user_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys), using='default')
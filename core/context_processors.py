@@ -1,7 +1,7 @@
 """
 Context processors for tenant-aware templates
 """
-from .middleware import get_current_tenant
+from .routers import current_database, get_tenant_aliases, get_tenant_database
 
 
 def tenant_context(request):
@@ -9,8 +9,22 @@ def tenant_context(request):
     tenant = None
     if request.user.is_authenticated:
         tenant = getattr(request.user, 'tenant', None)
+    is_super_admin = getattr(request.user, 'is_super_admin', False) if request.user.is_authenticated else False
     
     return {
         'current_tenant': tenant,
-        'is_super_admin': getattr(request.user, 'is_super_admin', False) if request.user.is_authenticated else False,
+        'is_super_admin': is_super_admin,
+        'separate_database_tenants': separate_database_tenants if is_super_admin else (),
     }
+
+
+def separate_database_tenants():
+    """Tenants missing from the global view: their data is in another database"""
+    from .models import Tenant
+    if not get_tenant_aliases():
+        return []
+    database = current_database()
+    return [
+        name for pk, name in Tenant.objects.values_list('pk', 'name')
+        if get_tenant_database(pk) != database
+    ]
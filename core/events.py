@@ -0,0 +1,107 @@
+"""
+Live change events for Server-Sent Events streams
+أحداث التغيير المباشرة لبث الأحداث إلى المتصفح
+
+Events are published from synchronous code (views, signals) and fanned out
+to the asyncio queues of the SSE connections of the same tenant. The
+super-admin global stream receives the events of every tenant.
+
+LocalBroadcaster keeps subscribers in process memory, which is enough for a
+single ASGI worker. With several workers, point EVENTS_BROADCASTER to a
+class with the same publish()/subscribe() interface backed by a shared
+pub/sub (e.g. Redis) - LocalBroadcaster is its in-process stand-in.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .cache import get_global_scope, get_scope
+from .routers import get_tenant_database
+
+QUEUE_SIZE = 100
+
+
+class LocalBroadcaster:
+    """In-process fan-out of events to the subscribed SSE connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, tenant):
+        """Register a new connection, returns its queue"""
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        subscriber = (queue, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(get_scope(tenant), set()).add(subscriber)
+        return queue
+
+    def unsubscribe(self, tenant, queue):
+        scope = get_scope(tenant)
+        with self._lock:
+            subscribers = self._subscribers.get(scope, set())
+            for subscriber in list(subscribers):
+                if subscriber[0] is queue:
+                    subscribers.discard(subscriber)
+            if not subscribers:
+                self._subscribers.pop(scope, None)
+
+    def publish(self, tenant_id, message):
+        """Deliver a message to the tenant streams and the global stream of its database"""
+        scopes = [get_global_scope(get_tenant_database(tenant_id))]
+        if tenant_id is not None:
+            scopes.append(get_scope(tenant_id))
+        with self._lock:
+            subscribers = [s for scope in scopes for s in self._subscribers.get(scope, ())]
+        for queue, loop in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, message)
+
+    @staticmethod
+    def _deliver(queue, message):
+        # Slow clients drop events rather than growing memory without bound
+        if not queue.full():
+            queue.put_nowait(message)
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    """The configured broadcaster (LocalBroadcaster by default)"""
+    global _broadcaster
+    if _broadcaster is None:
+        path = getattr(settings, 'EVENTS_BROADCASTER', 'core.events.LocalBroadcaster')
+        _broadcaster = import_string(path)()
+    return _broadcaster
+
+
+def publish_event(tenant_id, event, using=None, **data):
+    """
+    Publish an event once the transaction on `using` (the tenant's database
+    by default) has been committed
+    """
+    message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    transaction.on_commit(
+        lambda: get_broadcaster().publish(tenant_id, message),
+        using=using or get_tenant_database(tenant_id),
+    )
+
+
+def publish_stock_change(product, old_quantity):
+    """Publish stock_changed, plus low_stock when the minimum threshold is crossed"""
+    if product.stock_quantity == old_quantity:
+        return
+    publish_event(
+        product.tenant_id, 'stock_changed', using=product._state.db,
+        product_id=product.pk, stock_quantity=product.stock_quantity,
+    )
+    if product.nature == 'consumable' and product.stock_quantity <= product.min_stock < old_quantity:
+        publish_event(
+            product.tenant_id, 'low_stock', using=product._state.db,
+            product_id=product.pk, name=product.name,
+            stock_quantity=product.stock_quantity, min_stock=product.min_stock,
+        )
@@ -0,0 +1,102 @@
+"""
+Management command to move a tenant's inventory and transactions rows from
+the central database into the tenant's own SQLite database (see
+core/routers.py). The tenant database is migrated first, rows are copied
+model by model in primary key order with bulk inserts inside one
+transaction, and the copy is checked by counting rows. The central rows are
+deleted only with --purge.
+
+Run it while the application is stopped, after adding the tenant code to
+TENANT_DATABASE_CODES.
+"""
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers import sort_dependencies
+from django.db import connections, transaction
+
+from core.models import Tenant
+from core.routers import ROUTED_APPS, is_routed
+
+COPY_BATCH_SIZE = 1000
+
+
+def routed_models():
+    """Models stored in the tenant databases, parents before children"""
+    app_list = [
+        (apps.get_app_config(label), [model for model in apps.get_app_config(label).get_models() if is_routed(model)])
+        for label in sorted(ROUTED_APPS)
+    ]
+    return sort_dependencies(app_list, allow_cycles=True)
+
+
+def tenant_lookup(model):
+    """Lookup from a routed model to the id of the tenant owning its rows"""
+    fields = model._meta.concrete_fields
+    if any(field.name == 'tenant' for field in fields):
+        return 'tenant_id'
+    for field in fields:
+        if field.many_to_one and field.related_model is not model and is_routed(field.related_model):
+            return f'{field.name}__{tenant_lookup(field.related_model)}'
+    raise CommandError(f'{model._meta.label} has no path to a tenant')
+
+
+class Command(BaseCommand):
+    help = "Copy a tenant's inventory and transactions into its own SQLite database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('code', help='Tenant code, listed in TENANT_DATABASE_CODES')
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Delete the copied rows from the central database',
+        )
+
+    def handle(self, *args, **options):
+        code = options['code']
+        try:
+            tenant = Tenant.objects.using('default').get(code=code)
+        except Tenant.DoesNotExist:
+            raise CommandError(f'No tenant with code {code}')
+        alias = settings.TENANT_DATABASES.get(code)
+        if alias is None:
+            raise CommandError(f'Add {code} to TENANT_DATABASE_CODES first')
+
+        Path(settings.DATABASES[alias]['NAME']).parent.mkdir(parents=True, exist_ok=True)
+        call_command('migrate', database=alias, verbosity=0)
+        # The schema editor turns the foreign key checks back on: reconnect
+        connections[alias].close()
+
+        models = routed_models()
+        for model in models:
+            if model._base_manager.using(alias).exists():
+                raise CommandError(f'{alias} already holds {model._meta.label} rows')
+
+        with transaction.atomic(using=alias):
+            for model in models:
+                rows = model._base_manager.using('default').filter(**{tenant_lookup(model): tenant.pk}).order_by('pk')
+                batch = []
+                for row in rows.iterator(chunk_size=COPY_BATCH_SIZE):
+                    batch.append(row)
+                    if len(batch) == COPY_BATCH_SIZE:
+                        model._base_manager.using(alias).bulk_create(batch)
+                        batch = []
+                if batch:
+                    model._base_manager.using(alias).bulk_create(batch)
+
+                copied = model._base_manager.using(alias).count()
+                expected = rows.count()
+                if copied != expected:
+                    raise CommandError(f'{model._meta.label}: copied {copied} rows of {expected}')
+                self.stdout.write(f'  {model._meta.label}: {copied}')
+
+        if options['purge']:
+            with transaction.atomic(using='default'):
+                for model in reversed(models):
+                    model._base_manager.using('default').filter(**{tenant_lookup(model): tenant.pk}).delete()
+            self.stdout.write('Central rows deleted')
+
+        self.stdout.write(self.style.SUCCESS(f'{tenant.code} moved to {alias}'))
@@ -5,6 +5,7 @@ For consumables: sums all StockMovement quantities.
 """
 from django.core.management.base import BaseCommand
 from django.db.models import Sum
+from core.routers import each_tenant_database
 from inventory.models import Product
 
 
@@ -25,20 +26,35 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         if options['asset_only']:
-            products = Product.objects.filter(nature='asset')
+            filters = {'nature': 'asset'}
             product_type = 'asset'
         elif options['consumable_only']:
-            products = Product.objects.filter(nature='consumable')
+            filters = {'nature': 'consumable'}
             product_type = 'consumable'
         else:
-            products = Product.objects.all()
+            filters = {}
             product_type = 'all'
 
-        total = products.count()
+        total = 0
         updated = 0
 
-        self.stdout.write(f'Processing {total} {product_type} products...')
+        self.stdout.write(f'Processing {product_type} products...')
 
+        # Routed tenants keep their products in their own database
+        for context in each_tenant_database():
+            with context:
+                products = Product.objects.filter(**filters)
+                total += products.count()
+                updated += self.recalculate(products)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Finished: {updated} of {total} products updated.'
+            )
+        )
+
+    def recalculate(self, products):
+        updated = 0
         for product in products:
             old_quantity = product.stock_quantity
 
@@ -58,9 +74,4 @@ class Command(BaseCommand):
                 self.stdout.write(
                     f'  {product.name}: {old_quantity} -> {new_quantity}'
                 )
-
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Finished: {updated} of {total} products updated.'
-            )
-        )
+        return updated
@@ -0,0 +1,110 @@
+"""
+Management command to send the daily expiring-warranty digest.
+Every tenant's list is built from a single query over the warranty_end index
+(one per database when tenants have their own), grouped by tenant in Python,
+and mailed to the tenant address and its admins and store managers through
+the configured email backend (console by default, or files with
+--output-dir).
+"""
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.models import Tenant, User
+from core.routers import each_tenant_database
+from core.statistics import WARRANTY_HORIZON_DAYS, expiring_warranties
+
+
+class Command(BaseCommand):
+    help = 'Email every tenant the list of warranties expiring soon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=WARRANTY_HORIZON_DAYS,
+            help='Horizon in days',
+        )
+        parser.add_argument(
+            '--output-dir',
+            help='Write the emails as files in this directory instead of using EMAIL_BACKEND',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        today = timezone.localdate()
+
+        digests = {}
+        # Routed tenants keep their items in their own database
+        for context in each_tenant_database():
+            with context:
+                rows = (
+                    expiring_warranties(days=days, today=today)
+                    .order_by('tenant_id', 'warranty_end', 'pk')
+                    .values_list(
+                        'tenant_id', 'inventory_number', 'serial_number',
+                        'product__name', 'assigned_to__name', 'warranty_end',
+                    )
+                )
+                for tenant_id, tenant_rows in groupby(rows.iterator(), key=lambda row: row[0]):
+                    digests[tenant_id] = [
+                        {
+                            'inventory_number': inventory_number,
+                            'serial_number': serial_number,
+                            'product_name': product_name,
+                            'department': department,
+                            'warranty_end': warranty_end,
+                        }
+                        for _tenant_id, inventory_number, serial_number, product_name, department, warranty_end
+                        in tenant_rows
+                    ]
+
+        if not digests:
+            self.stdout.write('No warranty expires within the horizon.')
+            return
+
+        tenants = Tenant.objects.in_bulk(list(digests))
+        recipients = {tenant_id: set() for tenant_id in digests}
+        for tenant_id, tenant in tenants.items():
+            if tenant.email:
+                recipients[tenant_id].add(tenant.email)
+        staff = User.objects.filter(
+            tenant_id__in=list(digests), role__in=['admin', 'manager'], is_active=True,
+        ).exclude(email='').values_list('tenant_id', 'email')
+        for tenant_id, email in staff:
+            recipients[tenant_id].add(email)
+
+        messages = []
+        for tenant_id, items in digests.items():
+            tenant = tenants[tenant_id]
+            if not recipients[tenant_id]:
+                self.stdout.write(self.style.WARNING(f'  {tenant.code}: {len(items)} items, no recipient'))
+                continue
+            body = render_to_string('core/emails/warranty_digest.txt', {
+                'tenant_name': tenant.name,
+                'days': days,
+                'count': len(items),
+                'items': items,
+            })
+            messages.append(EmailMessage(
+                subject=f'[UFAS-Stock] {len(items)} ضمانات تنتهي قريبا - {tenant.name}',
+                body=body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=sorted(recipients[tenant_id]),
+            ))
+            self.stdout.write(f'  {tenant.code}: {len(items)} items')
+
+        if options['output_dir']:
+            connection = get_connection(
+                'django.core.mail.backends.filebased.EmailBackend',
+                file_path=options['output_dir'],
+            )
+        else:
+            connection = get_connection()
+        sent = connection.send_messages(messages) or 0
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} warranty digests.'))
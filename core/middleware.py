@@ -1,30 +1,57 @@
 """
 Tenant middleware for multi-tenancy support
 """
-import threading
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.utils.deprecation import MiddlewareMixin
 
-_thread_locals = threading.local()
+from .tenancy import activate, deactivate
 
+# Backends that signed in sessions before TenantModelBackend
+LEGACY_AUTH_BACKENDS = {'django.contrib.auth.backends.ModelBackend'}
 
-def get_current_tenant():
-    """Get the current tenant from thread local storage"""
-    return getattr(_thread_locals, 'tenant', None)
 
+class LegacyAuthBackendMiddleware(MiddlewareMixin):
+    """
+    Middleware moving sessions signed in with a former backend to the first
+    configured one, so its users stay signed in. Must run before
+    AuthenticationMiddleware.
+    """
 
-def get_current_user():
-    """Get the current user from thread local storage"""
-    return getattr(_thread_locals, 'user', None)
+    def process_request(self, request):
+        if request.session.get(BACKEND_SESSION_KEY) in LEGACY_AUTH_BACKENDS:
+            request.session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
 
 
 class TenantMiddleware:
-    """Middleware to set the current tenant based on the logged-in user"""
-    
+    """
+    Middleware to set the tenant context of the request from the logged-in
+    user (see core.tenancy). Works for sync and async views; the context is
+    restored when the response is returned.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-    
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
     def __call__(self, request):
-        _thread_locals.user = request.user if request.user.is_authenticated else None
-        _thread_locals.tenant = getattr(request.user, 'tenant', None) if request.user.is_authenticated else None
-        
-        response = self.get_response(request)
-        return response
+        if self.async_mode:
+            return self.__acall__(request)
+        tokens = activate(request.user)
+        try:
+            return self.get_response(request)
+        finally:
+            deactivate(tokens)
+
+    async def __acall__(self, request):
+        tokens = activate(await request.auser())
+        try:
+            return await self.get_response(request)
+        finally:
+            deactivate(tokens)
@@ -3,7 +3,9 @@ Core models - Users and Tenants (Multi-tenancy)
 نماذج المستخدمين والمستأجرين
 """
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
 
 
 class Tenant(models.Model):
@@ -35,6 +37,20 @@ class Tenant(models.Model):
         return f"{self.name} ({self.code})"
 
 
+class UserQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        # Bulk updates (e.g. deactivating users) skip the save signals:
+        # drop the cached session users here
+        from core.cache import invalidate_cached_users
+        invalidate_cached_users(list(self.values_list('pk', flat=True)))
+        return super().update(**kwargs)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     """المستخدم المخصص مع دعم تعدد المستأجرين"""
     
@@ -57,6 +73,8 @@ class User(AbstractUser):
     role = models.CharField('الدور', max_length=20, choices=ROLE_CHOICES, default='staff')
     phone = models.CharField('الهاتف', max_length=20, blank=True)
     
+    objects = UserManager()
+    
     class Meta:
         verbose_name = 'مستخدم'
         verbose_name_plural = 'المستخدمون'
@@ -107,3 +125,25 @@ class AuditLog(models.Model):
     
     def __str__(self):
         return f"{self.user} - {self.get_action_display()} - {self.object_repr}"
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Signal to drop the cached session user when the profile, role, password
+    or last login changes.
+    """
+    from core.cache import invalidate_cached_users
+    invalidate_cached_users([instance.pk])
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(pre_delete, sender=Tenant)
+def invalidate_cached_tenant_users(sender, instance, **kwargs):
+    """
+    Signal to drop the cached session users of a tenant when it changes,
+    since each of them carries a copy of the tenant.
+    """
+    from core.cache import invalidate_cached_users
+    invalidate_cached_users(instance.users.values_list('pk', flat=True))
@@ -0,0 +1,194 @@
+"""
+Per-tenant SQLite databases (opt-in)
+قواعد بيانات مستقلة لبعض الوحدات
+
+SQLite serialises every write of a database file, so one large voucher in a
+faculty blocks the writes of all the others. Tenants listed in
+settings.TENANT_DATABASES (tenant code -> database alias) keep the tables
+of the inventory and transactions apps in their own file, and their writes
+only lock that file.
+
+Tables shared by every tenant stay in the central database: core (tenants,
+users), the other apps, and inventory categories (global categories are
+shared rows). Every tenant database connection attaches the central file,
+so joins from tenant tables to users, tenants or categories still resolve;
+foreign keys to the central tables cannot be enforced by SQLite across
+files and are switched off on those connections.
+
+The database is chosen from the instance being saved or read (the
+database it was loaded from, else its tenant), else from the context: the
+tenant of a tenant_database() or tenant_atomic() block, else the tenant of the request user -
+scoped or not, so a super admin works in the database of their own tenant.
+Writes of a tenant go through tenant_atomic(tenant), which pins every query
+of the block to that tenant's database.
+
+Unscoped code on the central database - super admins' global views,
+management commands, jobs without a tenant - does not see the routed
+tenants: TenantManager hides their rows (stale copies until the move is
+purged). Code covering every tenant loops over each_tenant_database().
+
+To route a tenant: stop the application, add its code to
+TENANT_DATABASE_CODES, run "manage.py move_tenant_database <code>" and
+start the application again.
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .tenancy import get_current_tenant_id, tenant_context
+
+ROUTED_APPS = {'inventory', 'transactions'}
+# Models of the routed apps kept in the central database (shared rows)
+CENTRAL_MODELS = {('inventory', 'category')}
+CENTRAL_SCHEMA = 'central'
+
+_tenant_aliases = None
+# Database pinned by tenant_database()
+_pinned_database = ContextVar('pinned_database', default=None)
+
+
+def is_routed(model):
+    """True for the models stored in the tenant databases"""
+    meta = model._meta
+    return meta.app_label in ROUTED_APPS and (meta.app_label, meta.model_name) not in CENTRAL_MODELS
+
+
+def get_tenant_aliases():
+    """Database alias of every routed tenant, by tenant id"""
+    global _tenant_aliases
+    if _tenant_aliases is None:
+        from .models import Tenant
+        codes = getattr(settings, 'TENANT_DATABASES', {})
+        _tenant_aliases = {
+            pk: codes[code]
+            for pk, code in Tenant.objects.using('default').filter(code__in=codes).values_list('pk', 'code')
+        } if codes else {}
+    return _tenant_aliases
+
+
+def get_tenant_database(tenant_id):
+    """Database alias holding the inventory and transactions of a tenant"""
+    return get_tenant_aliases().get(tenant_id, 'default')
+
+
+def current_database():
+    """Database of the current context: the pinned tenant's, else the request user's"""
+    return _pinned_database.get() or get_tenant_database(get_current_tenant_id())
+
+
+def hidden_tenant_ids():
+    """Routed tenants, whose rows unscoped querysets skip in the central database"""
+    if current_database() != 'default':
+        return ()
+    return tuple(get_tenant_aliases())
+
+
+@contextmanager
+def tenant_database(tenant=None):
+    """
+    Route the queries of a block to the database of a tenant (instance or
+    id; the current database by default), without scoping them. Yields the
+    database alias.
+    """
+    if tenant is None:
+        using = current_database()
+    else:
+        using = get_tenant_database(getattr(tenant, 'pk', tenant))
+    token = _pinned_database.set(using)
+    try:
+        yield using
+    finally:
+        _pinned_database.reset(token)
+
+
+@contextmanager
+def tenant_atomic(tenant=None):
+    """
+    transaction.atomic() on the database of a tenant (see tenant_database),
+    whose queries are routed to it. Yields the database alias.
+    """
+    with tenant_database(tenant) as using, transaction.atomic(using=using):
+        yield using
+
+
+def each_tenant_database():
+    """
+    Contexts covering every tenant once: the central database (routed tenants
+    hidden), then each routed tenant in its own database
+    """
+    yield nullcontext()
+    for tenant_id in get_tenant_aliases():
+        yield tenant_context(tenant_id)
+
+
+class TenantDatabaseRouter:
+    """Route the inventory and transactions tables of a tenant to its database"""
+
+    def _db_for(self, model, instance=None):
+        if not is_routed(model) or not get_tenant_aliases():
+            return None
+        if instance is not None:
+            if instance._meta.label_lower == 'core.tenant':
+                return get_tenant_database(instance.pk)
+            if instance._state.db is not None:
+                return instance._state.db
+            tenant_id = getattr(instance, 'tenant_id', None)
+            if tenant_id is not None:
+                return get_tenant_database(tenant_id)
+        return current_database()
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Rows of a tenant database may point to the central shared tables
+        if not (is_routed(obj1) and is_routed(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default':
+            return True
+        if app_label not in ROUTED_APPS:
+            return False
+        return (app_label, model_name) not in CENTRAL_MODELS
+
+
+@receiver(connection_created)
+def attach_central_database(sender, connection, **kwargs):
+    """
+    Signal to attach the central database to the connections of the tenant
+    databases, so their tables can join the shared tables.
+    The central database is switched to WAL journaling: a tenant transaction
+    reading shared tables must not block the central writes of the same
+    request (rollups, sessions).
+    """
+    tenant_aliases = getattr(settings, 'TENANT_DATABASES', {}).values()
+    if connection.vendor != 'sqlite' or not tenant_aliases:
+        return
+    with connection.cursor() as cursor:
+        if connection.alias == 'default':
+            cursor.execute('PRAGMA journal_mode = WAL')
+        elif connection.alias in tenant_aliases:
+            cursor.execute('PRAGMA foreign_keys = OFF')
+            cursor.execute(
+                f'ATTACH DATABASE %s AS {CENTRAL_SCHEMA}', [str(settings.DATABASES['default']['NAME'])],
+            )
+
+
+@receiver(post_save, sender='core.Tenant')
+def reset_tenant_aliases(sender, **kwargs):
+    """
+    Signal to reload the tenant databases after a tenant is saved (its code
+    may have changed).
+    """
+    global _tenant_aliases
+    _tenant_aliases = None
@@ -0,0 +1,194 @@
+"""
+Statistics service - aggregated figures for the dashboard
+خدمة الإحصائيات - الأرقام المجمعة للوحة التحكم
+"""
+from django.db import models
+from django.db.models import Sum, Count, Q, Value
+from django.utils import timezone
+from datetime import timedelta
+
+from inventory.models import Product, InventoryItem
+from transactions.models import EntryVoucher, ExitVoucher, ReturnVoucher, DisposalVoucher
+
+
+WARRANTY_HORIZON_DAYS = 30
+
+VOUCHER_MODELS = {
+    'entry': EntryVoucher,
+    'exit': ExitVoucher,
+    'return': ReturnVoucher,
+    'disposal': DisposalVoucher,
+}
+
+
+def scope_queryset(model, tenant=None):
+    """Return the model queryset limited to a tenant (None means all tenants)"""
+    if tenant is None:
+        return model.objects.all()
+    return model.objects.filter(tenant=tenant)
+
+
+def summarize_items(items):
+    """
+    Count and value a queryset of inventory items by status in a single query.
+    Returns the totals together with a per-status breakdown.
+    """
+    aggregates = {
+        'total_assets': Count('id'),
+        'total_asset_value': Sum('purchase_price'),
+    }
+    for status, _label in InventoryItem.STATUS_CHOICES:
+        aggregates[f'{status}_assets'] = Count('id', filter=Q(status=status))
+        aggregates[f'{status}_value'] = Sum('purchase_price', filter=Q(status=status))
+
+    stats = items.order_by().aggregate(**aggregates)
+    for key, value in stats.items():
+        if value is None:
+            stats[key] = 0
+
+    assets_by_status = [
+        {'status': status, 'count': stats[f'{status}_assets']}
+        for status, _label in InventoryItem.STATUS_CHOICES
+        if stats[f'{status}_assets']
+    ]
+    return stats, assets_by_status
+
+
+def get_item_statistics(tenant=None):
+    """Inventory items of a tenant counted and valued by status"""
+    return summarize_items(scope_queryset(InventoryItem, tenant))
+
+
+def get_item_totals_by_category(items):
+    """
+    Count and value of a queryset of inventory items per category in a single
+    GROUP BY query, with the count of each status in STATUS_CHOICES order.
+    """
+    aggregates = {
+        'count': Count('id'),
+        'value': Sum('purchase_price'),
+    }
+    for status, _label in InventoryItem.STATUS_CHOICES:
+        aggregates[f'{status}_count'] = Count('id', filter=Q(status=status))
+
+    rows = items.order_by().values('product__category__name').annotate(**aggregates).order_by('-count')
+    return [
+        {
+            'category': row['product__category__name'],
+            'count': row['count'],
+            'value': row['value'] or 0,
+            'statuses': [row[f'{status}_count'] for status, _label in InventoryItem.STATUS_CHOICES],
+        }
+        for row in rows
+    ]
+
+
+def get_voucher_counts(tenant=None, since=None):
+    """
+    Count vouchers of every type in a single UNION query.
+    Returns a dict like {'entry_vouchers_count': 3, ...}.
+    """
+    querysets = []
+    for voucher_type, model in VOUCHER_MODELS.items():
+        qs = scope_queryset(model, tenant)
+        if since is not None:
+            qs = qs.filter(date__gte=since)
+        querysets.append(
+            qs.order_by()
+            .annotate(voucher_type=Value(voucher_type, output_field=models.CharField()))
+            .values('voucher_type')
+            .annotate(count=Count('id'))
+        )
+
+    counts = {f'{voucher_type}_vouchers_count': 0 for voucher_type in VOUCHER_MODELS}
+    for row in querysets[0].union(*querysets[1:], all=True):
+        counts[f"{row['voucher_type']}_vouchers_count"] = row['count']
+    return counts
+
+
+def get_assets_by_category(tenant=None, limit=10):
+    """Top categories by number of inventory items"""
+    return list(
+        scope_queryset(InventoryItem, tenant)
+        .values('product__category__name')
+        .annotate(count=Count('id'))
+        .order_by('-count')[:limit]
+    )
+
+
+def get_low_stock_products(tenant=None, limit=5):
+    """Consumables at or below their minimum stock, read from the stored stock_quantity"""
+    return scope_queryset(Product, tenant).filter(
+        nature='consumable',
+        stock_quantity__lte=models.F('min_stock'),
+    ).annotate(current_stock=models.F('stock_quantity'))[:limit]
+
+
+def expiring_warranties(tenant=None, days=WARRANTY_HORIZON_DAYS, today=None):
+    """
+    Items in service whose warranty ends within the next `days` days, soonest
+    first - a range scan of the warranty_end indexes
+    """
+    today = today or timezone.now().date()
+    return scope_queryset(InventoryItem, tenant).filter(
+        warranty_end__gte=today,
+        warranty_end__lte=today + timedelta(days=days),
+    ).exclude(status='disposed').order_by('warranty_end', 'pk')
+
+
+def get_dashboard_statistics(tenant=None):
+    """
+    All dashboard counters: one query per table involved
+    (products, inventory items and the voucher UNION).
+    """
+    last_30_days = timezone.now().date() - timedelta(days=30)
+
+    item_stats, assets_by_status = get_item_statistics(tenant)
+    stats = {
+        'total_products': scope_queryset(Product, tenant).count(),
+        'total_assets': item_stats['total_assets'],
+        'available_assets': item_stats['available_assets'],
+        'assigned_assets': item_stats['assigned_assets'],
+        'maintenance_assets': item_stats['maintenance_assets'],
+        'disposed_assets': item_stats['disposed_assets'],
+        'total_asset_value': item_stats['total_asset_value'],
+    }
+    stats.update(get_voucher_counts(tenant, since=last_30_days))
+    return stats, assets_by_status
+
+
+def get_recent_vouchers(model, tenant=None, related='supplier', limit=5):
+    """Latest vouchers as plain dicts, ready to be cached"""
+    vouchers = scope_queryset(model, tenant).select_related(related).order_by('-created_at')[:limit]
+    return [
+        {
+            'pk': voucher.pk,
+            'voucher_number': voucher.voucher_number,
+            'date': voucher.date,
+            'status': voucher.status,
+            'status_display': voucher.get_status_display(),
+            'party': getattr(getattr(voucher, related), 'name', None),
+        }
+        for voucher in vouchers
+    ]
+
+
+def build_dashboard_payload(tenant=None):
+    """Everything the dashboard renders, as cacheable plain data"""
+    stats, assets_by_status = get_dashboard_statistics(tenant)
+    low_stock = get_low_stock_products(tenant).values('id', 'name', 'code', 'min_stock', 'current_stock')
+    return {
+        'stats': stats,
+        'assets_by_status': assets_by_status,
+        'assets_by_category': get_assets_by_category(tenant),
+        'recent_entries': get_recent_vouchers(EntryVoucher, tenant, related='supplier'),
+        'recent_exits': get_recent_vouchers(ExitVoucher, tenant, related='department'),
+        'low_stock': list(low_stock),
+        'expiring_warranties': list(
+            expiring_warranties(tenant).values(
+                'id', 'inventory_number', 'product__name', 'assigned_to__name', 'warranty_end',
+            )[:5]
+        ),
+        'expiring_warranties_count': expiring_warranties(tenant).count(),
+        'warranty_horizon': WARRANTY_HORIZON_DAYS,
+    }
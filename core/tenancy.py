@@ -0,0 +1,116 @@
+"""
+Tenant context and auto-scoping managers
+سياق الوحدة الحالية وتقييد الاستعلامات تلقائيا
+
+The tenant of the current request lives in context variables, so every
+request - a thread under WSGI or an asyncio task under ASGI - sees its own
+value, and sync_to_async / async_to_sync carry it across.
+
+Models with a tenant use TenantManager as their default manager: inside a
+tenant context every queryset (including get_object_or_404 and related
+managers) is limited to the current tenant. Querysets are not filtered when
+no context is active (management commands, background jobs, migrations,
+the shell) or inside an explicit unscoped() block, which is how super
+admins see every tenant (except the tenants moved to their own database,
+see core.routers). Model.objects.unscoped() bypasses the filter for a
+single queryset.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models
+
+_scoped = ContextVar('tenant_scoped', default=False)
+_current_tenant_id = ContextVar('current_tenant_id', default=None)
+_current_user = ContextVar('current_user', default=None)
+
+
+def get_current_tenant_id():
+    """Id of the tenant of the current request (None outside a tenant context)"""
+    return _current_tenant_id.get()
+
+
+def get_current_user():
+    """User of the current request"""
+    return _current_user.get()
+
+
+def is_scoped():
+    """True when tenant querysets are limited to the current tenant"""
+    return _scoped.get()
+
+
+def activate(user):
+    """
+    Enter the context of a request user: scoped to the user's tenant,
+    unscoped for super admins and anonymous users.
+    Returns the tokens to pass to deactivate().
+    """
+    authenticated = user is not None and user.is_authenticated
+    scoped = authenticated and not user.is_super_admin
+    return (
+        _scoped.set(scoped),
+        _current_tenant_id.set(user.tenant_id if authenticated else None),
+        _current_user.set(user if authenticated else None),
+    )
+
+
+def deactivate(tokens):
+    """Restore the context saved by activate()"""
+    scoped_token, tenant_token, user_token = tokens
+    _current_user.reset(user_token)
+    _current_tenant_id.reset(tenant_token)
+    _scoped.reset(scoped_token)
+
+
+@contextmanager
+def tenant_context(tenant):
+    """Scope tenant querysets to a tenant (instance or id) for a block of code"""
+    tokens = (
+        _scoped.set(True),
+        _current_tenant_id.set(getattr(tenant, 'pk', tenant)),
+        _current_user.set(_current_user.get()),
+    )
+    try:
+        yield
+    finally:
+        deactivate(tokens)
+
+
+@contextmanager
+def unscoped():
+    """Lift the tenant filter for a block of code - every tenant is visible"""
+    token = _scoped.set(False)
+    try:
+        yield
+    finally:
+        _scoped.reset(token)
+
+
+class TenantManager(models.Manager):
+    """
+    Default manager of the tenant models, limited to the current tenant.
+    Subclasses may set shared_field to a boolean field flagging rows that
+    every tenant sees (e.g. global categories).
+    """
+
+    shared_field = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if _scoped.get():
+            condition = models.Q(tenant_id=_current_tenant_id.get())
+            if self.shared_field:
+                condition |= models.Q(**{self.shared_field: True})
+            queryset = queryset.filter(condition)
+        else:
+            # Tenants moved to their own database are not read from the central one
+            from .routers import hidden_tenant_ids, is_routed
+            hidden = hidden_tenant_ids() if is_routed(self.model) else ()
+            if hidden:
+                queryset = queryset.exclude(tenant_id__in=hidden)
+        return queryset
+
+    def unscoped(self):
+        """Rows of every tenant, whatever the current context"""
+        return super().get_queryset()
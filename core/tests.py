@@ -1,3 +1,243 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import routers
+from core.models import Tenant, User
+from core.statistics import get_dashboard_statistics
+from core.tenancy import tenant_context, unscoped
+from inventory.models import Category, Department, Product, InventoryItem, StockMovement
+from transactions.models import EntryVoucher, ExitVoucher
+
+
+class DashboardStatisticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        cls.product = Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_data(self, count):
+        today = timezone.now().date()
+        start = InventoryItem.objects.count()
+        for i in range(start, start + count):
+            status = 'available' if i % 2 else 'assigned'
+            InventoryItem.objects.create(
+                product=self.product, inventory_number=f'INV-{i}', status=status,
+                purchase_price=Decimal('100.00'), tenant=self.tenant,
+            )
+            EntryVoucher.objects.create(voucher_number=f'ENT-{i}', date=today, tenant=self.tenant)
+            ExitVoucher.objects.create(voucher_number=f'EXT-{i}', date=today, tenant=self.tenant)
+
+    def test_statistics_values(self):
+        self.create_data(4)
+        stats, assets_by_status = get_dashboard_statistics(self.tenant)
+        self.assertEqual(stats['total_assets'], 4)
+        self.assertEqual(stats['available_assets'], 2)
+        self.assertEqual(stats['assigned_assets'], 2)
+        self.assertEqual(stats['total_asset_value'], Decimal('400.00'))
+        self.assertEqual(stats['entry_vouchers_count'], 4)
+        self.assertEqual(stats['exit_vouchers_count'], 4)
+        self.assertEqual(stats['return_vouchers_count'], 0)
+        self.assertEqual(
+            assets_by_status,
+            [{'status': 'available', 'count': 2}, {'status': 'assigned', 'count': 2}],
+        )
+
+    def test_statistics_query_count(self):
+        self.create_data(3)
+        with self.assertNumQueries(3):
+            get_dashboard_statistics(self.tenant)
+
+    def test_dashboard_query_count_does_not_grow(self):
+        self.client.force_login(self.user)
+        url = reverse('dashboard')
+        self.create_data(1)
+        with self.assertNumQueries(11):
+            self.client.get(url)
+        self.create_data(10)
+        cache.clear()
+        with self.assertNumQueries(11):
+            self.client.get(url)
+
+
+class DashboardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_dashboard_served_from_cache(self):
+        url = reverse('dashboard')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.context['stats']['entry_vouchers_count'], 0)
+
+    def test_voucher_change_invalidates_cache(self):
+        url = reverse('dashboard')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            voucher = EntryVoucher.objects.create(
+                voucher_number='ENT-1', date=timezone.now().date(), tenant=self.tenant,
+            )
+        response = self.client.get(url)
+        self.assertEqual(response.context['stats']['entry_vouchers_count'], 1)
+        self.assertEqual(response.context['recent_entries'][0]['pk'], voucher.pk)
+
+
+class TenantScopingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.other = Tenant.objects.create(name='كلية الطب', code='FM')
+        cls.own = Category.objects.create(name='أثاث', code='FUR', tenant=cls.tenant)
+        cls.foreign = Category.objects.create(name='أدوية', code='MED', tenant=cls.other)
+        cls.shared = Category.objects.create(name='معلوماتية', code='IT', is_global=True)
+        Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+        Product.objects.create(name='مجهر', code='MIC', nature='asset', tenant=cls.other)
+
+    def test_scoped_querysets_keep_shared_rows(self):
+        with tenant_context(self.tenant):
+            self.assertEqual(set(Category.objects.all()), {self.own, self.shared})
+            self.assertEqual(list(Product.objects.values_list('code', flat=True)), ['PC'])
+            self.assertFalse(Category.objects.filter(pk=self.foreign.pk).exists())
+            self.assertEqual(Category.objects.unscoped().count(), 3)
+
+    def test_unscoped_sees_every_tenant(self):
+        with tenant_context(self.tenant), unscoped():
+            self.assertEqual(Category.objects.count(), 3)
+            self.assertEqual(Product.objects.count(), 2)
+
+
+class SessionUserTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_former_backend_session_stays_signed_in(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session['_auth_user_backend'], 'core.backends.TenantModelBackend')
+
+    def test_bulk_deactivation_drops_cached_user(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(tenant=self.tenant).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 302)
+
+
+TENANT_ALIAS = 'tenant_fs'
+
+
+@override_settings(TENANT_DATABASES={'FS': TENANT_ALIAS})
+class TenantDatabaseTests(TransactionTestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.settings[TENANT_ALIAS] = {
+            **connections['default'].settings_dict, 'NAME': str(Path(cls.directory) / 'tenant_fs.sqlite3'),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[TENANT_ALIAS].close()
+        del connections[TENANT_ALIAS]
+        del connections.settings[TENANT_ALIAS]
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, routers, '_tenant_aliases', None)
+        # Rows created before the tenant is routed, as in a deployment
+        with self.settings(TENANT_DATABASES={}):
+            self.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+            self.other = Tenant.objects.create(name='كلية الطب', code='FM')
+            self.admin = User.objects.create_user('root', password='pass12345', tenant=self.tenant, role='super_admin')
+            self.department = Department.objects.create(name='المخبر', tenant=self.tenant)
+            self.paper = Product.objects.create(name='ورق', code='PAP', nature='consumable', tenant=self.tenant)
+            StockMovement.objects.create(product=self.paper, movement_type='in', quantity=5, tenant=self.tenant)
+            Product.objects.create(name='مجهر', code='MIC', nature='asset', tenant=self.other)
+        routers._tenant_aliases = None
+
+    def move(self, *args):
+        call_command('move_tenant_database', 'FS', *args, stdout=StringIO())
+
+    def test_move_copies_the_tenant_rows(self):
+        self.move()
+        self.assertEqual(Product._base_manager.using(TENANT_ALIAS).get().code, 'PAP')
+        self.assertEqual(StockMovement._base_manager.using(TENANT_ALIAS).count(), 1)
+        self.assertEqual(Department._base_manager.using(TENANT_ALIAS).count(), 1)
+        self.assertEqual(Product._base_manager.using('default').count(), 2)
+
+    def test_purge_removes_the_central_copy(self):
+        self.move('--purge')
+        self.assertEqual(list(Product._base_manager.using('default').values_list('code', flat=True)), ['MIC'])
+        self.assertEqual(Product._base_manager.using(TENANT_ALIAS).count(), 1)
+
+    def test_router_follows_the_tenant(self):
+        self.move()
+        router = routers.TenantDatabaseRouter()
+        with tenant_context(self.tenant):
+            self.assertEqual(router.db_for_read(Product), TENANT_ALIAS)
+            self.assertIsNone(router.db_for_read(Category))
+            self.assertEqual(list(Product.objects.values_list('code', flat=True)), ['PAP'])
+        with tenant_context(self.other):
+            self.assertEqual(router.db_for_write(Product), 'default')
+        self.assertEqual(router.db_for_write(Product, instance=Product(tenant=self.tenant)), TENANT_ALIAS)
+        # The central copy of a routed tenant is hidden from the global views
+        with unscoped():
+            self.assertEqual(list(Product.objects.values_list('code', flat=True)), ['MIC'])
+
+    def test_super_admin_voucher_is_written_to_the_tenant_database(self):
+        self.move()
+        self.client.force_login(self.admin)
+        self.client.post(reverse('exit_voucher_create'), {
+            'date': timezone.now().date(), 'department': self.department.pk,
+            'product_id': [self.paper.pk], 'quantity': [3],
+        })
+        voucher = ExitVoucher._base_manager.using(TENANT_ALIAS).get()
+        self.assertFalse(ExitVoucher._base_manager.using('default').exists())
+        self.client.post(reverse('exit_voucher_confirm', args=[voucher.pk]))
+        voucher.refresh_from_db()
+        self.assertEqual(voucher.status, 'confirmed')
+        tenant_copy = Product._base_manager.using(TENANT_ALIAS).get(pk=self.paper.pk)
+        central_copy = Product._base_manager.using('default').get(pk=self.paper.pk)
+        self.assertEqual((tenant_copy.stock_quantity, tenant_copy.reserved_quantity), (2, 0))
+        self.assertEqual(central_copy.stock_quantity, 5)
+
+    def test_super_admin_is_told_which_tenants_are_missing(self):
+        self.move()
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'ولا تظهر في العرض الشامل: كلية الطب\n')
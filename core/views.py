@@ -1,18 +1,20 @@
 """
 Core views - Dashboard and Authentication
 """
+import asyncio
+
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count, Q
-from django.db.models.functions import TruncMonth
-from django.utils import timezone
-from datetime import timedelta
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+from .cache import get_dashboard_payload
+from .events import get_broadcaster
+from .statistics import build_dashboard_payload
 
-from django.db import models
-from inventory.models import Product, InventoryItem, Category, StockMovement
-from transactions.models import EntryVoucher, ExitVoucher, ReturnVoucher, DisposalVoucher
+EVENTS_HEARTBEAT = 20
 
 
 def login_view(request):
@@ -48,72 +50,51 @@ def dashboard(request):
     user = request.user
     tenant = user.tenant
     
-    # Base querysets based on user role
-    if user.is_super_admin:
-        products = Product.objects.all()
-        items = InventoryItem.objects.all()
-        entry_vouchers = EntryVoucher.objects.all()
-        exit_vouchers = ExitVoucher.objects.all()
-        return_vouchers = ReturnVoucher.objects.all()
-        disposal_vouchers = DisposalVoucher.objects.all()
-    else:
-        products = Product.objects.filter(tenant=tenant)
-        items = InventoryItem.objects.filter(tenant=tenant)
-        entry_vouchers = EntryVoucher.objects.filter(tenant=tenant)
-        exit_vouchers = ExitVoucher.objects.filter(tenant=tenant)
-        return_vouchers = ReturnVoucher.objects.filter(tenant=tenant)
-        disposal_vouchers = DisposalVoucher.objects.filter(tenant=tenant)
-    
-    # Statistics
-    today = timezone.now().date()
-    last_30_days = today - timedelta(days=30)
-    
-    stats = {
-        'total_products': products.count(),
-        'total_assets': items.count(),
-        'available_assets': items.filter(status='available').count(),
-        'assigned_assets': items.filter(status='assigned').count(),
-        'disposed_assets': items.filter(status='disposed').count(),
-        'total_asset_value': items.aggregate(total=Sum('purchase_price'))['total'] or 0,
-        
-        # Voucher counts
-        'entry_vouchers_count': entry_vouchers.filter(date__gte=last_30_days).count(),
-        'exit_vouchers_count': exit_vouchers.filter(date__gte=last_30_days).count(),
-        'return_vouchers_count': return_vouchers.filter(date__gte=last_30_days).count(),
-        'disposal_vouchers_count': disposal_vouchers.filter(date__gte=last_30_days).count(),
-    }
-    
-    # Assets by status for pie chart
-    assets_by_status = items.values('status').annotate(count=Count('id'))
+    scope = None if user.is_super_admin else tenant
     
-    # Assets by category for bar chart
-    assets_by_category = items.values('product__category__name').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
+    # Cached per tenant, invalidated by the voucher/item/movement signals
+    context = get_dashboard_payload(scope, build_dashboard_payload)
     
-    # Recent activities
-    recent_entries = entry_vouchers.order_by('-created_at')[:5]
-    recent_exits = exit_vouchers.order_by('-created_at')[:5]
+    return render(request, 'core/dashboard.html', context)
+
+
+@login_required
+def dashboard_stats_api(request):
+    """عدادات لوحة التحكم - JSON"""
+    user = request.user
+    scope = None if user.is_super_admin else user.tenant
+    payload = get_dashboard_payload(scope, build_dashboard_payload)
+    return JsonResponse({'stats': payload['stats']})
+
+
+@login_required
+async def event_stream(request):
+    """بث أحداث التغيير المباشرة (Server-Sent Events)"""
+    # Long-lived streams need the ASGI entry point; tell WSGI clients not to reconnect
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
     
-    # Low stock products (consumables)
-    low_stock = products.filter(
-        nature='consumable'
-    ).annotate(
-        current_stock=Sum('stock_movements__quantity')
-    ).filter(
-        current_stock__lte=models.F('min_stock')
-    )[:5]
+    user = await request.auser()
+    scope = None if user.is_super_admin else user.tenant_id
+    broadcaster = get_broadcaster()
     
-    context = {
-        'stats': stats,
-        'assets_by_status': list(assets_by_status),
-        'assets_by_category': list(assets_by_category),
-        'recent_entries': recent_entries,
-        'recent_exits': recent_exits,
-        'low_stock': low_stock,
-    }
+    async def stream():
+        queue = broadcaster.subscribe(scope)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    message = ': keep-alive\n\n'
+                yield message
+        finally:
+            broadcaster.unsubscribe(scope, queue)
     
-    return render(request, 'core/dashboard.html', context)
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
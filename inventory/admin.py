@@ -1,11 +1,11 @@
 from django.contrib import admin
-from .models import Category, Supplier, Department, Product, InventoryItem, StockMovement
+from .models import Category, Supplier, Department, Product, InventoryItem, StockMovement, StocktakeSession
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'code', 'parent', 'tenant', 'is_global']
-    list_filter = ['is_global', 'tenant']
+    list_display = ['name', 'code', 'parent', 'tenant', 'is_global', 'depreciation_method', 'useful_life_years']
+    list_filter = ['is_global', 'depreciation_method', 'tenant']
     search_fields = ['name', 'code']
     ordering = ['name']
 
@@ -50,3 +50,11 @@ class StockMovementAdmin(admin.ModelAdmin):
     search_fields = ['product__name', 'reference']
     ordering = ['-created_at']
     raw_id_fields = ['product']
+
+
+@admin.register(StocktakeSession)
+class StocktakeSessionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'location', 'status', 'tenant', 'created_by', 'created_at', 'closed_at']
+    list_filter = ['status', 'tenant']
+    search_fields = ['name', 'location']
+    ordering = ['-created_at']
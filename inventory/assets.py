@@ -0,0 +1,95 @@
+"""
+Asset selection for exit, return and disposal vouchers
+اختيار الأصول المجرودة في وصلات الإخراج والإرجاع والإتلاف
+
+Each voucher type moves assets from given statuses: exit takes available
+units, return takes units assigned to the returning department, disposal
+takes any unit not disposed yet. Candidates are read from the
+(tenant, product, status) index in id order with keyset paging, and the
+ids posted by a voucher form are checked against the same rules in one
+query before any unit is moved.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from core.cache import bump_data_version
+from .models import InventoryItem, update_product_stock_quantity
+
+ASSET_PURPOSE_STATUSES = {
+    'exit': ['available'],
+    'return': ['assigned'],
+    'disposal': ['available', 'assigned', 'maintenance'],
+}
+
+ASSET_PAGE_SIZE = 100
+ASSET_PAGE_MAX_SIZE = 500
+
+
+class AssetSelectionError(ValueError):
+    """The assets posted for a voucher line cannot be moved"""
+
+
+def selectable_assets(product, purpose, department=None):
+    """Units of a product that a voucher of the given purpose may move"""
+    assets = InventoryItem.objects.filter(
+        tenant_id=product.tenant_id,
+        product=product,
+        status__in=ASSET_PURPOSE_STATUSES[purpose],
+    )
+    if purpose == 'return' and department is not None:
+        assets = assets.filter(assigned_to=department)
+    return assets
+
+
+def asset_page(assets, after=None, limit=ASSET_PAGE_SIZE, query=''):
+    """
+    One page of assets in id order, starting after the given id, and the
+    id to resume from (None on the last page)
+    """
+    assets = assets.order_by('pk')
+    if after:
+        assets = assets.filter(pk__gt=after)
+    if query:
+        assets = assets.filter(Q(inventory_number__istartswith=query) | Q(serial_number__istartswith=query))
+    rows = list(
+        assets.values(
+            'pk', 'inventory_number', 'serial_number', 'barcode', 'status', 'condition',
+            'location', 'assigned_to__name',
+        )[:limit + 1]
+    )
+    next_after = rows[limit - 1]['pk'] if len(rows) > limit else None
+    return rows[:limit], next_after
+
+
+def clean_asset_ids(product, purpose, values, quantity, department=None):
+    """
+    Units posted for a voucher line, checked in one query: every id must be
+    a selectable unit of the product, listed once, and match the quantity
+    """
+    try:
+        ids = [int(value) for value in values if value]
+    except ValueError:
+        raise AssetSelectionError(f'معرف أصل غير صالح للمنتج {product.code}')
+    if len(set(ids)) != len(ids):
+        raise AssetSelectionError(f'تم اختيار نفس الأصل أكثر من مرة للمنتج {product.code}')
+    if len(ids) != quantity:
+        raise AssetSelectionError(
+            f'يجب اختيار {quantity} أصل للمنتج {product.code} (تم اختيار {len(ids)})'
+        )
+    assets = list(selectable_assets(product, purpose, department).filter(pk__in=ids))
+    if len(assets) != len(ids):
+        raise AssetSelectionError(f'بعض الأصول المختارة للمنتج {product.code} غير متاحة لهذه العملية')
+    return assets
+
+
+def move_assets(product, assets, **changes):
+    """
+    Update the selected units in one query and refresh the product stock
+    once, instead of saving (and recounting) unit by unit. update() sends no
+    post_save, so the tenant caches are invalidated here.
+    """
+    InventoryItem.objects.filter(pk__in=[asset.pk for asset in assets]).update(
+        updated_at=timezone.now(), **changes,
+    )
+    update_product_stock_quantity(product.pk)
+    bump_data_version(product.tenant_id, using=product._state.db)
@@ -3,19 +3,22 @@ Inventory forms
 """
 from django import forms
 from django.db.models import Q
-from .models import Product, InventoryItem, Category, Supplier, Department
+from .models import Product, InventoryItem, Category, Supplier, Department, StocktakeSession
+from .reference import get_categories, get_departments, get_products, set_choices
 
 
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
-        fields = ['name', 'code', 'description', 'parent', 'is_global']
+        fields = ['name', 'code', 'description', 'parent', 'is_global', 'depreciation_method', 'useful_life_years']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'code': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'parent': forms.Select(attrs={'class': 'form-select'}),
             'is_global': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'depreciation_method': forms.Select(attrs={'class': 'form-select'}),
+            'useful_life_years': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
         }
     
     def __init__(self, *args, tenant=None, **kwargs):
@@ -24,6 +27,7 @@ class CategoryForm(forms.ModelForm):
             self.fields['parent'].queryset = Category.objects.filter(
                 Q(tenant=tenant) | Q(is_global=True)
             )
+            set_choices(self.fields['parent'], ((category.pk, category.label) for category in get_categories(tenant)))
 
 
 class ProductForm(forms.ModelForm):
@@ -46,10 +50,10 @@ class ProductForm(forms.ModelForm):
     def __init__(self, *args, tenant=None, **kwargs):
         super().__init__(*args, **kwargs)
         if tenant:
-            from django.db.models import Q
             self.fields['category'].queryset = Category.objects.filter(
                 Q(tenant=tenant) | Q(is_global=True)
             )
+            set_choices(self.fields['category'], ((category.pk, category.label) for category in get_categories(tenant)))
 
 
 class InventoryItemForm(forms.ModelForm):
@@ -80,6 +84,13 @@ class InventoryItemForm(forms.ModelForm):
         if tenant:
             self.fields['product'].queryset = Product.objects.filter(tenant=tenant, nature='asset')
             self.fields['assigned_to'].queryset = Department.objects.filter(tenant=tenant)
+            set_choices(self.fields['product'], (
+                (product.pk, f'{product.name} ({product.code})')
+                for product in get_products(tenant, nature='asset', active_only=False)
+            ))
+            set_choices(self.fields['assigned_to'], (
+                (department.pk, department.name) for department in get_departments(tenant, active_only=False)
+            ))
 
 
 class SupplierForm(forms.ModelForm):
@@ -108,3 +119,29 @@ class DepartmentForm(forms.ModelForm):
             'phone': forms.TextInput(attrs={'class': 'form-control'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
+
+
+class StocktakeSessionForm(forms.ModelForm):
+    class Meta:
+        model = StocktakeSession
+        fields = ['name', 'location', 'notes']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'location': forms.TextInput(attrs={'class': 'form-control'}),
+            'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+        }
+
+
+class StocktakeScanForm(forms.Form):
+    """Batch of scanned codes, one per line (scanner output or pasted list)"""
+    codes = forms.CharField(
+        label='الرموز الممسوحة',
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 6, 'dir': 'ltr', 'autofocus': True}),
+        help_text='رقم جرد أو باركود في كل سطر'
+    )
+    location = forms.CharField(
+        label='موقع المسح',
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('inventory', '0002_product_initial_quantity_product_stock_quantity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('in', 'دخول'), ('out', 'خروج'), ('return', 'إرجاع'), ('adjust', 'تعديل'), ('disposal', 'إتلاف')], max_length=10, verbose_name='نوع الحركة'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'created_at'], name='stockmove_product_date_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:00
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stockmovement_disposal_ledger_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depreciation_method',
+            field=models.CharField(choices=[('straight_line', 'قسط ثابت'), ('declining_balance', 'قسط متناقص')], default='straight_line', max_length=20, verbose_name='طريقة الاهتلاك'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='useful_life_years',
+            field=models.PositiveSmallIntegerField(default=5, validators=[django.core.validators.MinValueValidator(1)], verbose_name='مدة الاستعمال (سنوات)'),
+        ),
+    ]
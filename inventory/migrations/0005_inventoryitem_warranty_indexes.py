@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('inventory', '0004_category_depreciation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['tenant', 'warranty_end'], name='item_tenant_warranty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['warranty_end'], name='item_warranty_end_idx'),
+        ),
+    ]
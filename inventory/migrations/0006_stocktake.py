@@ -0,0 +1,75 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('inventory', '0005_inventoryitem_warranty_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StocktakeScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100, verbose_name='الرمز الممسوح')),
+                ('location', models.CharField(blank=True, max_length=200, verbose_name='موقع المسح')),
+                ('scanned_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ المسح')),
+            ],
+            options={
+                'verbose_name': 'مسح جرد',
+                'verbose_name_plural': 'عمليات مسح الجرد',
+            },
+        ),
+        migrations.CreateModel(
+            name='StocktakeSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='اسم الجلسة')),
+                ('location', models.CharField(blank=True, help_text='اتركه فارغا لجرد كل مواد الوحدة', max_length=200, verbose_name='الموقع')),
+                ('status', models.CharField(choices=[('open', 'مفتوحة'), ('closed', 'مغلقة')], default='open', max_length=10, verbose_name='الحالة')),
+                ('notes', models.TextField(blank=True, verbose_name='ملاحظات')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الإغلاق')),
+            ],
+            options={
+                'verbose_name': 'جلسة جرد',
+                'verbose_name_plural': 'جلسات الجرد',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['tenant', 'barcode'], name='item_tenant_barcode_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocktakescan',
+            name='scanned_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='مسح بواسطة'),
+        ),
+        migrations.AddField(
+            model_name='stocktakesession',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='أنشئ بواسطة'),
+        ),
+        migrations.AddField(
+            model_name='stocktakesession',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocktake_sessions', to='core.tenant', verbose_name='الوحدة'),
+        ),
+        migrations.AddField(
+            model_name='stocktakescan',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scans', to='inventory.stocktakesession', verbose_name='الجلسة'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktakescan',
+            index=models.Index(fields=['session', 'code'], name='stocktakescan_session_code_idx'),
+        ),
+    ]
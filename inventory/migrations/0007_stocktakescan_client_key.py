@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stocktake'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktakescan',
+            name='client_key',
+            field=models.CharField(blank=True, help_text='مفتاح يولده الماسح لكل عملية مسح لتفادي تسجيلها مرتين', max_length=64, verbose_name='مفتاح المسح'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocktakescan',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_key', ''), _negated=True), fields=('session', 'client_key'), name='stocktakescan_session_key_uniq'),
+        ),
+    ]
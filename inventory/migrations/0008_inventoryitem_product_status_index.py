@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('inventory', '0007_stocktakescan_client_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['tenant', 'product', 'status'], name='item_tenant_product_status_idx'),
+        ),
+    ]
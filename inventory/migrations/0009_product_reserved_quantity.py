@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:40
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Sum
+
+
+def reserve_draft_lines(apps, schema_editor):
+    """
+    Reserve the consumables of the draft exit and disposal vouchers. Draft
+    exit vouchers used to issue their stock when created; the issue now
+    happens on confirmation, so those early movements are removed and the
+    stock of their products recomputed from the ledger.
+    """
+    db_alias = schema_editor.connection.alias
+    Product = apps.get_model('inventory', 'Product')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    ExitVoucher = apps.get_model('transactions', 'ExitVoucher')
+
+    reserved = Counter()
+    for model_name in ('ExitVoucherItem', 'DisposalVoucherItem'):
+        lines = apps.get_model('transactions', model_name).objects.using(db_alias).filter(
+            voucher__status='draft', product__nature='consumable',
+        )
+        for product_id, quantity in lines.values_list('product_id', 'quantity'):
+            reserved[product_id] += quantity
+    for product_id, quantity in reserved.items():
+        Product.objects.using(db_alias).filter(pk=product_id).update(reserved_quantity=quantity)
+
+    drafts = ExitVoucher.objects.using(db_alias).filter(
+        status='draft', voucher_number=OuterRef('reference'), tenant_id=OuterRef('tenant_id'),
+    )
+    issued = StockMovement.objects.using(db_alias).filter(Exists(drafts), movement_type='out')
+    product_ids = set(issued.values_list('product_id', flat=True))
+    issued.delete()
+    for product_id in product_ids:
+        total = StockMovement.objects.using(db_alias).filter(product_id=product_id).aggregate(total=Sum('quantity'))['total'] or 0
+        Product.objects.using(db_alias).filter(pk=product_id).update(stock_quantity=max(total, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_inventoryitem_product_status_index'),
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved_quantity',
+            field=models.PositiveIntegerField(default=0, verbose_name='الكمية المحجوزة'),
+        ),
+        migrations.RunPython(reserve_draft_lines, migrations.RunPython.noop),
+    ]
@@ -8,10 +8,22 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from decimal import Decimal
 
+from core.tenancy import TenantManager
+
+
+class CategoryManager(TenantManager):
+    # Global categories are available to every tenant
+    shared_field = 'is_global'
+
 
 class Category(models.Model):
     """صنف/عائلة المواد"""
     
+    DEPRECIATION_METHODS = [
+        ('straight_line', 'قسط ثابت'),
+        ('declining_balance', 'قسط متناقص'),
+    ]
+    
     name = models.CharField('اسم الصنف', max_length=200)
     code = models.CharField('رمز الصنف', max_length=50)
     description = models.TextField('الوصف', blank=True)
@@ -32,8 +44,21 @@ class Category(models.Model):
         blank=True
     )
     is_global = models.BooleanField('صنف عام', default=False, help_text='متاح لجميع الوحدات')
+    depreciation_method = models.CharField(
+        'طريقة الاهتلاك',
+        max_length=20,
+        choices=DEPRECIATION_METHODS,
+        default='straight_line'
+    )
+    useful_life_years = models.PositiveSmallIntegerField(
+        'مدة الاستعمال (سنوات)',
+        default=5,
+        validators=[MinValueValidator(1)]
+    )
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     
+    objects = CategoryManager()
+    
     class Meta:
         verbose_name = 'صنف'
         verbose_name_plural = 'الأصناف'
@@ -66,6 +91,8 @@ class Supplier(models.Model):
     is_active = models.BooleanField('نشط', default=True)
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     
+    objects = TenantManager()
+    
     class Meta:
         verbose_name = 'مورد'
         verbose_name_plural = 'الموردون'
@@ -91,6 +118,8 @@ class Department(models.Model):
     is_active = models.BooleanField('نشطة', default=True)
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     
+    objects = TenantManager()
+    
     class Meta:
         verbose_name = 'مصلحة'
         verbose_name_plural = 'المصالح'
@@ -140,6 +169,8 @@ class Product(models.Model):
     min_stock = models.PositiveIntegerField('الحد الأدنى للمخزون', default=0)
     initial_quantity = models.PositiveIntegerField('الكمية الأولية', default=0)
     stock_quantity = models.PositiveIntegerField('الكمية المتوفرة', default=0)
+    # Quantity promised by draft exit and disposal vouchers (see inventory.reservations)
+    reserved_quantity = models.PositiveIntegerField('الكمية المحجوزة', default=0)
     tenant = models.ForeignKey(
         'core.Tenant',
         on_delete=models.CASCADE,
@@ -150,6 +181,8 @@ class Product(models.Model):
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
     
+    objects = TenantManager()
+    
     class Meta:
         verbose_name = 'منتج/مادة'
         verbose_name_plural = 'المنتجات/المواد'
@@ -163,6 +196,11 @@ class Product(models.Model):
     def is_asset(self):
         return self.nature == 'asset'
     
+    @property
+    def available_to_promise(self):
+        """الكمية المتاحة للوصلات الجديدة: المخزون ناقص المحجوز في المسودات"""
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+    
     @property
     def current_stock(self):
         """حساب المخزون الحالي للمواد غير المجرودة"""
@@ -229,11 +267,23 @@ class InventoryItem(models.Model):
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
     
+    objects = TenantManager()
+    
     class Meta:
         verbose_name = 'عنصر مخزون'
         verbose_name_plural = 'عناصر المخزون'
         ordering = ['-created_at']
         unique_together = ['inventory_number', 'tenant']
+        indexes = [
+            # Warranties expiring within a horizon: per tenant (dashboard)
+            # and across all tenants (daily digest)
+            models.Index(fields=['tenant', 'warranty_end'], name='item_tenant_warranty_idx'),
+            models.Index(fields=['warranty_end'], name='item_warranty_end_idx'),
+            # Scanned codes are matched on inventory number or barcode
+            models.Index(fields=['tenant', 'barcode'], name='item_tenant_barcode_idx'),
+            # Units a voucher may move (available, assigned...), paged by id
+            models.Index(fields=['tenant', 'product', 'status'], name='item_tenant_product_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.inventory_number}"
@@ -247,6 +297,7 @@ class StockMovement(models.Model):
         ('out', 'خروج'),
         ('return', 'إرجاع'),
         ('adjust', 'تعديل'),
+        ('disposal', 'إتلاف'),
     ]
     
     product = models.ForeignKey(
@@ -273,15 +324,113 @@ class StockMovement(models.Model):
     )
     created_at = models.DateTimeField('التاريخ', auto_now_add=True)
     
+    objects = TenantManager()
+    
     class Meta:
         verbose_name = 'حركة مخزون'
         verbose_name_plural = 'حركات المخزون'
         ordering = ['-created_at']
+        indexes = [
+            # Per-product ledger over a date range
+            models.Index(fields=['product', 'created_at'], name='stockmove_product_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.get_movement_type_display()} - {self.quantity}"
 
 
+
+class StocktakeSession(models.Model):
+    """جلسة جرد فعلي - عد المواد في وحدة أو موقع"""
+    
+    STATUS_CHOICES = [
+        ('open', 'مفتوحة'),
+        ('closed', 'مغلقة'),
+    ]
+    
+    name = models.CharField('اسم الجلسة', max_length=200)
+    location = models.CharField(
+        'الموقع',
+        max_length=200,
+        blank=True,
+        help_text='اتركه فارغا لجرد كل مواد الوحدة'
+    )
+    status = models.CharField('الحالة', max_length=10, choices=STATUS_CHOICES, default='open')
+    notes = models.TextField('ملاحظات', blank=True)
+    tenant = models.ForeignKey(
+        'core.Tenant',
+        on_delete=models.CASCADE,
+        related_name='stocktake_sessions',
+        verbose_name='الوحدة'
+    )
+    created_by = models.ForeignKey(
+        'core.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name='أنشئ بواسطة'
+    )
+    created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
+    closed_at = models.DateTimeField('تاريخ الإغلاق', null=True, blank=True)
+    
+    objects = TenantManager()
+    
+    class Meta:
+        verbose_name = 'جلسة جرد'
+        verbose_name_plural = 'جلسات الجرد'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.name} - {self.location or self.tenant}"
+    
+    @property
+    def is_open(self):
+        return self.status == 'open'
+
+
+class StocktakeScan(models.Model):
+    """رمز ممسوح أثناء جلسة الجرد (رقم جرد أو باركود)"""
+    
+    session = models.ForeignKey(
+        StocktakeSession,
+        on_delete=models.CASCADE,
+        related_name='scans',
+        verbose_name='الجلسة'
+    )
+    code = models.CharField('الرمز الممسوح', max_length=100)
+    client_key = models.CharField(
+        'مفتاح المسح',
+        max_length=64,
+        blank=True,
+        help_text='مفتاح يولده الماسح لكل عملية مسح لتفادي تسجيلها مرتين'
+    )
+    location = models.CharField('موقع المسح', max_length=200, blank=True)
+    scanned_by = models.ForeignKey(
+        'core.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name='مسح بواسطة'
+    )
+    scanned_at = models.DateTimeField('تاريخ المسح', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'مسح جرد'
+        verbose_name_plural = 'عمليات مسح الجرد'
+        indexes = [
+            # Reconciliation joins scans to items on (session, code)
+            models.Index(fields=['session', 'code'], name='stocktakescan_session_code_idx'),
+        ]
+        constraints = [
+            # A scan resent by a handheld scanner is recorded once
+            models.UniqueConstraint(
+                fields=['session', 'client_key'],
+                condition=~models.Q(client_key=''),
+                name='stocktakescan_session_key_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.session_id} - {self.code}"
+
 def update_product_stock_quantity(product_id):
     """
     Update stock_quantity for any product based on its nature.
@@ -289,8 +438,10 @@ def update_product_stock_quantity(product_id):
     - For consumables: sums all StockMovement quantities
     """
     from inventory.models import Product
+    from core.events import publish_stock_change
     try:
         product = Product.objects.get(pk=product_id)
+        old_quantity = product.stock_quantity
         if product.is_asset:
             # For assets: count available items
             available_count = product.items.filter(status='available').count()
@@ -302,6 +453,7 @@ def update_product_stock_quantity(product_id):
             )['total'] or 0
             product.stock_quantity = total_movement
         product.save(update_fields=['stock_quantity', 'updated_at'])
+        publish_stock_change(product, old_quantity)
     except Product.DoesNotExist:
         pass
 
@@ -339,3 +491,59 @@ def stock_movement_post_delete(sender, instance, **kwargs):
     Signal to update product stock_quantity when a StockMovement is deleted.
     """
     update_product_stock_quantity(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_save, sender=StockMovement)
+@receiver(post_delete, sender=StockMovement)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached dashboard, reports and statistics of the
+    tenant whenever reference data, products, items or stock movements change.
+    """
+    from core.cache import bump_data_version
+    bump_data_version(instance.tenant_id, using=kwargs.get('using'))
+
+
+# Product saves that only move the stock leave the reference data unchanged
+STOCK_ONLY_FIELDS = {'stock_quantity', 'reserved_quantity', 'updated_at'}
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_reference_cache(sender, instance, update_fields=None, using=None, **kwargs):
+    """
+    Signal to invalidate the cached form choices of the tenant when a
+    supplier, department or product changes.
+    """
+    if update_fields and set(update_fields) <= STOCK_ONLY_FIELDS:
+        return
+    from core.cache import bump_reference_version
+    if instance.tenant_id is not None:
+        bump_reference_version(instance.tenant_id, using=using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_reference_cache(sender, instance, using=None, **kwargs):
+    """
+    Signal to invalidate the cached category choices. Global categories are
+    listed for every tenant, so the shared version is bumped as well.
+    """
+    from core.cache import bump_reference_version
+    bump_reference_version(None, using=using)
+    if instance.tenant_id is not None:
+        bump_reference_version(instance.tenant_id, using=using)
@@ -0,0 +1,109 @@
+"""
+Reference data cache - products, categories, departments and suppliers
+البيانات المرجعية المخزنة مؤقتا - المواد والأصناف والمصالح والموردون
+
+Form choices and selection lists are read from compact named tuples cached
+per tenant (see core.cache.get_reference_data), so rendering a form does not
+query the catalogue or call __str__ on every row. The cache is invalidated
+by the signals in inventory.models when a row changes. Submitted values are
+still validated against the tenant queryset of the form field.
+"""
+from collections import namedtuple
+
+from django.db.models import Q
+
+from core.cache import get_reference_data
+from core.tenancy import get_current_tenant_id, is_scoped
+from .models import Product, Category, Department, Supplier
+
+ProductRef = namedtuple('ProductRef', 'pk code name nature unit unit_price is_active')
+CategoryRef = namedtuple('CategoryRef', 'pk name label')
+DepartmentRef = namedtuple('DepartmentRef', 'pk name is_active')
+SupplierRef = namedtuple('SupplierRef', 'pk name is_active')
+
+
+def current_tenant():
+    """Tenant whose reference data the current request reads (None: every tenant)"""
+    return get_current_tenant_id() if is_scoped() else None
+
+
+def _scoped(queryset, tenant, shared=None):
+    """Rows of a tenant (every tenant for None), plus the shared ones"""
+    if tenant is None:
+        return queryset
+    condition = Q(tenant=tenant)
+    if shared:
+        condition |= Q(**{shared: True})
+    return queryset.filter(condition)
+
+
+def _load_products(tenant):
+    products = _scoped(Product.objects.unscoped(), tenant).order_by('code', 'pk')
+    return [
+        ProductRef(pk, code, name, nature, unit, str(unit_price), is_active)
+        for pk, code, name, nature, unit, unit_price, is_active in products.values_list(
+            'pk', 'code', 'name', 'nature', 'unit', 'unit_price', 'is_active',
+        )
+    ]
+
+
+def _load_categories(tenant):
+    categories = _scoped(Category.objects.unscoped(), tenant, 'is_global').order_by('name', 'pk')
+    return [
+        CategoryRef(pk, name, f'{parent_name} > {name}' if parent_name else name)
+        for pk, name, parent_name in categories.values_list('pk', 'name', 'parent__name')
+    ]
+
+
+def _load_departments(tenant):
+    departments = _scoped(Department.objects.unscoped(), tenant).order_by('name', 'pk')
+    return [DepartmentRef(*row) for row in departments.values_list('pk', 'name', 'is_active')]
+
+
+def _load_suppliers(tenant):
+    suppliers = _scoped(Supplier.objects.unscoped(), tenant).order_by('name', 'pk')
+    return [SupplierRef(*row) for row in suppliers.values_list('pk', 'name', 'is_active')]
+
+
+def get_products(tenant, nature=None, active_only=True):
+    products = get_reference_data('products', tenant, _load_products)
+    return [
+        product for product in products
+        if (not active_only or product.is_active) and (nature is None or product.nature == nature)
+    ]
+
+
+def search_products(tenant, query='', nature=None):
+    """
+    Active products whose code, name or a word of the name starts with the
+    query (case-insensitive), in code order
+    """
+    products = get_products(tenant, nature)
+    query = query.strip().lower()
+    if not query:
+        return products
+    return [
+        product for product in products
+        if product.code.lower().startswith(query)
+        or any(word.startswith(query) for word in product.name.lower().split())
+    ]
+
+
+def get_categories(tenant):
+    return get_reference_data('categories', tenant, _load_categories)
+
+
+def get_departments(tenant, active_only=True):
+    departments = get_reference_data('departments', tenant, _load_departments)
+    return [department for department in departments if not active_only or department.is_active]
+
+
+def get_suppliers(tenant, active_only=True):
+    suppliers = get_reference_data('suppliers', tenant, _load_suppliers)
+    return [supplier for supplier in suppliers if not active_only or supplier.is_active]
+
+
+def set_choices(field, choices):
+    """Render a model choice field from cached (pk, label) pairs"""
+    empty = [('', field.empty_label)] if field.empty_label is not None else []
+    field.choices = empty + list(choices)
@@ -0,0 +1,72 @@
+"""
+Stock reservations of draft exit and disposal vouchers
+حجز المخزون لمسودات وصلات الإخراج والإتلاف
+
+Consumables promised by a draft voucher are counted in
+Product.reserved_quantity, kept up to date incrementally by the voucher
+line signals (transactions.models) with F() updates. The stock leaves only
+when the voucher is confirmed, which releases the reservation. What new
+drafts may still promise is Product.available_to_promise (stock minus
+reserved), so checking a whole voucher reads the counters of its products
+in one query without summing the movement ledger.
+
+Assets are not counted here: a voucher takes specific units, whose status
+changes as soon as they are selected (see inventory.assets).
+"""
+from collections import Counter
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Product
+
+
+class StockShortageError(ValueError):
+    """A voucher asks for more than the available stock of a product"""
+
+
+def line_quantities(lines):
+    """Total quantity per product id of (product_id, quantity) pairs"""
+    quantities = Counter()
+    for product_id, quantity in lines:
+        quantities[int(product_id)] += quantity
+    return quantities
+
+
+def reserve(quantities):
+    """Add the quantities of draft lines to the reservations of the consumables"""
+    for product_id, quantity in quantities.items():
+        if quantity:
+            Product.objects.unscoped().filter(pk=product_id, nature='consumable').update(
+                reserved_quantity=F('reserved_quantity') + quantity,
+            )
+
+
+def release(quantities):
+    """Drop the reservations of draft lines (confirmed, changed or deleted)"""
+    for product_id, quantity in quantities.items():
+        if quantity:
+            Product.objects.unscoped().filter(pk=product_id, nature='consumable').update(
+                reserved_quantity=Greatest(F('reserved_quantity') - quantity, 0),
+            )
+
+
+def check_available(quantities, held=False):
+    """
+    Raise StockShortageError unless every consumable can be served, in one
+    query: new drafts are checked against the stock available to promise,
+    drafts being confirmed (held=True, their quantities already reserved)
+    against the stock on hand
+    """
+    if not quantities:
+        return
+    rows = Product.objects.filter(pk__in=quantities, nature='consumable').values_list(
+        'pk', 'name', 'stock_quantity', 'reserved_quantity',
+    )
+    shortages = []
+    for pk, name, stock, reserved in rows:
+        available = stock if held else max(stock - reserved, 0)
+        if quantities[pk] > available:
+            shortages.append(f'{name} (المتاح {available}، المطلوب {quantities[pk]})')
+    if shortages:
+        raise StockShortageError('لا يوجد مخزون كافٍ للمنتج: ' + '، '.join(shortages))
@@ -0,0 +1,208 @@
+"""
+Stocktake reconciliation - scanned codes against the inventory, in SQL
+مطابقة الجرد الفعلي - مقارنة الرموز الممسوحة بالمواد المسجلة
+
+A scan matches an item when its code equals the item's inventory number or
+barcode. Every category of the reconciliation is an EXISTS / NOT EXISTS
+subquery (semi-join or anti-join) over the (session, code) index, so the
+database does the work and nothing is looped over in Python.
+"""
+from django.db.models import Exists, Min, OuterRef, Q
+
+from .models import InventoryItem, StocktakeScan
+
+# Scanned codes are appended with bulk_create in batches of this size
+SCAN_BATCH_SIZE = 1000
+
+# Largest burst of scan events accepted in one API request
+SCAN_API_MAX_EVENTS = 1000
+
+RECONCILIATION_CATEGORIES = [
+    ('found', 'موجود'),
+    ('missing', 'مفقود'),
+    ('unexpected', 'غير مسجل'),
+    ('wrong_location', 'في غير موقعه'),
+]
+
+
+def parse_codes(text):
+    """Scanned codes from a pasted list: one per line, blanks dropped, order kept"""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def record_scans(session, codes, user=None, location=''):
+    """Append scanned codes to a session; codes scanned again are stored but counted once"""
+    location = location or session.location
+    scans = [
+        StocktakeScan(session=session, code=code[:100], location=location, scanned_by=user)
+        for code in codes
+    ]
+    StocktakeScan.objects.bulk_create(scans, batch_size=SCAN_BATCH_SIZE)
+    return len(scans)
+
+
+def clean_scan_event(event):
+    """(key, code, location) of one API scan event, or an error message"""
+    if not isinstance(event, dict):
+        return None, 'invalid event'
+    key, code, location = event.get('key'), event.get('code'), event.get('location', '')
+    if not isinstance(key, str) or not key.strip() or len(key.strip()) > 64:
+        return None, 'invalid key'
+    if not isinstance(code, str) or not code.strip() or len(code.strip()) > 100:
+        return None, 'invalid code'
+    if not isinstance(location, str) or len(location) > 200:
+        return None, 'invalid location'
+    return (key.strip(), code.strip(), location.strip()), None
+
+
+def ingest_scan_events(session, events, user=None):
+    """
+    Record a burst of scan events from a handheld scanner.
+
+    Every event carries a client-generated key; an event whose key was
+    already seen, in this burst or an earlier one, is reported as duplicate
+    and not stored again, so a scanner can resend its offline queue safely.
+    Keys are checked with one IN query, codes are resolved against the
+    inventory number and barcode with one IN query, and the new scans are
+    inserted with bulk_create. A key inserted by a concurrent flush of the
+    same queue in the meantime is dropped by the unique (session, key)
+    constraint and reported as duplicate. Returns one result per event, in
+    order.
+    """
+    results = []
+    cleaned = []
+    for event in events:
+        value, error = clean_scan_event(event)
+        cleaned.append(value)
+        results.append({
+            'key': value[0] if value else None,
+            'status': 'invalid' if error else None,
+            'error': error,
+            'item': None,
+        })
+
+    keys = {value[0] for value in cleaned if value}
+    codes = {value[1] for value in cleaned if value}
+    seen = set(
+        session.scans.filter(client_key__in=keys).values_list('client_key', flat=True)
+    ) if keys else set()
+
+    matches = {}
+    if codes:
+        items = InventoryItem.objects.filter(tenant_id=session.tenant_id).filter(
+            Q(inventory_number__in=codes) | Q(barcode__in=codes)
+        ).values('pk', 'inventory_number', 'barcode', 'location', 'status')
+        for item in items:
+            if item['barcode']:
+                matches.setdefault(item['barcode'], item)
+            matches[item['inventory_number']] = item
+
+    scans = []
+    recorded = []
+    for value, result in zip(cleaned, results):
+        if value is None:
+            continue
+        key, code, location = value
+        item = matches.get(code)
+        if item:
+            result['item'] = {
+                'id': item['pk'],
+                'inventory_number': item['inventory_number'],
+                'location': item['location'],
+                'status': item['status'],
+            }
+        if key in seen:
+            result['status'] = 'duplicate'
+            continue
+        seen.add(key)
+        result['status'] = 'recorded'
+        recorded.append(result)
+        scans.append(StocktakeScan(
+            session=session, code=code, client_key=key,
+            location=location or session.location, scanned_by=user,
+        ))
+
+    if scans:
+        StocktakeScan.objects.bulk_create(scans, batch_size=SCAN_BATCH_SIZE, ignore_conflicts=True)
+        # The stored row of a dropped key carries the other flush's scanned_at
+        stored = dict(
+            session.scans.filter(client_key__in=[scan.client_key for scan in scans])
+            .values_list('client_key', 'scanned_at')
+        )
+        for scan, result in zip(scans, recorded):
+            if stored.get(scan.client_key) != scan.scanned_at:
+                result['status'] = 'duplicate'
+    return results
+
+
+def expected_items(session):
+    """Items the session should find: in service, at the session location if any"""
+    items = InventoryItem.objects.filter(tenant=session.tenant).exclude(status='disposed')
+    if session.location:
+        items = items.filter(location=session.location)
+    return items
+
+
+def scanned(session):
+    """
+    Condition "the outer item was scanned in the session". Inventory number
+    and barcode are separate EXISTS so each one is an index lookup.
+    """
+    scans = StocktakeScan.objects.filter(session=session)
+    by_number = Exists(scans.filter(code=OuterRef('inventory_number')))
+    by_barcode = Exists(scans.filter(code=OuterRef('barcode')))
+    return by_number | (~Q(barcode='') & by_barcode)
+
+
+def found_items(session):
+    return expected_items(session).filter(scanned(session))
+
+
+def missing_items(session):
+    return expected_items(session).exclude(scanned(session))
+
+
+def unexpected_scans(session):
+    """
+    Codes matching no item of the tenant, one row per code (its first scan)
+    however many times it was scanned
+    """
+    items = InventoryItem.objects.filter(tenant=session.tenant)
+    first_scans = session.scans.values('code').annotate(first=Min('pk')).values('first')
+    return session.scans.filter(pk__in=first_scans).exclude(
+        Exists(items.filter(inventory_number=OuterRef('code')))
+        | Exists(items.filter(barcode=OuterRef('code')))
+    )
+
+
+def wrong_location_items(session):
+    """
+    Items in service of the tenant scanned somewhere else than their recorded
+    location (items without a recorded location cannot be misplaced)
+    """
+    scans = StocktakeScan.objects.filter(session=session).exclude(location='').exclude(
+        location=OuterRef('location')
+    )
+    items = InventoryItem.objects.filter(tenant=session.tenant).exclude(status='disposed').exclude(location='')
+    return items.filter(
+        Exists(scans.filter(code=OuterRef('inventory_number')))
+        | (~Q(barcode='') & Exists(scans.filter(code=OuterRef('barcode'))))
+    )
+
+
+def reconcile(session):
+    """Querysets of every reconciliation category"""
+    return {
+        'found': found_items(session),
+        'missing': missing_items(session),
+        'unexpected': unexpected_scans(session),
+        'wrong_location': wrong_location_items(session),
+    }
+
+
+def reconciliation_summary(session):
+    """Counts of every category, one COUNT query each"""
+    summary = {category: queryset.count() for category, queryset in reconcile(session).items()}
+    summary['expected'] = expected_items(session).count()
+    summary['scans'] = session.scans.count()
+    return summary
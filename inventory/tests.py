@@ -1,3 +1,191 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Tenant, User
+from .models import InventoryItem, Product, StockMovement, StocktakeScan, StocktakeSession
+from .stocktake import (
+    SCAN_API_MAX_EVENTS, reconciliation_summary, record_scans, unexpected_scans, wrong_location_items,
+)
+from .views import PRODUCT_PICKER_PAGE_SIZE
+
+
+class StocktakeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        product = Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+        InventoryItem.objects.create(product=product, inventory_number='INV-1', tenant=cls.tenant)
+        InventoryItem.objects.create(product=product, inventory_number='INV-2', tenant=cls.tenant)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unexpected_code_counted_once(self):
+        session = StocktakeSession.objects.create(name='جرد', tenant=self.tenant, created_by=self.user)
+        record_scans(session, ['INV-1', 'X-9', 'X-9', 'X-9', 'Y-1'])
+        summary = reconciliation_summary(session)
+        self.assertEqual(summary['unexpected'], 2)
+        self.assertEqual(summary['found'], 1)
+        self.assertEqual(summary['missing'], 1)
+        self.assertEqual(sorted(unexpected_scans(session).values_list('code', flat=True)), ['X-9', 'Y-1'])
+
+    def test_wrong_location_skips_disposed_and_unplaced_items(self):
+        product = Product.objects.get(code='PC')
+        InventoryItem.objects.filter(inventory_number='INV-1').update(location='B12')
+        InventoryItem.objects.create(
+            product=product, inventory_number='INV-3', location='B12', status='disposed', tenant=self.tenant,
+        )
+        session = StocktakeSession.objects.create(name='جرد', tenant=self.tenant, created_by=self.user)
+        record_scans(session, ['INV-1', 'INV-2', 'INV-3'], location='A01')
+        self.assertEqual(list(wrong_location_items(session).values_list('inventory_number', flat=True)), ['INV-1'])
+
+    def test_viewer_cannot_change_a_session(self):
+        viewer = User.objects.create_user('viewer', password='pass12345', tenant=self.tenant, role='viewer')
+        session = StocktakeSession.objects.create(name='جرد', tenant=self.tenant, created_by=self.user)
+        self.client.force_login(viewer)
+        self.client.post(reverse('stocktake_create'), {'name': 'جرد 2'})
+        self.client.post(reverse('stocktake_detail', args=[session.pk]), {'codes': 'INV-1'})
+        self.client.post(reverse('stocktake_close', args=[session.pk]))
+        session.refresh_from_db()
+        self.assertEqual((StocktakeSession.objects.count(), session.scans.count()), (1, 0))
+        self.assertTrue(session.is_open)
+
+    def test_create_requires_a_tenant(self):
+        admin = User.objects.create_user('root', password='pass12345', role='super_admin')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('stocktake_create'), {'name': 'جرد'})
+        self.assertRedirects(response, reverse('stocktake_list'))
+        self.assertFalse(StocktakeSession.objects.exists())
+
+
+class ScanApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        product = Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+        cls.item = InventoryItem.objects.create(
+            product=product, inventory_number='INV-1', barcode='6130001', tenant=cls.tenant,
+        )
+        cls.session = StocktakeSession.objects.create(name='جرد', tenant=cls.tenant, created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def post(self, scans):
+        return self.client.post(
+            reverse('stocktake_scans_api', args=[self.session.pk]),
+            json.dumps({'scans': scans}), content_type='application/json',
+        )
+
+    def test_results_in_input_order(self):
+        response = self.post([
+            {'key': 'k1', 'code': '6130001'},
+            {'key': 'k2', 'code': 'X-9'},
+            {'key': 'k3', 'code': ''},
+            {'key': 'k4', 'code': 'INV-1'},
+        ])
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['recorded', 'recorded', 'invalid', 'recorded'])
+        self.assertEqual([result['key'] for result in results], ['k1', 'k2', None, 'k4'])
+        # Barcode and inventory number both resolve the item
+        self.assertEqual(results[0]['item']['id'], self.item.pk)
+        self.assertEqual(results[3]['item']['inventory_number'], 'INV-1')
+        self.assertIsNone(results[1]['item'])
+        self.assertEqual(response.json()['recorded'], 3)
+
+    def test_resent_queue_is_duplicate(self):
+        scans = [{'key': 'k1', 'code': 'INV-1'}, {'key': 'k2', 'code': 'X-9'}]
+        self.post(scans)
+        response = self.post(scans)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['duplicate', 'duplicate'])
+        self.assertEqual(response.json()['recorded'], 0)
+        self.assertEqual(self.session.scans.count(), 2)
+
+    def test_key_repeated_in_a_burst_is_stored_once(self):
+        response = self.post([{'key': 'k1', 'code': 'INV-1'}, {'key': 'k1', 'code': 'INV-1'}])
+        self.assertEqual([result['status'] for result in response.json()['results']], ['recorded', 'duplicate'])
+        self.assertEqual(self.session.scans.count(), 1)
+
+    def test_key_inserted_by_a_concurrent_flush_is_duplicate(self):
+        bulk_create = StocktakeScan.objects.bulk_create
+
+        def concurrent_flush(scans, **kwargs):
+            StocktakeScan.objects.create(session=self.session, code='INV-1', client_key='k1')
+            return bulk_create(scans, **kwargs)
+
+        with mock.patch.object(StocktakeScan.objects, 'bulk_create', side_effect=concurrent_flush):
+            response = self.post([{'key': 'k1', 'code': 'INV-1'}, {'key': 'k2', 'code': 'X-9'}])
+        self.assertEqual([result['status'] for result in response.json()['results']], ['duplicate', 'recorded'])
+        self.assertEqual(response.json()['recorded'], 1)
+        self.assertEqual(self.session.scans.count(), 2)
+
+    def test_oversized_burst_is_rejected(self):
+        response = self.post([{'key': f'k{i}', 'code': 'INV-1'} for i in range(SCAN_API_MAX_EVENTS + 1)])
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(self.session.scans.exists())
+
+    def test_viewer_cannot_post_scans(self):
+        viewer = User.objects.create_user('viewer', password='pass12345', tenant=self.tenant, role='viewer')
+        self.client.force_login(viewer)
+        response = self.post([{'key': 'k1', 'code': 'INV-1'}])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(self.session.scans.exists())
+
+
+class ProductPickerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        other = Tenant.objects.create(name='كلية الطب', code='FM')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        for i in range(PRODUCT_PICKER_PAGE_SIZE + 5):
+            Product.objects.create(name=f'ورق {i}', code=f'PAP-{i:03}', nature='consumable', tenant=cls.tenant)
+        cls.ink = Product.objects.create(name='حبر أسود', code='INK', nature='consumable', tenant=cls.tenant)
+        Product.objects.create(name='حبر طبي', code='INK-M', nature='consumable', tenant=other)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get(self, params=None, **headers):
+        return self.client.get(reverse('product_picker_api'), params or {}, **headers)
+
+    def test_pages_follow_code_order(self):
+        first = self.get().json()
+        self.assertEqual(len(first['results']), PRODUCT_PICKER_PAGE_SIZE)
+        self.assertEqual(first['results'][0]['code'], 'INK')
+        self.assertTrue(first['has_next'])
+        second = self.get({'page': 2}).json()
+        codes = [product['code'] for product in second['results']]
+        self.assertEqual((len(codes), codes[-1]), (6, f'PAP-{PRODUCT_PICKER_PAGE_SIZE + 4:03}'))
+        self.assertFalse(second['has_next'])
+
+    def test_query_matches_code_or_name_word(self):
+        by_code = self.get({'q': 'ink'}).json()['results']
+        by_word = self.get({'q': 'أسود'}).json()['results']
+        self.assertEqual([product['id'] for product in by_code], [self.ink.pk])
+        self.assertEqual([product['id'] for product in by_word], [self.ink.pk])
+
+    def test_etag_revalidation(self):
+        response = self.get({'q': 'ink'})
+        etag = response['ETag']
+        self.assertEqual(self.get({'q': 'ink'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Another filter is another representation
+        self.assertNotEqual(self.get({'q': 'pap'})['ETag'], etag)
 
-# Create your tests here.
+        with self.captureOnCommitCallbacks(execute=True):
+            StockMovement.objects.create(product=self.ink, movement_type='in', quantity=4, tenant=self.tenant)
+        response = self.get({'q': 'ink'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['available_to_promise'], 4)
@@ -26,7 +26,17 @@ urlpatterns = [
     path('departments/', views.department_list, name='department_list'),
     path('departments/create/', views.department_create, name='department_create'),
     
+    # Stocktake
+    path('stocktake/', views.stocktake_list, name='stocktake_list'),
+    path('stocktake/create/', views.stocktake_create, name='stocktake_create'),
+    path('stocktake/<int:pk>/', views.stocktake_detail, name='stocktake_detail'),
+    path('stocktake/<int:pk>/close/', views.stocktake_close, name='stocktake_close'),
+    path('stocktake/<int:pk>/export/<str:category>/', views.stocktake_export, name='stocktake_export'),
+    path('stocktake/<int:pk>/scans/', views.stocktake_scans_api, name='stocktake_scans_api'),
+    
     # AJAX endpoints
     path('api/search-items/', views.search_items_ajax, name='search_items_ajax'),
     path('api/search-products/', views.search_products_ajax, name='search_products_ajax'),
+    path('api/product-picker/', views.product_picker_api, name='product_picker_api'),
+    path('api/products/<int:pk>/assets/', views.product_assets_api, name='product_assets_api'),
 ]
@@ -1,22 +1,31 @@
 """
 Inventory views - Products, Items, Categories
 """
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count
 from django.http import JsonResponse
-
-from .models import Product, InventoryItem, Category, Supplier, Department, StockMovement
-from .forms import ProductForm, InventoryItemForm, CategoryForm, SupplierForm, DepartmentForm
-
-
-def get_tenant_queryset(request, model):
-    """Get queryset filtered by tenant"""
-    if request.user.is_super_admin:
-        return model.objects.all()
-    return model.objects.filter(tenant=request.user.tenant)
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_POST
+
+from core.cache import reference_etag
+from reports.exports import EXPORT_CHUNK_SIZE, streaming_export
+from .models import Product, InventoryItem, Category, Supplier, Department, StockMovement, StocktakeSession
+from .assets import ASSET_PAGE_MAX_SIZE, ASSET_PAGE_SIZE, ASSET_PURPOSE_STATUSES, asset_page, selectable_assets
+from .forms import (
+    ProductForm, InventoryItemForm, CategoryForm, SupplierForm, DepartmentForm,
+    StocktakeSessionForm, StocktakeScanForm,
+)
+from .reference import current_tenant, get_categories, search_products
+from .stocktake import (
+    RECONCILIATION_CATEGORIES, SCAN_API_MAX_EVENTS, ingest_scan_events, parse_codes,
+    record_scans, reconcile, reconciliation_summary,
+)
 
 
 # ============== Products ==============
@@ -24,7 +33,7 @@ def get_tenant_queryset(request, model):
 @login_required
 def product_list(request):
     """قائمة المنتجات"""
-    products = get_tenant_queryset(request, Product)
+    products = Product.objects.all()
     
     # Search
     search = request.GET.get('search', '')
@@ -46,11 +55,11 @@ def product_list(request):
         products = products.filter(nature=nature)
     
     # Pagination
-    paginator = Paginator(products, 20)
+    paginator = Paginator(products.select_related('category'), 20)
     page = request.GET.get('page', 1)
     products = paginator.get_page(page)
     
-    categories = get_tenant_queryset(request, Category)
+    categories = get_categories(current_tenant())
     
     context = {
         'products': products,
@@ -82,10 +91,6 @@ def product_edit(request, pk):
     """تعديل منتج"""
     product = get_object_or_404(Product, pk=pk)
     
-    if not request.user.is_super_admin and product.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا المنتج')
-        return redirect('product_list')
-    
     if request.method == 'POST':
         form = ProductForm(request.POST, instance=product, tenant=request.user.tenant)
         if form.is_valid():
@@ -103,10 +108,6 @@ def product_detail(request, pk):
     """تفاصيل المنتج"""
     product = get_object_or_404(Product, pk=pk)
     
-    if not request.user.is_super_admin and product.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا المنتج')
-        return redirect('product_list')
-    
     items = product.items.all() if product.is_asset else None
     movements = product.stock_movements.all()[:20] if not product.is_asset else None
     
@@ -123,7 +124,7 @@ def product_detail(request, pk):
 @login_required
 def item_list(request):
     """قائمة عناصر المخزون (الأصول)"""
-    items = get_tenant_queryset(request, InventoryItem)
+    items = InventoryItem.objects.all()
     
     # Search
     search = request.GET.get('search', '')
@@ -154,7 +155,7 @@ def item_list(request):
     page = request.GET.get('page', 1)
     items = paginator.get_page(page)
     
-    categories = get_tenant_queryset(request, Category)
+    categories = get_categories(current_tenant())
     
     context = {
         'items': items,
@@ -188,10 +189,6 @@ def item_edit(request, pk):
     """تعديل عنصر مخزون"""
     item = get_object_or_404(InventoryItem, pk=pk)
     
-    if not request.user.is_super_admin and item.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا العنصر')
-        return redirect('item_list')
-    
     if request.method == 'POST':
         form = InventoryItemForm(request.POST, instance=item, tenant=request.user.tenant)
         if form.is_valid():
@@ -209,10 +206,6 @@ def item_detail(request, pk):
     """تفاصيل عنصر المخزون"""
     item = get_object_or_404(InventoryItem, pk=pk)
     
-    if not request.user.is_super_admin and item.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا العنصر')
-        return redirect('item_list')
-    
     return render(request, 'inventory/item_detail.html', {'item': item})
 
 
@@ -221,7 +214,7 @@ def item_detail(request, pk):
 @login_required
 def category_list(request):
     """قائمة الأصناف"""
-    categories = get_tenant_queryset(request, Category).filter(parent__isnull=True)
+    categories = Category.objects.filter(parent__isnull=True)
     return render(request, 'inventory/category_list.html', {'categories': categories})
 
 
@@ -247,7 +240,7 @@ def category_create(request):
 @login_required
 def supplier_list(request):
     """قائمة الموردين"""
-    suppliers = get_tenant_queryset(request, Supplier)
+    suppliers = Supplier.objects.all()
     
     search = request.GET.get('search', '')
     if search:
@@ -285,7 +278,7 @@ def supplier_create(request):
 @login_required
 def department_list(request):
     """قائمة المصالح"""
-    departments = get_tenant_queryset(request, Department)
+    departments = Department.objects.all()
     
     search = request.GET.get('search', '')
     if search:
@@ -318,13 +311,168 @@ def department_create(request):
     return render(request, 'inventory/department_form.html', {'form': form, 'title': 'إضافة مصلحة جديدة'})
 
 
+# ============== Stocktake ==============
+
+STOCKTAKE_ITEM_COLUMNS = [
+    ('inventory_number', 'رقم الجرد'),
+    ('barcode', 'الباركود'),
+    ('product__name', 'المنتج'),
+    ('location', 'الموقع'),
+    ('status', 'الحالة'),
+]
+
+STOCKTAKE_SCAN_COLUMNS = [
+    ('code', 'الرمز الممسوح'),
+    ('location', 'موقع المسح'),
+    ('scanned_at', 'تاريخ المسح'),
+]
+
+
+def get_stocktake_session(request, pk):
+    return get_object_or_404(StocktakeSession, pk=pk)
+
+
+@login_required
+def stocktake_list(request):
+    """قائمة جلسات الجرد الفعلي"""
+    sessions = StocktakeSession.objects.annotate(scan_count=Count('scans')).order_by('-created_at')
+    
+    paginator = Paginator(sessions, 20)
+    page = request.GET.get('page', 1)
+    sessions = paginator.get_page(page)
+    
+    return render(request, 'inventory/stocktake_list.html', {'sessions': sessions})
+
+
+@login_required
+def stocktake_create(request):
+    """فتح جلسة جرد جديدة"""
+    if not request.user.can_edit:
+        messages.error(request, 'ليس لديك صلاحية لفتح جلسة جرد')
+        return redirect('stocktake_list')
+    if request.user.tenant_id is None:
+        messages.error(request, 'يجب أن يكون حسابك تابعا لوحدة لفتح جلسة جرد')
+        return redirect('stocktake_list')
+    
+    if request.method == 'POST':
+        form = StocktakeSessionForm(request.POST)
+        if form.is_valid():
+            session = form.save(commit=False)
+            session.tenant = request.user.tenant
+            session.created_by = request.user
+            session.save()
+            messages.success(request, 'تم فتح جلسة الجرد بنجاح')
+            return redirect('stocktake_detail', pk=session.pk)
+    else:
+        form = StocktakeSessionForm()
+    
+    return render(request, 'inventory/stocktake_form.html', {'form': form, 'title': 'جلسة جرد جديدة'})
+
+
+@login_required
+def stocktake_detail(request, pk):
+    """جلسة الجرد: إضافة الرموز الممسوحة ونتيجة المطابقة"""
+    session = get_stocktake_session(request, pk)
+    
+    if request.method == 'POST':
+        form = StocktakeScanForm(request.POST)
+        if not request.user.can_edit:
+            messages.error(request, 'ليس لديك صلاحية لإضافة رموز ممسوحة')
+        elif not session.is_open:
+            messages.error(request, 'جلسة الجرد مغلقة')
+        elif form.is_valid():
+            count = record_scans(
+                session, parse_codes(form.cleaned_data['codes']),
+                user=request.user, location=form.cleaned_data['location'],
+            )
+            messages.success(request, f'تمت إضافة {count} رمز')
+            return redirect('stocktake_detail', pk=pk)
+    else:
+        form = StocktakeScanForm(initial={'location': session.location})
+    
+    category = request.GET.get('category', 'missing')
+    if category not in dict(RECONCILIATION_CATEGORIES):
+        category = 'missing'
+    rows = reconcile(session)[category]
+    if category != 'unexpected':
+        rows = rows.select_related('product')
+    
+    paginator = Paginator(rows.order_by('pk'), 50)
+    rows = paginator.get_page(request.GET.get('page', 1))
+    
+    return render(request, 'inventory/stocktake_detail.html', {
+        'session': session,
+        'form': form,
+        'summary': reconciliation_summary(session),
+        'categories': RECONCILIATION_CATEGORIES,
+        'category': category,
+        'rows': rows,
+    })
+
+
+@login_required
+@require_POST
+def stocktake_close(request, pk):
+    """إغلاق جلسة الجرد"""
+    session = get_stocktake_session(request, pk)
+    if not request.user.can_edit:
+        messages.error(request, 'ليس لديك صلاحية لإغلاق جلسة الجرد')
+    elif session.is_open:
+        session.status = 'closed'
+        session.closed_at = timezone.now()
+        session.save(update_fields=['status', 'closed_at'])
+        messages.success(request, 'تم إغلاق جلسة الجرد')
+    return redirect('stocktake_detail', pk=pk)
+
+
+@login_required
+def stocktake_export(request, pk, category):
+    """تصدير نتيجة المطابقة - CSV / NDJSON"""
+    session = get_stocktake_session(request, pk)
+    if category not in dict(RECONCILIATION_CATEGORIES):
+        category = 'missing'
+    rows = reconcile(session)[category].order_by('pk')
+    
+    columns = STOCKTAKE_SCAN_COLUMNS if category == 'unexpected' else STOCKTAKE_ITEM_COLUMNS
+    values = rows.values_list(*[field for field, _title in columns]).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return streaming_export(request, f'stocktake_{session.pk}_{category}', columns, values)
+
+
+@login_required
+@require_POST
+def stocktake_scans_api(request, pk):
+    """
+    استقبال دفعة من عمليات المسح من الماسحات المحمولة - JSON
+    Body: {"scans": [{"key": "...", "code": "...", "location": "..."}, ...]}
+    """
+    if not request.user.can_edit:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    session = get_stocktake_session(request, pk)
+    if not session.is_open:
+        return JsonResponse({'error': 'session closed'}, status=409)
+    try:
+        events = json.loads(request.body)['scans']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'invalid payload'}, status=400)
+    if not isinstance(events, list):
+        return JsonResponse({'error': 'invalid payload'}, status=400)
+    if len(events) > SCAN_API_MAX_EVENTS:
+        return JsonResponse({'error': f'at most {SCAN_API_MAX_EVENTS} scans per request'}, status=413)
+    
+    results = ingest_scan_events(session, events, user=request.user)
+    return JsonResponse({
+        'recorded': sum(result['status'] == 'recorded' for result in results),
+        'results': results,
+    })
+
+
 # ============== AJAX Endpoints ==============
 
 @login_required
 def search_items_ajax(request):
     """بحث ديناميكي عن عناصر المخزون"""
     query = request.GET.get('q', '')
-    items = get_tenant_queryset(request, InventoryItem).filter(
+    items = InventoryItem.objects.filter(
         Q(inventory_number__icontains=query) |
         Q(serial_number__icontains=query) |
         Q(product__name__icontains=query),
@@ -350,7 +498,7 @@ def search_products_ajax(request):
     query = request.GET.get('q', '')
     nature = request.GET.get('nature', '')
     
-    products = get_tenant_queryset(request, Product).filter(
+    products = Product.objects.filter(
         Q(name__icontains=query) |
         Q(code__icontains=query)
     )
@@ -369,8 +517,107 @@ def search_products_ajax(request):
             'nature': product.nature,
             'unit': product.get_unit_display(),
             'unit_price': str(product.unit_price),
+            'stock_quantity': product.stock_quantity,
+            'available_to_promise': product.available_to_promise,
         }
         for product in products
     ]
     
     return JsonResponse({'results': results})
+
+
+PRODUCT_PICKER_PAGE_SIZE = 25
+
+
+@login_required
+def product_picker_api(request):
+    """
+    قائمة اختيار المنتجات لنماذج الوصلات
+    Prefix search over the cached product list, one page at a time, with
+    the live stock, reservations and stock available to promise of the
+    returned products. Revalidated through the ETag.
+    """
+    tenant = current_tenant()
+    etag = reference_etag('product-picker', tenant, request.GET, ('q', 'nature', 'page'))
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    products = search_products(tenant, request.GET.get('q', ''), request.GET.get('nature') or None)
+    start = (page - 1) * PRODUCT_PICKER_PAGE_SIZE
+    selected = products[start:start + PRODUCT_PICKER_PAGE_SIZE]
+    
+    counters = {
+        pk: (stock, reserved)
+        for pk, stock, reserved in Product.objects.filter(
+            pk__in=[product.pk for product in selected]
+        ).values_list('pk', 'stock_quantity', 'reserved_quantity')
+    }
+    units = dict(Product.UNIT_CHOICES)
+    results = []
+    for product in selected:
+        stock, reserved = counters.get(product.pk, (0, 0))
+        results.append({
+            'id': product.pk,
+            'code': product.code,
+            'name': product.name,
+            'nature': product.nature,
+            'unit': units.get(product.unit, product.unit),
+            'unit_price': product.unit_price,
+            'stock': stock,
+            'reserved': reserved,
+            'available_to_promise': max(stock - reserved, 0),
+        })
+    response = JsonResponse({
+        'results': results,
+        'page': page,
+        'has_next': start + PRODUCT_PICKER_PAGE_SIZE < len(products),
+    })
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def product_assets_api(request, pk):
+    """
+    الأصول القابلة للاختيار لمنتج في وصل - JSON
+    ?purpose=exit|return|disposal, ?department= (return), ?q= prefix of the
+    inventory or serial number, ?after= id of the last unit of the previous
+    page, ?limit=
+    """
+    product = get_object_or_404(Product, pk=pk, nature='asset')
+    purpose = request.GET.get('purpose', 'exit')
+    if purpose not in ASSET_PURPOSE_STATUSES:
+        return JsonResponse({'error': 'invalid purpose'}, status=400)
+    try:
+        after = int(request.GET.get('after') or 0)
+        limit = min(max(int(request.GET.get('limit') or ASSET_PAGE_SIZE), 1), ASSET_PAGE_MAX_SIZE)
+        department = int(request.GET.get('department') or 0) or None
+    except ValueError:
+        return JsonResponse({'error': 'invalid parameters'}, status=400)
+    
+    rows, next_after = asset_page(
+        selectable_assets(product, purpose, department),
+        after=after, limit=limit, query=request.GET.get('q', '').strip(),
+    )
+    return JsonResponse({
+        'results': [
+            {
+                'id': row['pk'],
+                'inventory_number': row['inventory_number'],
+                'serial_number': row['serial_number'],
+                'barcode': row['barcode'],
+                'status': row['status'],
+                'condition': row['condition'],
+                'location': row['location'],
+                'assigned_to': row['assigned_to__name'],
+            }
+            for row in rows
+        ],
+        'next': next_after,
+    })
@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import DailyStats, ReportJob
 
-# Reports app has no models to register
+
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'voucher_type', 'tenant', 'voucher_count', 'line_quantity', 'line_value']
+    list_filter = ['voucher_type', 'tenant']
+    date_hierarchy = 'date'
+    ordering = ['-date']
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'tenant', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'tenant']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+    ordering = ['-created_at']
@@ -0,0 +1,187 @@
+"""
+Consumable consumption analytics - ABC classification and reorder points
+تحليل استهلاك المواد غير المجرودة - تصنيف ABC ونقاط إعادة الطلب
+
+The daily consumption of every consumable over the analysis window is read
+with one GROUP BY query into a (products x days) numpy matrix, and every
+figure - averages, peaks, ABC classes, reorder points and quantities - is
+computed for all the products in the same vectorized pass.
+
+Consumption is the quantity issued by exit vouchers ('out' movements).
+The reorder point covers the demand over the supplier lead time plus a
+safety stock (service level factor x daily deviation x sqrt(lead time)),
+and never falls below the product's min_stock. When the stock is at or
+under the reorder point, the suggested quantity refills up to the reorder
+point plus the demand of one review period.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import Product, StockMovement
+
+CONSUMPTION_WINDOW_DAYS = 90
+LEAD_TIME_DAYS = 14
+REVIEW_PERIOD_DAYS = 30
+# About 95% of lead times without a stock-out
+SERVICE_LEVEL_FACTOR = 1.65
+# Cumulative share of the consumed value closing the A and B classes
+ABC_THRESHOLDS = (0.80, 0.95)
+ABC_CLASSES = ['A', 'B', 'C']
+
+CONSUMPTION_COLUMNS = [
+    ('code', 'رمز المادة'),
+    ('name', 'المادة'),
+    ('unit', 'الوحدة'),
+    ('abc_class', 'الفئة'),
+    ('consumed', 'الكمية المستهلكة'),
+    ('consumed_value', 'قيمة الاستهلاك'),
+    ('daily_average', 'المعدل اليومي'),
+    ('daily_peak', 'أعلى استهلاك يومي'),
+    ('stock', 'المخزون'),
+    ('reorder_point', 'نقطة إعادة الطلب'),
+    ('order_quantity', 'الكمية المقترحة'),
+]
+
+
+def window_start(today, days=CONSUMPTION_WINDOW_DAYS):
+    """First day of the analysis window ending today (included)"""
+    return today - timedelta(days=days - 1)
+
+
+def load_consumption(products, today, days=CONSUMPTION_WINDOW_DAYS):
+    """
+    Product attributes as arrays and the (products x days) matrix of the
+    quantities issued each day of the window
+    """
+    rows = list(
+        products.order_by('pk').values_list(
+            'pk', 'code', 'name', 'unit', 'unit_price', 'stock_quantity', 'min_stock',
+        )
+    )
+    count = len(rows)
+    product_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+
+    first_day = window_start(today, days)
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    daily = (
+        StockMovement.objects.filter(
+            product__in=products, movement_type='out', created_at__gte=start,
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values_list('product_id', 'day')
+        .annotate(issued=Sum('quantity'))
+        .order_by()
+    )
+    series = np.zeros((count, days), dtype=np.float64)
+    movements = np.array(list(daily), dtype=object).reshape(-1, 3)
+    if count and len(movements):
+        positions = np.searchsorted(product_ids, movements[:, 0].astype(np.int64))
+        offsets = np.fromiter(
+            ((day - first_day).days for day in movements[:, 1]), dtype=np.int64, count=len(movements),
+        )
+        inside = (offsets >= 0) & (offsets < days)
+        # Issues are stored as negative quantities
+        np.add.at(series, (positions[inside], offsets[inside]), -movements[inside, 2].astype(np.float64))
+
+    return {
+        'code': [row[1] for row in rows],
+        'name': [row[2] for row in rows],
+        'unit': [row[3] for row in rows],
+        'unit_price': np.fromiter((row[4] for row in rows), dtype=np.float64, count=count),
+        'stock': np.fromiter((row[5] for row in rows), dtype=np.float64, count=count),
+        'min_stock': np.fromiter((row[6] for row in rows), dtype=np.float64, count=count),
+        'series': series,
+    }
+
+
+def abc_classes(values):
+    """Index in ABC_CLASSES of every product, by share of the consumed value"""
+    classes = np.full(len(values), len(ABC_CLASSES) - 1, dtype=np.int64)
+    total = values.sum()
+    if total <= 0:
+        return classes
+    order = np.argsort(-values, kind='stable')
+    # Share consumed by the products ranked before each one
+    preceding = (np.cumsum(values[order]) - values[order]) / total
+    ranked = np.searchsorted(np.array(ABC_THRESHOLDS), preceding, side='right')
+    classes[order] = np.where(values[order] > 0, ranked, len(ABC_CLASSES) - 1)
+    return classes
+
+
+def compute_consumption(products, today, days=CONSUMPTION_WINDOW_DAYS):
+    """Consumption figures and reorder suggestions of every product"""
+    data = load_consumption(products, today, days)
+    series = data['series']
+    consumed = series.sum(axis=1)
+    average = consumed / days
+    deviation = series.std(axis=1)
+
+    safety_stock = SERVICE_LEVEL_FACTOR * deviation * np.sqrt(LEAD_TIME_DAYS)
+    reorder_point = np.maximum(np.ceil(average * LEAD_TIME_DAYS + safety_stock), data['min_stock'])
+    needs_reorder = (reorder_point > 0) & (data['stock'] <= reorder_point)
+    order_up_to = reorder_point + np.ceil(average * REVIEW_PERIOD_DAYS)
+    order_quantity = np.where(needs_reorder, np.maximum(order_up_to - data['stock'], 0), 0)
+
+    data.update({
+        'consumed': consumed,
+        'consumed_value': consumed * data['unit_price'],
+        'daily_average': average,
+        'daily_peak': series.max(axis=1) if series.size else np.zeros(len(consumed)),
+        'reorder_point': reorder_point,
+        'order_quantity': order_quantity,
+        'needs_reorder': needs_reorder,
+    })
+    data['abc_class'] = abc_classes(data['consumed_value'])
+    return data
+
+
+def consumption_analysis(products, today, days=CONSUMPTION_WINDOW_DAYS):
+    """
+    Cacheable result of the analysis: per-class totals and one row per
+    product (tuples in CONSUMPTION_COLUMNS order plus the reorder flag),
+    products to reorder first, then by class and consumed value
+    """
+    data = compute_consumption(products, today, days)
+    units = dict(Product.UNIT_CHOICES)
+    classes = data['abc_class']
+    order = np.lexsort((-data['consumed_value'], classes, ~data['needs_reorder']))
+
+    rows = [
+        (
+            data['code'][position],
+            data['name'][position],
+            units.get(data['unit'][position], data['unit'][position]),
+            ABC_CLASSES[classes[position]],
+            int(data['consumed'][position]),
+            round(float(data['consumed_value'][position]), 2),
+            round(float(data['daily_average'][position]), 2),
+            int(data['daily_peak'][position]),
+            int(data['stock'][position]),
+            int(data['reorder_point'][position]),
+            int(data['order_quantity'][position]),
+            bool(data['needs_reorder'][position]),
+        )
+        for position in order.tolist()
+    ]
+
+    counts = np.bincount(classes, minlength=len(ABC_CLASSES))
+    values = np.bincount(classes, weights=data['consumed_value'], minlength=len(ABC_CLASSES))
+    return {
+        'date_from': window_start(today, days),
+        'date_to': today,
+        'rows': rows,
+        'classes': [
+            {'name': name, 'count': int(counts[index]), 'value': round(float(values[index]), 2)}
+            for index, name in enumerate(ABC_CLASSES)
+        ],
+        'summary': {
+            'products': len(rows),
+            'to_reorder': int(data['needs_reorder'].sum()),
+            'consumed_value': round(float(data['consumed_value'].sum()), 2),
+            'order_value': round(float((data['order_quantity'] * data['unit_price']).sum()), 2),
+        },
+    }
@@ -0,0 +1,195 @@
+"""
+Asset depreciation - net book value of inventory items per fiscal year
+اهتلاك الأصول - القيمة المحاسبية الصافية للمواد المجرودة حسب السنة المالية
+
+The items are read once with values_list into numpy arrays and every item is
+valued in the same vectorized pass. Depreciation starts at the purchase date
+(creation date when unknown) and follows the method and useful life of the
+item's category. The fiscal year is the calendar year; disposed items stay on
+the books of the years before their disposal voucher.
+
+Declining balance charges each year of service (counted from the start date)
+the higher of the declining charge, DECLINING_FACTOR / useful life of the
+value at the start of that year, and the straight-line charge of that value
+over the remaining life, so the value reaches zero exactly at the end of the
+useful life. A year's charge is spread evenly over the year. When the useful
+life is DECLINING_FACTOR years or less the declining rate would write off the
+whole cost in the first year; such items are depreciated straight-line.
+"""
+from datetime import date
+
+import numpy as np
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
+
+from inventory.models import Category
+from transactions.models import DisposalVoucherAsset
+from .exports import EXPORT_CHUNK_SIZE
+
+DEFAULT_METHOD = 'straight_line'
+DEFAULT_USEFUL_LIFE = 5
+# Declining balance rate = DECLINING_FACTOR / useful life (double declining balance)
+DECLINING_FACTOR = 2.0
+DAYS_PER_YEAR = 365.25
+
+VALUATION_COLUMNS = [
+    ('inventory_number', 'رقم الجرد'),
+    ('product_name', 'المنتج'),
+    ('category_name', 'الصنف'),
+    ('method', 'طريقة الاهتلاك'),
+    ('useful_life', 'مدة الاستعمال'),
+    ('start_date', 'بداية الاهتلاك'),
+    ('cost', 'القيمة الأصلية'),
+    ('charge', 'مخصص السنة'),
+    ('accumulated', 'مجمع الاهتلاك'),
+    ('net_book_value', 'القيمة الصافية'),
+]
+
+
+def fiscal_year_end(year):
+    return date(year, 12, 31)
+
+
+def depreciable_items(items, year):
+    """Items on the books at the end of the fiscal year: acquired by then, not yet disposed of"""
+    year_end = fiscal_year_end(year)
+    disposed_later = DisposalVoucherAsset.objects.filter(inventory_item=OuterRef('pk')).annotate(
+        disposed_on=Coalesce('voucher_item__voucher__disposal_date', 'voucher_item__voucher__date'),
+    ).filter(disposed_on__gt=year_end)
+    return items.filter(~Q(status='disposed') | Exists(disposed_later)).filter(
+        Q(purchase_date__lte=year_end)
+        | Q(purchase_date__isnull=True, created_at__date__lte=year_end)
+    )
+
+
+def load_assets(items):
+    """Pull the valuation inputs of the items into numpy arrays"""
+    rows = list(
+        items.order_by('pk').values_list(
+            'inventory_number', 'product__name', 'product__category_id',
+            'product__category__depreciation_method', 'product__category__useful_life_years',
+            'purchase_date', 'created_at', 'purchase_price',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    count = len(rows)
+    return {
+        'inventory_number': [row[0] for row in rows],
+        'product_name': [row[1] for row in rows],
+        'category_id': np.fromiter((row[2] or 0 for row in rows), dtype=np.int64, count=count),
+        'declining': np.fromiter(
+            ((row[3] or DEFAULT_METHOD) == 'declining_balance' for row in rows), dtype=bool, count=count,
+        ),
+        'life': np.fromiter((row[4] or DEFAULT_USEFUL_LIFE for row in rows), dtype=np.float64, count=count),
+        'start': np.array([row[5] or row[6].date() for row in rows], dtype='datetime64[D]'),
+        'cost': np.fromiter((row[7] for row in rows), dtype=np.float64, count=count),
+    }
+
+
+def declining_book_values(cost, life, elapsed):
+    """
+    Declining balance net book values after `elapsed` years, switching to
+    straight-line over the remaining life once that charges more
+    """
+    rate = DECLINING_FACTOR / life
+    years = np.floor(np.minimum(elapsed, life))
+    value = cost.copy()
+    charge = np.zeros_like(cost)
+    for year in range(int(np.ceil(life.max())) if len(life) else 0):
+        year_charge = np.maximum(value * rate, value / np.maximum(life - year, 1))
+        charge = np.where(years == year, year_charge, charge)
+        value = np.where(years > year, value - year_charge, value)
+    return np.where(elapsed >= life, 0, value - (elapsed - years) * charge)
+
+
+def net_book_values(assets, as_of):
+    """Net book value of every asset at the end of the day as_of"""
+    elapsed = (np.datetime64(as_of, 'D') - assets['start']).astype(np.float64) / DAYS_PER_YEAR
+    elapsed = np.clip(elapsed, 0, None)
+    life = assets['life']
+    cost = assets['cost']
+
+    straight = cost * (1 - np.minimum(elapsed / life, 1))
+    declining = declining_book_values(cost, life, elapsed)
+    return np.where(assets['declining'] & (life > DECLINING_FACTOR), declining, straight)
+
+
+def compute_valuation(items, year):
+    """
+    Valuation arrays of the items for a fiscal year: cost, depreciation charge
+    of the year, accumulated depreciation and net book value at year end
+    """
+    assets = load_assets(depreciable_items(items, year))
+    opening = net_book_values(assets, fiscal_year_end(year - 1))
+    closing = net_book_values(assets, fiscal_year_end(year))
+    # Items acquired during the year enter at cost
+    opening = np.where(assets['start'] > np.datetime64(fiscal_year_end(year - 1)), assets['cost'], opening)
+    assets['charge'] = opening - closing
+    assets['net_book_value'] = closing
+    assets['accumulated'] = assets['cost'] - closing
+    return assets
+
+
+def valuation_by_category(items, year):
+    """Totals per category and overall, summed with bincount over the arrays"""
+    assets = compute_valuation(items, year)
+    category_ids, index = np.unique(assets['category_id'], return_inverse=True)
+    totals = {
+        field: np.bincount(index, weights=assets[field], minlength=len(category_ids))
+        for field in ('cost', 'charge', 'accumulated', 'net_book_value')
+    }
+    counts = np.bincount(index, minlength=len(category_ids))
+
+    categories = Category.objects.in_bulk([int(pk) for pk in category_ids if pk])
+    rows = []
+    for position, category_id in enumerate(category_ids):
+        category = categories.get(int(category_id))
+        rows.append({
+            'category': category.name if category else '',
+            'method': category.get_depreciation_method_display() if category else '',
+            'useful_life': category.useful_life_years if category else DEFAULT_USEFUL_LIFE,
+            'count': int(counts[position]),
+            **{field: round(float(values[position]), 2) for field, values in totals.items()},
+        })
+    rows.sort(key=lambda row: row['net_book_value'], reverse=True)
+
+    summary = {
+        'count': len(assets['cost']),
+        **{field: round(float(assets[field].sum()), 2) for field in totals},
+    }
+    return {'year': year, 'categories': rows, 'summary': summary}
+
+
+def valuation_rows(items, year):
+    """Per-item rows of the valuation export"""
+    assets = compute_valuation(items, year)
+    categories = {
+        category.pk: category
+        for category in Category.objects.filter(pk__in=set(assets['category_id'].tolist()))
+    }
+    for position in range(len(assets['cost'])):
+        category = categories.get(int(assets['category_id'][position]))
+        yield (
+            assets['inventory_number'][position],
+            assets['product_name'][position],
+            category.name if category else '',
+            category.get_depreciation_method_display() if category else '',
+            int(assets['life'][position]),
+            str(assets['start'][position]),
+            round(float(assets['cost'][position]), 2),
+            round(float(assets['charge'][position]), 2),
+            round(float(assets['accumulated'][position]), 2),
+            round(float(assets['net_book_value'][position]), 2),
+        )
+
+
+def fiscal_years(items):
+    """Fiscal years offered in the report, from this year back to the oldest purchase"""
+    this_year = date.today().year
+    oldest = (
+        items.filter(purchase_date__isnull=False)
+        .order_by('purchase_date')
+        .values_list('purchase_date', flat=True)
+        .first()
+    )
+    first_year = min(oldest.year, this_year) if oldest else this_year
+    return list(range(this_year, first_year - 1, -1))
@@ -0,0 +1,218 @@
+"""
+Bulk data exports - rows are read in chunks and written incrementally
+تصدير البيانات - قراءة الصفوف على دفعات وكتابتها تدريجياً
+"""
+import csv
+import itertools
+import json
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from inventory.models import InventoryItem, StockMovement
+
+EXPORT_CHUNK_SIZE = 2000
+
+INVENTORY_COLUMNS = [
+    ('inventory_number', 'رقم الجرد'),
+    ('serial_number', 'الرقم التسلسلي'),
+    ('product__name', 'المنتج'),
+    ('product__category__name', 'الصنف'),
+    ('status', 'الحالة'),
+    ('condition', 'حالة المادة'),
+    ('assigned_to__name', 'المصلحة'),
+    ('purchase_price', 'سعر الشراء'),
+]
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+}
+# Rows are serialized in batches so each streamed chunk has a reasonable size
+ROWS_PER_CHUNK = 500
+
+MOVEMENT_COLUMNS = [
+    ('voucher_type', 'نوع الوصل'),
+    ('voucher_number', 'رقم الوصل'),
+    ('date', 'التاريخ'),
+    ('status', 'الحالة'),
+    ('party', 'المورد/المصلحة'),
+]
+
+STOCK_MOVEMENT_COLUMNS = [
+    ('created_at', 'التاريخ'),
+    ('product__code', 'رمز المادة'),
+    ('product__name', 'المادة'),
+    ('movement_type', 'نوع الحركة'),
+    ('quantity', 'الكمية'),
+    ('unit_price', 'سعر الوحدة'),
+    ('reference', 'المرجع'),
+]
+
+DISPOSED_COLUMNS = [
+    ('inventory_number', 'رقم الجرد'),
+    ('serial_number', 'الرقم التسلسلي'),
+    ('product__name', 'المنتج'),
+    ('product__category__name', 'الصنف'),
+    ('condition', 'حالة المادة'),
+    ('purchase_price', 'سعر الشراء'),
+    ('updated_at', 'تاريخ آخر تحديث'),
+]
+
+
+def inventory_rows(items):
+    """
+    Inventory report rows as tuples, read with a chunked server-side cursor.
+    Every joined column is selected, so no related object is loaded.
+    """
+    status_labels = dict(InventoryItem.STATUS_CHOICES)
+    condition_labels = dict(InventoryItem.CONDITION_CHOICES)
+    fields = [field for field, _header in INVENTORY_COLUMNS]
+    for row in items.order_by('pk').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        (inventory_number, serial_number, product_name, category_name,
+         status, condition, department_name, purchase_price) = row
+        yield (
+            inventory_number,
+            serial_number,
+            product_name,
+            category_name or '',
+            status_labels.get(status, status),
+            condition_labels.get(condition, condition),
+            department_name or '',
+            float(purchase_price),
+        )
+
+
+def write_inventory_workbook(rows, fileobj):
+    """Write the inventory rows to an .xlsx file using openpyxl write-only mode"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("تقرير الجرد")
+
+    header = []
+    for _field, title in INVENTORY_COLUMNS:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal='center')
+        header.append(cell)
+    ws.append(header)
+
+    for row in rows:
+        ws.append(row)
+
+    wb.save(fileobj)
+
+
+def movement_rows(vouchers_by_type):
+    """
+    Voucher headers of several types as one stream of rows.
+    vouchers_by_type is a list of (voucher_type, queryset, party_field).
+    """
+    for voucher_type, vouchers, party_field in vouchers_by_type:
+        status_labels = dict(vouchers.model.STATUS_CHOICES)
+        rows = (
+            vouchers.order_by('date', 'pk')
+            .values_list('voucher_number', 'date', 'status', party_field)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        for voucher_number, date, status, party in rows:
+            yield (voucher_type, voucher_number, date, status_labels.get(status, status), party or '')
+
+
+def stock_movement_rows(movements):
+    """StockMovement ledger rows, oldest first"""
+    type_labels = dict(StockMovement.MOVEMENT_TYPES)
+    fields = [field for field, _header in STOCK_MOVEMENT_COLUMNS]
+    rows = movements.order_by('created_at', 'pk').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for created_at, code, name, movement_type, quantity, unit_price, reference in rows:
+        yield (
+            timezone.localtime(created_at).strftime('%Y-%m-%d %H:%M'), code, name,
+            type_labels.get(movement_type, movement_type), quantity, unit_price, reference,
+        )
+
+
+def disposed_rows(items):
+    """Disposed inventory items"""
+    condition_labels = dict(InventoryItem.CONDITION_CHOICES)
+    fields = [field for field, _header in DISPOSED_COLUMNS]
+    rows = items.order_by('pk').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for inventory_number, serial_number, name, category, condition, price, updated_at in rows:
+        yield (
+            inventory_number, serial_number, name, category or '',
+            condition_labels.get(condition, condition), price,
+            timezone.localtime(updated_at).strftime('%Y-%m-%d %H:%M'),
+        )
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(columns, rows):
+    """CSV text with a BOM so spreadsheet tools detect UTF-8 (Arabic headers)"""
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow([title for _field, title in columns])
+    while True:
+        batch = list(itertools.islice(rows, ROWS_PER_CHUNK))
+        if not batch:
+            break
+        yield ''.join(writer.writerow(row) for row in batch)
+
+
+def ndjson_chunks(columns, rows):
+    """One JSON object per line, keyed by field name"""
+    keys = [field.replace('__', '_') for field, _title in columns]
+    while True:
+        batch = list(itertools.islice(rows, ROWS_PER_CHUNK))
+        if not batch:
+            break
+        yield ''.join(
+            json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=str) + '\n'
+            for row in batch
+        )
+
+
+def gzip_chunks(chunks):
+    """Compress text chunks on the fly into a gzip stream"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_export(request, name, columns, rows):
+    """
+    Stream rows as CSV (default) or NDJSON (?format=ndjson), gzip-compressed
+    when the client accepts it.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'csv'
+    content_type, extension = EXPORT_FORMATS[export_format]
+
+    rows = iter(rows)
+    chunks = csv_chunks(columns, rows) if export_format == 'csv' else ndjson_chunks(columns, rows)
+
+    gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if gzip:
+        chunks = gzip_chunks(chunks)
+    else:
+        chunks = (chunk.encode('utf-8') for chunk in chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}_{timezone.now().strftime("%Y%m%d")}.{extension}"'
+    )
+    return response
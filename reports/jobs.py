@@ -0,0 +1,179 @@
+"""
+Background report jobs - a lightweight queue stored in the database
+مهام التقارير في الخلفية - طابور بسيط مخزن في قاعدة البيانات
+
+Views enqueue a ReportJob and return immediately; the run_worker management
+command claims pending jobs, renders them in a thread or process pool and
+stores the result files under REPORT_JOBS_DIR. While a job runs, its worker
+refreshes the job's heartbeat on every poll; every worker puts back the jobs
+whose heartbeat stopped (their worker was killed).
+"""
+import os
+import socket
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction, connections
+from django.db.models import F
+from django.utils import timezone
+
+from core.routers import tenant_database
+from .models import ReportJob
+from .rendering import VOUCHER_MODELS, write_inventory_pdf, write_inventory_excel
+
+# Running jobs without a heartbeat for this long are considered lost (worker
+# killed); workers send one per poll, so this only has to exceed a poll interval
+STALE_AFTER = timedelta(minutes=2)
+
+
+def get_jobs_dir():
+    return Path(getattr(settings, 'REPORT_JOBS_DIR', settings.BASE_DIR / 'report_jobs'))
+
+
+def enqueue_job(kind, user, tenant_id=None, **params):
+    """Create a pending job for the worker"""
+    return ReportJob.objects.create(
+        kind=kind,
+        params=params,
+        tenant_id=tenant_id,
+        created_by=user,
+    )
+
+
+# ============== Job handlers ==============
+# Each handler writes the result into fileobj and returns the download file name,
+# or returns None when the job leaves no downloadable result
+
+def inventory_pdf_job(job, fileobj):
+    write_inventory_pdf(fileobj, job.tenant_id, job.params.get('filters'))
+    return f'inventory_report_{job.created_at.strftime("%Y%m%d")}.pdf'
+
+
+def inventory_excel_job(job, fileobj):
+    write_inventory_excel(fileobj, job.tenant_id, job.params.get('filters'))
+    return f'inventory_report_{job.created_at.strftime("%Y%m%d")}.xlsx'
+
+
+def voucher_pdf_job(job, fileobj):
+    """Pre-render a confirmed voucher into the PDF cache"""
+    from .pdf_cache import ensure_voucher_pdf
+    voucher_type = job.params['voucher_type']
+    voucher = VOUCHER_MODELS[voucher_type].objects.select_related('tenant').get(pk=job.params['voucher_id'])
+    ensure_voucher_pdf(voucher_type, voucher)
+    return None
+
+
+JOB_HANDLERS = {
+    'inventory_pdf': inventory_pdf_job,
+    'inventory_excel': inventory_excel_job,
+    'voucher_pdf': voucher_pdf_job,
+}
+
+
+# ============== Worker side ==============
+
+def get_worker_id():
+    """Identity of the current worker process, recorded on the jobs it claims"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_jobs(limit, worker=''):
+    """
+    Claim up to `limit` pending jobs, oldest first. Rows are locked where the
+    database supports it and the conditional update guarantees that a job is
+    only claimed by one worker.
+    """
+    if limit <= 0:
+        return []
+    claimed = []
+    with transaction.atomic():
+        candidates = list(
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('created_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        for pk in candidates:
+            now = timezone.now()
+            updated = ReportJob.objects.filter(pk=pk, status='pending').update(
+                status='running',
+                started_at=now,
+                worker=worker,
+                heartbeat_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if updated:
+                claimed.append(pk)
+    return claimed
+
+
+def send_heartbeat(worker, pks):
+    """Mark the jobs a worker is still rendering as alive"""
+    if not pks:
+        return 0
+    return ReportJob.objects.filter(pk__in=pks, status='running', worker=worker).update(
+        heartbeat_at=timezone.now(),
+    )
+
+
+def requeue_stale_jobs():
+    """Put back running jobs whose worker stopped sending heartbeats (it died)"""
+    return ReportJob.objects.filter(
+        status='running',
+        heartbeat_at__lt=timezone.now() - STALE_AFTER,
+    ).update(status='pending', worker='')
+
+
+def run_job(pk):
+    """Render a claimed job and record its result file or error"""
+    job = ReportJob.objects.get(pk=pk)
+    directory = get_jobs_dir() / str(job.pk)
+    directory.mkdir(parents=True, exist_ok=True)
+    partial = directory / 'result.part'
+
+    try:
+        handler = JOB_HANDLERS[job.kind]
+        # Read the database of the job's tenant (of its creator for a global report)
+        tenant_id = job.tenant_id or (job.created_by.tenant_id if job.created_by_id else None)
+        with open(partial, 'wb') as fileobj, tenant_database(tenant_id):
+            filename = handler(job, fileobj)
+        if filename:
+            result = directory / filename
+            os.replace(partial, result)
+            job.result_file = str(result.relative_to(get_jobs_dir()))
+            job.result_name = filename
+        else:
+            partial.unlink()
+            directory.rmdir()
+        job.status = 'done'
+        job.error = ''
+    except Exception:
+        job.status = 'failed'
+        job.error = traceback.format_exc()
+        if partial.exists():
+            partial.unlink()
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result_file', 'result_name', 'error', 'finished_at'])
+    return job
+
+
+def execute_job(pk):
+    """Entry point of the pool workers: run a job then release the DB connection"""
+    try:
+        return run_job(pk).status
+    finally:
+        connections.close_all()
+
+
+def init_worker_process():
+    """Process pool initializer: set up Django and drop inherited connections"""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def job_result_path(job):
+    return get_jobs_dir() / job.result_file
@@ -0,0 +1,137 @@
+"""
+Product stock ledger - opening balance, movements with running balance, closing balance
+سجل المخزون للمواد - الرصيد الافتتاحي، الحركات مع الرصيد الجاري، الرصيد الختامي
+
+Everything is computed by the database: balances and period totals with one
+GROUP BY query over the products, running balances with a window function over
+the (product, created_at) index. Lines are streamed, never loaded as a whole.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import F, Q, Sum, Window
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from inventory.models import StockMovement
+from .exports import EXPORT_CHUNK_SIZE
+
+LEDGER_COLUMNS = [
+    ('product_code', 'رمز المادة'),
+    ('product_name', 'المادة'),
+    ('date', 'التاريخ'),
+    ('movement_type', 'نوع الحركة'),
+    ('reference', 'المرجع'),
+    ('quantity_in', 'وارد'),
+    ('quantity_out', 'صادر'),
+    ('balance', 'الرصيد'),
+]
+
+OPENING_LABEL = 'رصيد افتتاحي'
+CLOSING_LABEL = 'رصيد ختامي'
+
+
+def period_bounds(date_from=None, date_to=None):
+    """
+    Aware datetimes [start, end) of a date range given as 'YYYY-MM-DD' strings,
+    so created_at is compared directly and the index can be used
+    """
+    start = end = None
+    if date_from and parse_date(date_from):
+        start = timezone.make_aware(datetime.combine(parse_date(date_from), time.min))
+    if date_to and parse_date(date_to):
+        end = timezone.make_aware(datetime.combine(parse_date(date_to) + timedelta(days=1), time.min))
+    return start, end
+
+
+def period_filter(start, end, prefix=''):
+    condition = Q()
+    if start:
+        condition &= Q(**{f'{prefix}created_at__gte': start})
+    if end:
+        condition &= Q(**{f'{prefix}created_at__lt': end})
+    return condition
+
+
+def ledger_summaries(products, start=None, end=None):
+    """
+    Products annotated with opening balance, totals of each movement type over
+    the period and closing balance - a single GROUP BY query
+    """
+    in_period = period_filter(start, end, 'stock_movements__')
+    before = Q(stock_movements__created_at__lt=start) if start else Q(pk__in=[])
+
+    aggregates = {
+        'opening': Coalesce(Sum('stock_movements__quantity', filter=before), 0),
+        'period_total': Coalesce(Sum('stock_movements__quantity', filter=in_period), 0),
+    }
+    for movement_type, _label in StockMovement.MOVEMENT_TYPES:
+        aggregates[f'{movement_type}_total'] = Coalesce(
+            Sum('stock_movements__quantity', filter=in_period & Q(stock_movements__movement_type=movement_type)),
+            0,
+        )
+    return (
+        products.order_by()
+        .annotate(**aggregates)
+        .annotate(closing=F('opening') + F('period_total'))
+        .order_by('code', 'pk')
+    )
+
+
+def ledger_lines(products, start=None, end=None):
+    """
+    Movements of the products over the period with the running sum of the
+    quantities of each product, computed in SQL (add the opening balance to
+    get the running balance)
+    """
+    return (
+        StockMovement.objects.filter(product__in=products.values('pk'))
+        .filter(period_filter(start, end))
+        .annotate(running_total=Window(
+            Sum('quantity'),
+            partition_by=[F('product_id')],
+            order_by=[F('created_at').asc(), F('pk').asc()],
+        ))
+        .order_by('product__code', 'product_id', 'created_at', 'pk')
+    )
+
+
+def with_balances(lines, opening):
+    """Add the running balance to ledger lines of a single product"""
+    for line in lines:
+        line.balance = opening + line.running_total
+        yield line
+
+
+def ledger_rows(products, start=None, end=None):
+    """
+    Rows of the ledger export: for each product an opening row, its movements
+    with the running balance and a closing row. Summaries and lines are read
+    in the same order and merged on the fly.
+    """
+    type_labels = dict(StockMovement.MOVEMENT_TYPES)
+    lines = (
+        ledger_lines(products, start, end)
+        .values_list('product_id', 'created_at', 'movement_type', 'reference', 'quantity', 'running_total')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    pending = next(lines, None)
+    opening_date = timezone.localtime(start).strftime('%Y-%m-%d') if start else ''
+    closing_date = timezone.localtime(end - timedelta(days=1)).strftime('%Y-%m-%d') if end else ''
+
+    summaries = ledger_summaries(products, start, end).values_list('pk', 'code', 'name', 'opening', 'closing')
+    for product_id, code, name, opening, closing in summaries.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (code, name, opening_date, OPENING_LABEL, '', '', '', opening)
+        while pending is not None and pending[0] == product_id:
+            _product_id, created_at, movement_type, reference, quantity, running_total = pending
+            yield (
+                code, name,
+                timezone.localtime(created_at).strftime('%Y-%m-%d %H:%M'),
+                type_labels.get(movement_type, movement_type),
+                reference,
+                quantity if quantity > 0 else '',
+                -quantity if quantity < 0 else '',
+                opening + running_total,
+            )
+            pending = next(lines, None)
+        yield (code, name, closing_date, CLOSING_LABEL, '', '', '', closing)
@@ -0,0 +1,74 @@
+"""
+Management command to measure the memory used by the inventory Excel export.
+Writes synthetic inventory rows with the write-only exporter (and optionally
+with a regular in-memory workbook) and reports the peak Python allocations,
+which should stay flat as the number of rows grows.
+"""
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from reports.exports import INVENTORY_COLUMNS, write_inventory_workbook
+
+
+def synthetic_rows(count):
+    for i in range(count):
+        yield (
+            f'INV-{i:08d}', f'SN-{i:010d}', 'حاسوب مكتبي', 'المعلومات الآلية',
+            'متوفر', 'جديد', 'مصلحة المحاسبة', 85000.0,
+        )
+
+
+def write_in_memory_workbook(rows, fileobj):
+    """The previous export: a regular workbook holding every cell in memory"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append([title for _field, title in INVENTORY_COLUMNS])
+    for row in rows:
+        ws.append(row)
+    wb.save(fileobj)
+
+
+class Command(BaseCommand):
+    help = 'Measure peak memory of the inventory Excel export for growing row counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[10000, 40000, 80000],
+            help='Row counts to benchmark',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also run the regular in-memory workbook for comparison',
+        )
+
+    def handle(self, *args, **options):
+        writers = [('write-only', write_inventory_workbook)]
+        if options['compare']:
+            writers.append(('in-memory', write_in_memory_workbook))
+
+        for name, writer in writers:
+            for count in options['rows']:
+                peak, elapsed, size = self.measure(writer, count)
+                self.stdout.write(
+                    f'{name:>10} {count:>8} rows: peak {peak / 1024 / 1024:8.1f} MB, '
+                    f'{elapsed:6.2f} s, file {size / 1024 / 1024:6.1f} MB'
+                )
+
+    def measure(self, writer, count):
+        with tempfile.TemporaryFile() as fileobj:
+            tracemalloc.start()
+            start = time.perf_counter()
+            writer(synthetic_rows(count), fileobj)
+            elapsed = time.perf_counter() - start
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            size = fileobj.tell()
+        return peak, elapsed, size
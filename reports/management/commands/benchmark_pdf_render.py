@@ -0,0 +1,82 @@
+"""
+Management command to compare cold and warm voucher PDF rendering.
+Cold renders build a new WeasyPrint state (fonts, stylesheets, assets) for
+every voucher, as before the render pool existed; warm renders go through the
+persistent pool of pdf_service. Per-voucher times are reported for both.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from reports import pdf_service
+from reports.rendering import VOUCHER_MODELS, VOUCHER_TEMPLATES, render_voucher_html
+
+
+class Command(BaseCommand):
+    help = 'Compare cold and warm per-voucher PDF render times'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vouchers',
+            type=int,
+            default=20,
+            help='Number of vouchers of each type to render',
+        )
+        parser.add_argument(
+            '--type',
+            choices=sorted(VOUCHER_MODELS),
+            help='Only render vouchers of this type',
+        )
+
+    def handle(self, *args, **options):
+        documents = self.load_documents(options['type'], options['vouchers'])
+        if not documents:
+            raise CommandError('No vouchers to render.')
+        self.stdout.write(f'Rendering {len(documents)} vouchers...')
+
+        cold = []
+        for html, template in documents:
+            start = time.perf_counter()
+            pdf_service.PdfRenderer().render(html, template)
+            cold.append(time.perf_counter() - start)
+        self.report('cold', cold, sum(cold))
+
+        # Start the pool and let every process warm up before timing
+        pool_size = pdf_service.get_pool_size()
+        for future in [pdf_service.submit_render(pdf_service.WARM_UP_HTML) for _i in range(max(1, pool_size))]:
+            future.result()
+
+        warm = []
+        for html, template in documents:
+            start = time.perf_counter()
+            pdf_service.render_pdf(html, template)
+            warm.append(time.perf_counter() - start)
+        self.report('warm', warm, sum(warm))
+
+        # Concurrent renders spread over the whole pool
+        start_all = time.perf_counter()
+        futures = [pdf_service.submit_render(html, template) for html, template in documents]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start_all
+        self.report(f'warm x{pool_size}', [elapsed / len(documents)] * len(documents), elapsed)
+
+        pdf_service.shutdown_pool()
+
+    def load_documents(self, voucher_type, count):
+        """Rendered HTML of the latest vouchers, so only the PDF step is timed"""
+        documents = []
+        for name, model in VOUCHER_MODELS.items():
+            if voucher_type and name != voucher_type:
+                continue
+            vouchers = model.objects.select_related('tenant').order_by('-pk')[:count]
+            for voucher in vouchers:
+                documents.append((render_voucher_html(name, voucher), VOUCHER_TEMPLATES[name]))
+        return documents
+
+    def report(self, name, timings, total):
+        self.stdout.write(
+            f'{name:>9}: median {statistics.median(timings) * 1000:8.1f} ms, '
+            f'mean {statistics.mean(timings) * 1000:8.1f} ms per voucher, '
+            f'total {total:6.2f} s'
+        )
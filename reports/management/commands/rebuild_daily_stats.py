@@ -0,0 +1,53 @@
+"""
+Management command to rebuild the DailyStats rollup from confirmed vouchers.
+Used for the initial backfill and to repair the rollup after manual data fixes.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from core.models import Tenant
+from reports.rollup import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily statistics rollup from confirmed vouchers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            help='Only rebuild the rollup of the tenant with this code',
+        )
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            help='First date to rebuild (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            help='Last date to rebuild (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        tenant = None
+        if options['tenant']:
+            try:
+                tenant = Tenant.objects.get(code=options['tenant'])
+            except Tenant.DoesNotExist:
+                raise CommandError(f"Tenant '{options['tenant']}' does not exist")
+
+        date_from = self.parse(options['date_from'])
+        date_to = self.parse(options['date_to'])
+
+        rows = rebuild_daily_stats(tenant=tenant, date_from=date_from, date_to=date_to)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Finished: {rows} rollup rows written.')
+        )
+
+    def parse(self, value):
+        if not value:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+        return date
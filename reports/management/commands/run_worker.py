@@ -0,0 +1,87 @@
+"""
+Management command to run the background report worker.
+Claims pending ReportJob rows and renders them in a thread or process pool,
+so PDF/Excel generation never ties up the web workers. Every poll refreshes
+the heartbeat of the running jobs and requeues the jobs of dead workers.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from reports.jobs import (
+    claim_jobs, execute_job, get_worker_id, init_worker_process, requeue_stale_jobs, send_heartbeat,
+)
+
+
+class Command(BaseCommand):
+    help = 'Run the background worker that renders queued reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 2,
+            help='Number of jobs rendered concurrently',
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Use a process pool instead of threads (CPU-bound PDF rendering)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the pending jobs and exit',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        worker_id = get_worker_id()
+
+        if options['processes']:
+            # Children must not share the parent's database connection
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.stdout.write(f'Worker started with {workers} {"processes" if options["processes"] else "threads"}.')
+
+        running = {}
+        try:
+            with executor:
+                while True:
+                    send_heartbeat(worker_id, list(running.values()))
+                    requeued = requeue_stale_jobs()
+                    if requeued:
+                        self.stdout.write(f'Requeued {requeued} stale jobs.')
+
+                    for pk in claim_jobs(workers - len(running), worker_id):
+                        running[executor.submit(execute_job, pk)] = pk
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    done, _pending = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pk = running.pop(future)
+                        try:
+                            status = future.result()
+                        except Exception as exc:
+                            status = f'crashed ({exc})'
+                        self.stdout.write(f'  job {pk}: {status}')
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker...')
+
+        self.stdout.write(self.style.SUCCESS('Worker stopped.'))
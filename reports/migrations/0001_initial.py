@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('voucher_type', models.CharField(choices=[('entry', 'دخول'), ('exit', 'إخراج'), ('return', 'إرجاع'), ('disposal', 'إتلاف')], max_length=20, verbose_name='نوع الوصل')),
+                ('voucher_count', models.PositiveIntegerField(default=0, verbose_name='عدد الوصلات')),
+                ('line_quantity', models.PositiveBigIntegerField(default=0, verbose_name='مجموع الكميات')),
+                ('line_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16, verbose_name='مجموع القيم')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='core.tenant', verbose_name='الوحدة')),
+            ],
+            options={
+                'verbose_name': 'إحصائية يومية',
+                'verbose_name_plural': 'الإحصائيات اليومية',
+                'ordering': ['-date', 'voucher_type'],
+                'unique_together': {('tenant', 'date', 'voucher_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_reportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='kind',
+            field=models.CharField(choices=[('inventory_pdf', 'تقرير الجرد PDF'), ('inventory_excel', 'تقرير الجرد Excel'), ('voucher_pdf', 'تحضير PDF وصل مؤكد')], max_length=30, verbose_name='نوع التقرير'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_heartbeats(apps, schema_editor):
+    """Jobs running before the upgrade count as alive since they started"""
+    db_alias = schema_editor.connection.alias
+    ReportJob = apps.get_model('reports', 'ReportJob')
+    ReportJob.objects.using(db_alias).filter(status='running').update(
+        heartbeat_at=F('started_at'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_alter_reportjob_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='worker',
+            field=models.CharField(blank=True, max_length=100, verbose_name='العامل'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='آخر إشارة من العامل'),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
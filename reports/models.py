@@ -1,3 +1,100 @@
+"""
+Reports models - Statistics rollups
+نماذج التقارير - جداول الإحصائيات المجمعة
+"""
 from django.db import models
+from decimal import Decimal
 
-# Reports app has no models - it only generates reports from other apps' data
+from core.tenancy import TenantManager
+
+
+class DailyStats(models.Model):
+    """إحصائيات يومية مجمعة لكل وحدة ونوع وصل"""
+    
+    VOUCHER_TYPES = [
+        ('entry', 'دخول'),
+        ('exit', 'إخراج'),
+        ('return', 'إرجاع'),
+        ('disposal', 'إتلاف'),
+    ]
+    
+    tenant = models.ForeignKey(
+        'core.Tenant',
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name='الوحدة'
+    )
+    date = models.DateField('التاريخ')
+    voucher_type = models.CharField('نوع الوصل', max_length=20, choices=VOUCHER_TYPES)
+    voucher_count = models.PositiveIntegerField('عدد الوصلات', default=0)
+    line_quantity = models.PositiveBigIntegerField('مجموع الكميات', default=0)
+    line_value = models.DecimalField('مجموع القيم', max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
+    
+    objects = TenantManager()
+    
+    class Meta:
+        verbose_name = 'إحصائية يومية'
+        verbose_name_plural = 'الإحصائيات اليومية'
+        ordering = ['-date', 'voucher_type']
+        unique_together = ['tenant', 'date', 'voucher_type']
+    
+    def __str__(self):
+        return f"{self.tenant} - {self.date} - {self.get_voucher_type_display()}"
+
+
+class ReportJob(models.Model):
+    """مهمة توليد تقرير في الخلفية"""
+    
+    KIND_CHOICES = [
+        ('inventory_pdf', 'تقرير الجرد PDF'),
+        ('inventory_excel', 'تقرير الجرد Excel'),
+        ('voucher_pdf', 'تحضير PDF وصل مؤكد'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'في الانتظار'),
+        ('running', 'قيد التنفيذ'),
+        ('done', 'مكتمل'),
+        ('failed', 'فشل'),
+    ]
+    
+    kind = models.CharField('نوع التقرير', max_length=30, choices=KIND_CHOICES)
+    params = models.JSONField('المعاملات', default=dict, blank=True)
+    status = models.CharField('الحالة', max_length=20, choices=STATUS_CHOICES, default='pending')
+    tenant = models.ForeignKey(
+        'core.Tenant',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name='الوحدة'
+    )
+    created_by = models.ForeignKey(
+        'core.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name='أنشئ بواسطة'
+    )
+    result_file = models.CharField('ملف النتيجة', max_length=500, blank=True)
+    result_name = models.CharField('اسم الملف', max_length=200, blank=True)
+    error = models.TextField('الخطأ', blank=True)
+    attempts = models.PositiveIntegerField('عدد المحاولات', default=0)
+    created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
+    started_at = models.DateTimeField('بداية التنفيذ', null=True, blank=True)
+    finished_at = models.DateTimeField('نهاية التنفيذ', null=True, blank=True)
+    worker = models.CharField('العامل', max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField('آخر إشارة من العامل', null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'مهمة تقرير'
+        verbose_name_plural = 'مهام التقارير'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} - {self.get_status_display()}"
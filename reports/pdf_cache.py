@@ -0,0 +1,79 @@
+"""
+Immutable cache of rendered voucher PDFs
+ذاكرة دائمة لملفات PDF للوصلات المؤكدة
+
+Confirmed vouchers never change, so their PDF is rendered once and stored on
+disk under a name built from the voucher type, tenant, id and updated_at.
+Any later update of the voucher changes the name, so a stale file is never
+served. The tenant is part of the name because voucher ids repeat across the
+tenant databases (see core/routers.py).
+"""
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .jobs import enqueue_job
+from .rendering import render_voucher_pdf
+
+
+def get_cache_dir():
+    return Path(getattr(settings, 'VOUCHER_PDF_CACHE_DIR', settings.BASE_DIR / 'pdf_cache'))
+
+
+def voucher_version(voucher):
+    """Version tag of a voucher, changes whenever the voucher is saved"""
+    return int(voucher.updated_at.timestamp() * 1_000_000)
+
+
+def voucher_key(voucher):
+    """Tenant and id of a voucher, unique across the tenant databases"""
+    return f'{voucher.tenant_id}-{voucher.pk}'
+
+
+def voucher_etag(voucher_type, voucher):
+    return f'"{voucher_type}-{voucher_key(voucher)}-{voucher_version(voucher)}"'
+
+
+def cached_pdf_path(voucher_type, voucher):
+    return (
+        get_cache_dir() / voucher_type / str(voucher.tenant_id)
+        / f'{voucher_key(voucher)}-{voucher_version(voucher)}.pdf'
+    )
+
+
+def is_cacheable(voucher):
+    return voucher.status == 'confirmed'
+
+
+def ensure_voucher_pdf(voucher_type, voucher):
+    """Return the path of the cached PDF, rendering and storing it on a miss"""
+    path = cached_pdf_path(voucher_type, voucher)
+    if path.exists():
+        return path
+
+    pdf = render_voucher_pdf(voucher_type, voucher)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write to a temporary file first so readers never see a partial PDF
+    fd, partial = tempfile.mkstemp(dir=path.parent, suffix='.part')
+    with os.fdopen(fd, 'wb') as fileobj:
+        fileobj.write(pdf)
+    os.replace(partial, path)
+
+    # Drop the files of older versions of the same voucher
+    for old in path.parent.glob(f'{voucher_key(voucher)}-*.pdf'):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def schedule_voucher_prerender(voucher_type, voucher, user=None):
+    """Queue the rendering of a confirmed voucher PDF for the background worker"""
+    return enqueue_job(
+        'voucher_pdf', user,
+        tenant_id=voucher.tenant_id,
+        voucher_type=voucher_type,
+        voucher_id=voucher.pk,
+    )
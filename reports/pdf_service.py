@@ -0,0 +1,373 @@
+"""
+PDF rendering service - WeasyPrint kept warm in a persistent process pool
+خدمة توليد ملفات PDF - محرك WeasyPrint جاهز في مجموعة عمليات دائمة
+
+Starting WeasyPrint is the expensive part of a small voucher PDF: font
+discovery, CSS parsing and loading of static assets. Each pool process builds
+one PdfRenderer holding a FontConfiguration, the pre-parsed stylesheet of every
+PDF template and the static assets in memory, and reuses it for all renders.
+Callers send rendered HTML (plain strings) and get PDF bytes back.
+
+A pool broken by a dead process (out of memory, crash, failed initializer)
+is discarded and started again on the next render; the renders it lost are
+done in the calling process.
+"""
+import atexit
+import io
+import itertools
+import mimetypes
+import multiprocessing
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import render_to_string
+
+# Base URL of the rendered documents; {% static %} URLs resolve under it
+ASSET_BASE_URL = 'https://pdf.ufas.local/'
+
+# Stylesheet of each PDF template (path under the static directories)
+PDF_STYLESHEETS = {
+    'reports/inventory_report_pdf.html': 'css/pdf/inventory_report.css',
+    'reports/voucher_entry_pdf.html': 'css/pdf/voucher_entry.css',
+    'reports/voucher_exit_pdf.html': 'css/pdf/voucher_exit.css',
+    'reports/voucher_return_pdf.html': 'css/pdf/voucher_return.css',
+    'reports/voucher_disposal_pdf.html': 'css/pdf/voucher_disposal.css',
+    'reports/page_numbers_pdf.html': 'css/pdf/page_numbers.css',
+}
+
+# Other static files the PDF templates may reference
+PDF_ASSETS = [
+    'img/logo-ufas.png',
+]
+
+# Small Arabic document rendered once per process to load the fonts
+WARM_UP_HTML = '<html dir="rtl"><body style="font-family: \'DejaVu Sans\'">جامعة فرحات عباس سطيف 1</body></html>'
+
+
+def static_url_prefix():
+    return ASSET_BASE_URL + settings.STATIC_URL.lstrip('/')
+
+
+def load_static_assets():
+    """Read the stylesheets and assets used by the PDF templates into memory"""
+    assets = {}
+    for path in [*PDF_STYLESHEETS.values(), *PDF_ASSETS]:
+        found = finders.find(path)
+        if found:
+            with open(found, 'rb') as fileobj:
+                assets[path] = fileobj.read()
+    return assets
+
+
+class PdfRenderer:
+    """Warm WeasyPrint state: fonts, parsed stylesheets and in-memory assets"""
+
+    def __init__(self):
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.font_config = FontConfiguration()
+        self.assets = load_static_assets()
+        self.stylesheets = {}
+        for template, path in PDF_STYLESHEETS.items():
+            if path in self.assets:
+                self.stylesheets[template] = CSS(
+                    string=self.assets[path].decode('utf-8'),
+                    base_url=static_url_prefix() + path,
+                    url_fetcher=self.fetch,
+                    font_config=self.font_config,
+                )
+
+    def fetch(self, url, timeout=10, ssl_context=None):
+        """URL fetcher answering static URLs from memory, other URLs as usual"""
+        prefix = static_url_prefix()
+        if url.startswith(prefix):
+            path = url[len(prefix):]
+            if path in self.assets:
+                return {
+                    'string': self.assets[path],
+                    'mime_type': mimetypes.guess_type(path)[0],
+                    'redirected_url': url,
+                }
+        from weasyprint import default_url_fetcher
+        return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context)
+
+    def render(self, html, template=None):
+        from weasyprint import HTML
+
+        stylesheets = [self.stylesheets[template]] if template in self.stylesheets else []
+        document = HTML(string=html, base_url=ASSET_BASE_URL, url_fetcher=self.fetch)
+        return document.write_pdf(stylesheets=stylesheets, font_config=self.font_config)
+
+    def warm_up(self):
+        self.render(WARM_UP_HTML)
+
+
+# ============== Per-process renderer ==============
+
+_renderer = None
+
+
+def get_renderer():
+    """The renderer of the current process, built on first use"""
+    global _renderer
+    if _renderer is None:
+        _renderer = PdfRenderer()
+        _renderer.warm_up()
+    return _renderer
+
+
+def render_in_process(html, template=None):
+    return get_renderer().render(html, template)
+
+
+def init_render_process():
+    """Process pool initializer: set up Django and warm the renderer"""
+    import django
+    django.setup()
+    get_renderer()
+
+
+# ============== Process pool ==============
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool_size():
+    return getattr(settings, 'PDF_RENDER_WORKERS', 2)
+
+
+def get_pool():
+    """The persistent render pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=get_pool_size(), initializer=init_render_process)
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def discard_pool(pool):
+    """Drop a broken pool; the next render starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def discard_if_broken(pool, future):
+    if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+        discard_pool(pool)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def use_pool():
+    # Pool processes (and run_worker --processes children) render in place
+    return get_pool_size() > 0 and multiprocessing.parent_process() is None
+
+
+def submit_render(html, template=None):
+    """Queue a render and return its Future (in-process result when the pool is off)"""
+    if use_pool():
+        pool = get_pool()
+        try:
+            future = pool.submit(render_in_process, html, template)
+        except BrokenProcessPool:
+            discard_pool(pool)
+            pool = get_pool()
+            future = pool.submit(render_in_process, html, template)
+        future.add_done_callback(partial(discard_if_broken, pool))
+        return future
+
+    future = Future()
+    try:
+        future.set_result(render_in_process(html, template))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def render_result(future, html, template=None):
+    """PDF bytes of a submitted render, rendered in process if the pool broke"""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        return render_in_process(html, template)
+
+
+def render_pdf(html, template=None):
+    """PDF bytes of a rendered HTML document, styled with the template's stylesheet"""
+    return render_result(submit_render(html, template), html, template)
+
+
+def render_many(documents, template=None):
+    """
+    Render HTML documents concurrently and yield their PDFs in order.
+    Only a couple of renders per pool process are in flight, so documents
+    are produced (and held in memory) just ahead of the pool.
+    """
+    limit = 2 * max(1, get_pool_size())
+    pending = deque()
+    for html in documents:
+        pending.append((submit_render(html, template), html))
+        if len(pending) >= limit:
+            yield render_result(*pending.popleft(), template)
+    while pending:
+        yield render_result(*pending.popleft(), template)
+
+
+# ============== Stitching ==============
+
+class PdfPageStream:
+    """
+    Write the pages of PDF parts straight into a file object. Each part's
+    objects are renumbered and written as soon as the part is added, so only
+    the cross-reference offsets and the page references stay in memory.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.position = 0
+        # Objects 1 and 2: the page tree and the catalog, written by close()
+        self.offsets = [None, None]
+        self.kids = []
+        self.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+    def reserve(self):
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def write_object(self, idnum, obj):
+        stream = io.BytesIO()
+        obj.write_to_stream(stream)
+        self.offsets[idnum - 1] = self.position
+        self.write(b'%d 0 obj\n%s\nendobj\n' % (idnum, stream.getvalue()))
+
+    def add_part(self, reader):
+        """Copy the pages of a PdfReader and every object they use"""
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+        new_ids = {}
+        pending = deque()
+
+        def reference(indirect):
+            if indirect.idnum not in new_ids:
+                new_ids[indirect.idnum] = self.reserve()
+                pending.append(indirect)
+            return IndirectObject(new_ids[indirect.idnum], 0, None)
+
+        def renumber(obj):
+            # Copies: direct objects may be shared by several pages of the reader
+            if isinstance(obj, IndirectObject):
+                return reference(obj)
+            if isinstance(obj, DictionaryObject):
+                copy = StreamObject() if isinstance(obj, StreamObject) else DictionaryObject()
+                if isinstance(obj, StreamObject):
+                    copy._data = obj._data
+                copy.update((NameObject(key), renumber(value)) for key, value in obj.items())
+                return copy
+            if isinstance(obj, ArrayObject):
+                return ArrayObject(renumber(value) for value in obj)
+            return obj
+
+        page_ids = set()
+        for page in reader.pages:
+            self.kids.append(reference(page.indirect_reference))
+            page_ids.add(page.indirect_reference.idnum)
+        while pending:
+            indirect = pending.popleft()
+            obj = indirect.get_object()
+            if indirect.idnum in page_ids:
+                # Pages hang from the single page tree of the output
+                obj = DictionaryObject({key: value for key, value in obj.items() if key != '/Parent'})
+                obj = renumber(obj)
+                obj[NameObject('/Parent')] = IndirectObject(1, 0, None)
+            else:
+                obj = renumber(obj)
+            self.write_object(new_ids[indirect.idnum], obj)
+
+    def close(self):
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+        self.write_object(1, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(self.kids),
+            NameObject('/Count'): NumberObject(len(self.kids)),
+        }))
+        self.write_object(2, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(1, 0, None),
+        }))
+        xref = self.position
+        entries = ''.join('%010d 00000 n \n' % offset for offset in self.offsets)
+        self.write((
+            f'xref\n0 {len(self.offsets) + 1}\n0000000000 65535 f \n{entries}'
+            f'trailer\n<< /Size {len(self.offsets) + 1} /Root 2 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+        ).encode('ascii'))
+
+
+def stamp_pages(part, stamp):
+    """PDF bytes of a part with the pages of a stamp document merged over its pages"""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(part)))
+    for page, stamp_page in zip(writer.pages, PdfReader(io.BytesIO(stamp)).pages):
+        page.merge_page(stamp_page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def write_stitched_pdf(fileobj, parts, numbered=True):
+    """
+    Concatenate PDF parts into fileobj. The parts are spooled to a temporary
+    file as they arrive and their pages counted; they are then written out
+    one at a time. With numbered, each part is first stamped with "page n of
+    total" from its page offset, so memory follows the part size rather than
+    the whole document.
+    """
+    from pypdf import PdfReader
+
+    template = 'reports/page_numbers_pdf.html'
+    with tempfile.TemporaryFile() as spool:
+        spans = []
+        for part in parts:
+            spans.append((spool.tell(), len(part), len(PdfReader(io.BytesIO(part)).pages)))
+            spool.write(part)
+        total = sum(pages for _start, _length, pages in spans)
+
+        def stamps():
+            offset = 0
+            for _start, _length, pages in spans:
+                numbers = range(offset + 1, offset + pages + 1)
+                yield render_to_string(template, {'numbers': numbers, 'total': total})
+                offset += pages
+
+        output = PdfPageStream(fileobj)
+        stamped = render_many(stamps(), template) if numbered else itertools.repeat(None)
+        for (start, length, _pages), stamp in zip(spans, stamped):
+            spool.seek(start)
+            part = spool.read(length)
+            if stamp is not None:
+                part = stamp_pages(part, stamp)
+            output.add_part(PdfReader(io.BytesIO(part)))
+        output.close()
@@ -0,0 +1,113 @@
+"""
+Report rendering - PDF and Excel documents, independent of the request
+توليد التقارير - ملفات PDF و Excel بمعزل عن الطلب
+"""
+from django.db.models import Count, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.models import Tenant
+from inventory.models import InventoryItem
+from transactions.models import EntryVoucher, ExitVoucher, ReturnVoucher, DisposalVoucher
+from .exports import write_inventory_workbook, inventory_rows
+from .pdf_service import render_pdf, render_many, write_stitched_pdf
+
+
+VOUCHER_MODELS = {
+    'entry': EntryVoucher,
+    'exit': ExitVoucher,
+    'return': ReturnVoucher,
+    'disposal': DisposalVoucher,
+}
+
+VOUCHER_TEMPLATES = {
+    'entry': 'reports/voucher_entry_pdf.html',
+    'exit': 'reports/voucher_exit_pdf.html',
+    'return': 'reports/voucher_return_pdf.html',
+    'disposal': 'reports/voucher_disposal_pdf.html',
+}
+
+# Items per separately rendered part of the inventory PDF, bounds the layout memory
+INVENTORY_PDF_CHUNK_ROWS = 1000
+
+
+def get_inventory_items(tenant_id=None, filters=None):
+    """Inventory items of a tenant (all tenants when tenant_id is None) with the report filters"""
+    items = InventoryItem.objects.all()
+    if tenant_id is not None:
+        items = items.filter(tenant_id=tenant_id)
+
+    filters = filters or {}
+    if filters.get('status'):
+        items = items.filter(status=filters['status'])
+    if filters.get('category'):
+        items = items.filter(product__category_id=filters['category'])
+    return items
+
+
+def html_to_pdf(html, template=None):
+    """Convert rendered HTML to PDF bytes with the warm WeasyPrint pool"""
+    return render_pdf(html, template)
+
+
+def iter_chunks(items, size):
+    """Model instances in chunks of `size`, read with keyset pagination on pk"""
+    last_pk = None
+    while True:
+        page = items.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        chunk = list(page[:size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def write_inventory_pdf(fileobj, tenant_id=None, filters=None):
+    """
+    تقرير جرد المخزون - PDF
+    The report is rendered in chunks of INVENTORY_PDF_CHUNK_ROWS items, in
+    parallel on the render pool, then stitched and numbered as one document.
+    """
+    template = 'reports/inventory_report_pdf.html'
+    items = get_inventory_items(tenant_id, filters).select_related('product__category', 'assigned_to')
+
+    summary = items.aggregate(total=Count('pk'), total_value=Sum('purchase_price'))
+    summary['total_value'] = summary['total_value'] or 0
+    context = {
+        'summary': summary,
+        'tenant': Tenant.objects.filter(pk=tenant_id).first() if tenant_id else None,
+        'date': timezone.now(),
+    }
+
+    def documents():
+        # The report header is only printed at the top of the first chunk
+        first = True
+        for chunk in iter_chunks(items, INVENTORY_PDF_CHUNK_ROWS):
+            yield render_to_string(template, {**context, 'items': chunk, 'first_chunk': first})
+            first = False
+        if first:
+            yield render_to_string(template, {**context, 'items': [], 'first_chunk': True})
+
+    write_stitched_pdf(fileobj, render_many(documents(), template))
+
+
+def write_inventory_excel(fileobj, tenant_id=None, filters=None):
+    """تقرير جرد المخزون - Excel"""
+    write_inventory_workbook(inventory_rows(get_inventory_items(tenant_id, filters)), fileobj)
+
+
+def render_voucher_html(voucher_type, voucher):
+    """HTML of a printable voucher, headed with the voucher's own tenant"""
+    items = voucher.items.select_related('product').prefetch_related('assets__inventory_item')
+    return render_to_string(VOUCHER_TEMPLATES[voucher_type], {
+        'voucher': voucher,
+        'items': items,
+        'tenant': voucher.tenant,
+    })
+
+
+def render_voucher_pdf(voucher_type, voucher):
+    """طباعة وصل - PDF"""
+    return html_to_pdf(render_voucher_html(voucher_type, voucher), VOUCHER_TEMPLATES[voucher_type])
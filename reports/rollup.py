@@ -0,0 +1,111 @@
+"""
+Daily statistics rollup - kept current on voucher confirmation
+تجميع الإحصائيات اليومية - يُحدَّث عند تأكيد الوصلات
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count, F, DecimalField, ExpressionWrapper
+
+from core.routers import each_tenant_database, tenant_database
+from transactions.models import EntryVoucher, ExitVoucher, ReturnVoucher, DisposalVoucher
+from .models import DailyStats
+
+
+VOUCHER_MODELS = {
+    'entry': EntryVoucher,
+    'exit': ExitVoucher,
+    'return': ReturnVoucher,
+    'disposal': DisposalVoucher,
+}
+
+
+def line_value_expression(voucher_type, prefix=''):
+    """
+    Value of a voucher line: entry lines carry their own unit price,
+    the other voucher types are valued at the product unit price.
+    """
+    price = f'{prefix}unit_price' if voucher_type == 'entry' else f'{prefix}product__unit_price'
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(price),
+        output_field=DecimalField(max_digits=16, decimal_places=2),
+    )
+
+
+def record_voucher(voucher_type, voucher):
+    """Add a confirmed voucher to the rollup row of its tenant, date and type"""
+    totals = voucher.items.aggregate(
+        total_quantity=Sum('quantity'),
+        total_value=Sum(line_value_expression(voucher_type)),
+    )
+    with transaction.atomic():
+        stats, _created = DailyStats.objects.get_or_create(
+            tenant_id=voucher.tenant_id,
+            date=voucher.date,
+            voucher_type=voucher_type,
+        )
+        DailyStats.objects.filter(pk=stats.pk).update(
+            voucher_count=F('voucher_count') + 1,
+            line_quantity=F('line_quantity') + (totals['total_quantity'] or 0),
+            line_value=F('line_value') + (totals['total_value'] or Decimal('0.00')),
+        )
+
+
+def rebuild_daily_stats(tenant=None, date_from=None, date_to=None):
+    """
+    Recompute the rollup from the confirmed vouchers, read from every tenant
+    database. Returns the number of rollup rows written.
+    """
+    contexts = [tenant_database(tenant)] if tenant is not None else each_tenant_database()
+    rows = []
+    for context in contexts:
+        with context:
+            rows.extend(rollup_rows(tenant, date_from, date_to))
+
+    existing = DailyStats.objects.all()
+    if tenant is not None:
+        existing = existing.filter(tenant=tenant)
+    if date_from:
+        existing = existing.filter(date__gte=date_from)
+    if date_to:
+        existing = existing.filter(date__lte=date_to)
+
+    with transaction.atomic():
+        existing.delete()
+        DailyStats.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def rollup_rows(tenant=None, date_from=None, date_to=None):
+    """Unsaved rollup rows of the confirmed vouchers of the current database"""
+    rows = []
+    for voucher_type, model in VOUCHER_MODELS.items():
+        vouchers = model.objects.filter(status='confirmed')
+        if tenant is not None:
+            vouchers = vouchers.filter(tenant=tenant)
+        if date_from:
+            vouchers = vouchers.filter(date__gte=date_from)
+        if date_to:
+            vouchers = vouchers.filter(date__lte=date_to)
+
+        totals = (
+            vouchers.order_by()
+            .values('tenant_id', 'date')
+            .annotate(
+                voucher_count=Count('id', distinct=True),
+                total_quantity=Sum('items__quantity'),
+                total_value=Sum(line_value_expression(voucher_type, prefix='items__')),
+            )
+        )
+        rows.extend(
+            DailyStats(
+                tenant_id=row['tenant_id'],
+                date=row['date'],
+                voucher_type=voucher_type,
+                voucher_count=row['voucher_count'],
+                line_quantity=row['total_quantity'] or 0,
+                line_value=row['total_value'] or Decimal('0.00'),
+            )
+            for row in totals
+        )
+    return rows
@@ -1,3 +1,756 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import re
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from core.cache import MAX_REPORT_PAYLOAD_SIZE, REPORT_CACHE_ALIAS, get_report_payload
+from core.events import LocalBroadcaster, publish_stock_change
+from core.models import Tenant, User
+from inventory.models import Category, InventoryItem, Product, StockMovement
+from transactions.models import (
+    DisposalVoucher, DisposalVoucherAsset, DisposalVoucherItem, EntryVoucher, EntryVoucherItem, ExitVoucher,
+    ExitVoucherItem,
+)
+from . import pdf_service
+from .consumption import abc_classes, consumption_analysis
+from .depreciation import DAYS_PER_YEAR, declining_book_values, depreciable_items, net_book_values
+from .ledger import CLOSING_LABEL, OPENING_LABEL, ledger_lines, ledger_rows, ledger_summaries, period_bounds
+from .jobs import JOB_HANDLERS, STALE_AFTER, claim_jobs, enqueue_job, requeue_stale_jobs, run_job, send_heartbeat
+from .models import DailyStats, ReportJob
+from .rendering import write_inventory_excel
+from .rollup import record_voucher
+from .pdf_cache import ensure_voucher_pdf, voucher_etag
+
+
+class DepreciationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        product = Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+        cls.kept = InventoryItem.objects.create(
+            product=product, inventory_number='INV-1', purchase_date=date(2020, 1, 1),
+            purchase_price=Decimal('1000.00'), tenant=cls.tenant,
+        )
+        cls.disposed = InventoryItem.objects.create(
+            product=product, inventory_number='INV-2', purchase_date=date(2020, 1, 1), status='disposed',
+            purchase_price=Decimal('1000.00'), tenant=cls.tenant,
+        )
+        voucher = DisposalVoucher.objects.create(
+            voucher_number='DSP-1', date=date(2023, 6, 1), disposal_date=date(2023, 6, 15),
+            disposal_reason='damaged', tenant=cls.tenant,
+        )
+        line = DisposalVoucherItem.objects.create(voucher=voucher, product=product)
+        DisposalVoucherAsset.objects.create(voucher_item=line, inventory_item=cls.disposed)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_disposed_items_stay_on_the_books_of_earlier_years(self):
+        items = InventoryItem.objects.all()
+        self.assertEqual(set(depreciable_items(items, 2022)), {self.kept, self.disposed})
+        self.assertEqual(set(depreciable_items(items, 2023)), {self.kept})
+
+    def test_declining_balance_switches_to_straight_line(self):
+        values = declining_book_values(
+            np.full(7, 1000.0), np.full(7, 5.0), np.array([0, 1, 2, 3, 3.5, 4.5, 5]),
+        )
+        # 40% a year until the straight-line charge of the remaining life is higher
+        np.testing.assert_allclose(values, [1000, 600, 360, 216, 162, 54, 0])
+
+    def test_short_life_declining_balance_is_straight_line(self):
+        assets = {
+            'declining': np.array([True, True]),
+            'life': np.array([2.0, 5.0]),
+            'start': np.array(['2024-01-01', '2024-01-01'], dtype='datetime64[D]'),
+            'cost': np.array([1000.0, 1000.0]),
+        }
+        values = net_book_values(assets, date(2024, 1, 31))
+        elapsed = 30 / DAYS_PER_YEAR
+        np.testing.assert_allclose(values, [1000 * (1 - elapsed / 2), 1000 * (1 - 0.4 * elapsed)])
+
+    def test_out_of_range_year_falls_back_to_this_year(self):
+        self.client.force_login(self.user)
+        for year in ('0', '1', '99999', 'x'):
+            response = self.client.get(reverse('depreciation_report'), {'year': year})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['year'], timezone.now().year)
+
+
+class VoucherPdfCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(VOUCHER_PDF_CACHE_DIR=directory))
+        self.render = self.enterContext(mock.patch(
+            'reports.pdf_cache.render_voucher_pdf', side_effect=lambda kind, voucher: voucher.tenant.code.encode(),
+        ))
+
+    def test_tenants_with_the_same_voucher_id_do_not_share_files(self):
+        science = Tenant.objects.create(name='كلية العلوم', code='FS')
+        medicine = Tenant.objects.create(name='كلية الطب', code='FM')
+        voucher = ExitVoucher.objects.create(
+            voucher_number='EXT-1', date=date(2024, 1, 1), status='confirmed', tenant=science,
+        )
+        # The same id in another tenant database
+        twin = ExitVoucher(
+            pk=voucher.pk, voucher_number='EXT-1', date=voucher.date, status='confirmed',
+            updated_at=voucher.updated_at, tenant=medicine,
+        )
+        self.assertNotEqual(voucher_etag('exit', voucher), voucher_etag('exit', twin))
+        path = ensure_voucher_pdf('exit', voucher)
+        twin_path = ensure_voucher_pdf('exit', twin)
+        self.assertNotEqual(path, twin_path)
+        self.assertEqual((path.read_bytes(), twin_path.read_bytes()), (b'FS', b'FM'))
+
+    def test_confirmed_voucher_is_served_from_the_cache(self):
+        tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        user = User.objects.create_user('clerk', password='pass12345', tenant=tenant, role='staff')
+        voucher = ExitVoucher.objects.create(
+            voucher_number='EXT-1', date=date(2024, 1, 1), status='confirmed', tenant=tenant,
+        )
+        self.client.force_login(user)
+        url = reverse('voucher_pdf', args=['exit', voucher.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'FS')
+        response.close()
+        self.assertEqual(response['ETag'], voucher_etag('exit', voucher))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'FS')
+        response.close()
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_confirmation_queues_the_prerender(self):
+        tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        user = User.objects.create_user('clerk', password='pass12345', tenant=tenant, role='staff')
+        voucher = ExitVoucher.objects.create(voucher_number='EXT-1', date=date(2024, 1, 1), tenant=tenant)
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('exit_voucher_confirm', args=[voucher.pk]))
+        job = ReportJob.objects.get(kind='voucher_pdf')
+        self.assertEqual(job.params, {'voucher_type': 'exit', 'voucher_id': voucher.pk})
+
+        jobs_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, jobs_dir)
+        with self.settings(REPORT_JOBS_DIR=jobs_dir):
+            self.assertEqual(run_job(job.pk).status, 'done')
+        voucher.refresh_from_db()
+        self.assertEqual(ensure_voucher_pdf('exit', voucher).read_bytes(), b'FS')
+        self.assertEqual(self.render.call_count, 1)
+
+
+@override_settings(PDF_RENDER_WORKERS=2)
+class PdfRenderPoolTests(TestCase):
+
+    def setUp(self):
+        self.pools = []
+        self.enterContext(mock.patch.object(pdf_service, '_pool', None))
+        self.enterContext(mock.patch('reports.pdf_service.atexit'))
+        self.enterContext(mock.patch('reports.pdf_service.ProcessPoolExecutor', side_effect=self.new_pool))
+        self.enterContext(mock.patch('reports.pdf_service.render_in_process', return_value=b'%PDF-local'))
+
+    def new_pool(self, **kwargs):
+        pool = mock.Mock()
+        pool.submit.return_value = self.done(b'%PDF-pool')
+        self.pools.append(pool)
+        return pool
+
+    @staticmethod
+    def done(result=None, exception=None):
+        future = Future()
+        if exception:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+        return future
+
+    def test_lost_render_falls_back_and_pool_is_replaced(self):
+        pdf_service.get_pool().submit.return_value = self.done(exception=BrokenProcessPool())
+        self.assertEqual(pdf_service.render_pdf('<p>1</p>'), b'%PDF-local')
+        self.pools[0].shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        self.assertIsNone(pdf_service._pool)
+
+        self.assertEqual(pdf_service.render_pdf('<p>2</p>'), b'%PDF-pool')
+        self.assertEqual(len(self.pools), 2)
+        self.assertIs(pdf_service._pool, self.pools[1])
+
+    def test_submit_to_a_broken_pool_retries_on_a_new_one(self):
+        pdf_service.get_pool().submit.side_effect = BrokenProcessPool()
+        self.assertEqual(pdf_service.render_pdf('<p>1</p>'), b'%PDF-pool')
+        self.pools[0].shutdown.assert_called_once()
+        self.assertIs(pdf_service._pool, self.pools[1])
+
+    @override_settings(PDF_RENDER_WORKERS=0)
+    def test_renders_in_process_without_pool(self):
+        self.assertEqual(list(pdf_service.render_many(['<p>1</p>', '<p>2</p>'])), [b'%PDF-local'] * 2)
+        self.assertEqual(self.pools, [])
+
+
+def text_pdf(*texts):
+    """PDF bytes with one page per text, the pages sharing one font object"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for text in texts:
+        page = writer.add_blank_page(200, 200)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+        })
+        content = DecodedStreamObject()
+        content.set_data(f'BT /F1 12 Tf 20 100 Td ({text}) Tj ET'.encode('ascii'))
+        page[NameObject('/Contents')] = writer._add_object(content)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def fake_page_numbers(documents, template=None):
+    """render_many stand-in: one page per page-number label of each stamp document"""
+    for html in documents:
+        yield text_pdf(*(f'{number}/{total}' for number, total in re.findall(r'صفحة (\d+) من (\d+)', html)))
+
+
+class PdfStitchingTests(TestCase):
+
+    def page_texts(self, fileobj):
+        fileobj.seek(0)
+        return [page.extract_text() for page in PdfReader(fileobj, strict=True).pages]
+
+    def test_page_stream_opens_in_pypdf(self):
+        fileobj = io.BytesIO()
+        stream = pdf_service.PdfPageStream(fileobj)
+        stream.add_part(PdfReader(io.BytesIO(text_pdf('A1', 'A2'))))
+        stream.add_part(PdfReader(io.BytesIO(text_pdf('B1'))))
+        stream.close()
+        self.assertEqual(self.page_texts(fileobj), ['A1', 'A2', 'B1'])
+
+    def test_pages_are_numbered_across_parts(self):
+        parts = [text_pdf('A1', 'A2'), text_pdf('B1'), text_pdf('C1', 'C2', 'C3')]
+        fileobj = io.BytesIO()
+        with mock.patch('reports.pdf_service.render_many', side_effect=fake_page_numbers):
+            pdf_service.write_stitched_pdf(fileobj, iter(parts))
+        texts = self.page_texts(fileobj)
+        self.assertEqual(len(texts), 6)
+        for number, (text, original) in enumerate(zip(texts, ['A1', 'A2', 'B1', 'C1', 'C2', 'C3']), 1):
+            self.assertIn(original, text)
+            self.assertIn(f'{number}/6', text)
+
+    def test_unnumbered_parts_are_not_stamped(self):
+        fileobj = io.BytesIO()
+        with mock.patch('reports.pdf_service.render_many') as render_many:
+            pdf_service.write_stitched_pdf(fileobj, [text_pdf('A1'), text_pdf('B1', 'B2')], numbered=False)
+        render_many.assert_not_called()
+        self.assertEqual(self.page_texts(fileobj), ['A1', 'B1', 'B2'])
+
+
+class LiveEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.other = Tenant.objects.create(name='كلية الطب', code='FM')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_events_reach_their_tenant_and_the_global_stream(self):
+        broadcaster = LocalBroadcaster()
+
+        async def deliver():
+            own, foreign, everything = (
+                broadcaster.subscribe(self.tenant.pk), broadcaster.subscribe(self.other.pk), broadcaster.subscribe(None),
+            )
+            broadcaster.publish(self.tenant.pk, 'event: stock_changed\n\n')
+            await asyncio.sleep(0)
+            broadcaster.unsubscribe(self.tenant.pk, own)
+            broadcaster.publish(self.tenant.pk, 'event: low_stock\n\n')
+            await asyncio.sleep(0)
+            return [[queue.get_nowait() for _ in range(queue.qsize())] for queue in (own, foreign, everything)]
+
+        own, foreign, everything = asyncio.run(deliver())
+        self.assertEqual(own, ['event: stock_changed\n\n'])
+        self.assertEqual(foreign, [])
+        self.assertEqual(everything, ['event: stock_changed\n\n', 'event: low_stock\n\n'])
+
+    def test_stock_events_are_published_on_commit(self):
+        product = Product.objects.create(
+            name='ورق', code='PAP', nature='consumable', min_stock=5, stock_quantity=3, tenant=self.tenant,
+        )
+        with mock.patch('core.events.get_broadcaster') as get_broadcaster:
+            with self.captureOnCommitCallbacks(execute=True):
+                publish_stock_change(product, 8)
+                get_broadcaster.assert_not_called()
+        publish = get_broadcaster.return_value.publish
+        self.assertEqual([call.args[0] for call in publish.call_args_list], [self.tenant.pk] * 2)
+        self.assertEqual(
+            [call.args[1].split('\n')[0] for call in publish.call_args_list],
+            ['event: stock_changed', 'event: low_stock'],
+        )
+        self.assertEqual(
+            json.loads(publish.call_args_list[0].args[1].split('data: ')[1]),
+            {'product_id': product.pk, 'stock_quantity': 3},
+        )
+
+    def test_stream_is_not_served_under_wsgi(self):
+        user = User.objects.create_user('clerk', password='pass12345', tenant=self.tenant, role='staff')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('event_stream')).status_code, 204)
+
+
+class ReportJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(REPORT_JOBS_DIR=directory))
+
+    def enqueue(self, count=1):
+        return [enqueue_job('inventory_pdf', self.user, tenant_id=self.tenant.pk) for _ in range(count)]
+
+    def test_each_job_is_claimed_once(self):
+        jobs = self.enqueue(3)
+        first = claim_jobs(2, 'host:1')
+        second = claim_jobs(2, 'host:2')
+        self.assertEqual(first, [jobs[0].pk, jobs[1].pk])
+        self.assertEqual(second, [jobs[2].pk])
+        self.assertEqual(claim_jobs(2, 'host:3'), [])
+        job = ReportJob.objects.get(pk=jobs[2].pk)
+        self.assertEqual((job.status, job.worker, job.attempts), ('running', 'host:2', 1))
+
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        lost, alive = self.enqueue(2)
+        claim_jobs(2, 'host:1')
+        long_ago = timezone.now() - STALE_AFTER * 10
+        ReportJob.objects.update(started_at=long_ago, heartbeat_at=long_ago)
+        # A worker still rendering a long job keeps it alive
+        self.assertEqual(send_heartbeat('host:1', [alive.pk]), 1)
+        self.assertEqual(send_heartbeat('host:2', [lost.pk]), 0)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        lost.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((lost.status, lost.worker), ('pending', ''))
+        self.assertEqual(alive.status, 'running')
+        self.assertEqual(claim_jobs(1, 'host:2'), [lost.pk])
+
+    def test_run_job_stores_the_result(self):
+        job, = self.enqueue()
+
+        def handler(job, fileobj):
+            fileobj.write(b'%PDF')
+            return 'report.pdf'
+
+        with mock.patch.dict(JOB_HANDLERS, {'inventory_pdf': handler}):
+            job = run_job(job.pk)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result_file, f'{job.pk}/report.pdf')
+        self.assertEqual((Path(settings.REPORT_JOBS_DIR) / job.result_file).read_bytes(), b'%PDF')
+
+    def test_run_job_records_the_failure(self):
+        job, = self.enqueue()
+
+        def handler(job, fileobj):
+            fileobj.write(b'%PD')
+            raise RuntimeError('render failed')
+
+        with mock.patch.dict(JOB_HANDLERS, {'inventory_pdf': handler}):
+            job = run_job(job.pk)
+        self.assertEqual((job.status, job.result_file), ('failed', ''))
+        self.assertIn('render failed', job.error)
+        self.assertEqual(list((Path(settings.REPORT_JOBS_DIR) / str(job.pk)).iterdir()), [])
+
+    def test_jobs_are_visible_to_their_creator_only(self):
+        job, = self.enqueue()
+        path = Path(settings.REPORT_JOBS_DIR) / str(job.pk)
+        path.mkdir()
+        (path / 'report.pdf').write_bytes(b'%PDF')
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='done', result_file=f'{job.pk}/report.pdf', result_name='report.pdf',
+        )
+
+        other = User.objects.create_user('other', password='pass12345', tenant=self.tenant, role='staff')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[job.pk])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('report_job_download', args=[job.pk])).status_code, 403)
+
+        self.client.force_login(self.user)
+        status = self.client.get(reverse('report_job_status', args=[job.pk])).json()
+        self.assertEqual(status['download_url'], reverse('report_job_download', args=[job.pk]))
+        response = self.client.get(reverse('report_job_download', args=[job.pk]))
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF')
+        response.close()
+
+        admin = User.objects.create_user('root', password='pass12345', role='super_admin')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[job.pk])).status_code, 200)
+
+
+class StockLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        cls.paper = Product.objects.create(name='ورق', code='PAP', nature='consumable', tenant=cls.tenant)
+        cls.ink = Product.objects.create(name='حبر', code='INK', nature='consumable', tenant=cls.tenant)
+        for product, day, movement_type, quantity in [
+            (cls.paper, 1, 'in', 10),
+            (cls.paper, 5, 'out', -3),
+            (cls.paper, 6, 'in', 4),
+            (cls.paper, 7, 'out', -1),
+            (cls.paper, 20, 'out', -2),
+            (cls.ink, 6, 'in', 7),
+        ]:
+            movement = StockMovement.objects.create(
+                product=product, movement_type=movement_type, quantity=quantity,
+                reference=f'R-{day}', tenant=cls.tenant,
+            )
+            created_at = timezone.make_aware(datetime(2024, 3, day, 9))
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=created_at)
+        cls.products = Product.objects.filter(nature='consumable')
+        cls.start, cls.end = period_bounds('2024-03-03', '2024-03-10')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_opening_period_and_closing_balances(self):
+        summaries = {product.code: product for product in ledger_summaries(self.products, self.start, self.end)}
+        paper = summaries['PAP']
+        self.assertEqual((paper.opening, paper.in_total, paper.out_total, paper.closing), (10, 4, -4, 10))
+        ink = summaries['INK']
+        self.assertEqual((ink.opening, ink.in_total, ink.closing), (0, 7, 7))
+
+    def test_running_sum_restarts_for_each_product(self):
+        lines = ledger_lines(self.products, self.start, self.end)
+        self.assertEqual(
+            [(line.product.code, line.quantity, line.running_total) for line in lines],
+            [('INK', 7, 7), ('PAP', -3, -3), ('PAP', 4, 1), ('PAP', -1, 0)],
+        )
+
+    def test_export_rows_carry_the_running_balance(self):
+        rows = list(ledger_rows(self.products.filter(pk=self.paper.pk), self.start, self.end))
+        self.assertEqual([row[3] for row in (rows[0], rows[-1])], [OPENING_LABEL, CLOSING_LABEL])
+        self.assertEqual([row[7] for row in rows], [10, 7, 11, 10, 10])
+        self.assertEqual((rows[1][5], rows[1][6], rows[2][5]), ('', 3, 4))
+
+    def test_report_uses_the_product_picker(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('stock_ledger_report'), {'product': self.paper.pk})
+        self.assertContains(response, reverse('product_picker_api'))
+        self.assertEqual(response.context['selected_product'], self.paper)
+        self.assertNotContains(response, self.ink.name)
+
+
+class StreamingExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        other = Tenant.objects.create(name='كلية الطب', code='FM')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        product = Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+        InventoryItem.objects.create(product=product, inventory_number='INV-1', tenant=cls.tenant)
+        InventoryItem.objects.create(product=product, inventory_number='INV-2', status='maintenance', tenant=cls.tenant)
+        microscope = Product.objects.create(name='مجهر', code='MIC', nature='asset', tenant=other)
+        InventoryItem.objects.create(product=microscope, inventory_number='MED-1', tenant=other)
+        EntryVoucher.objects.create(voucher_number='ENT-1', date=date(2024, 1, 10), tenant=cls.tenant)
+        EntryVoucher.objects.create(voucher_number='ENT-2', date=date(2024, 2, 10), tenant=cls.tenant)
+        EntryVoucher.objects.create(voucher_number='ENT-9', date=date(2024, 1, 10), tenant=other)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def export(self, name, params=None, **headers):
+        response = self.client.get(reverse(name), params or {}, **headers)
+        content = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return response, content.decode('utf-8')
+
+    def test_csv_header_and_tenant_rows(self):
+        response, content = self.export('inventory_export')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('attachment; filename="inventory_', response['Content-Disposition'])
+        self.assertTrue(content.startswith('\ufeff'))
+        rows = list(csv.reader(io.StringIO(content.lstrip('\ufeff'))))
+        self.assertEqual(rows[0][:2], ['رقم الجرد', 'الرقم التسلسلي'])
+        self.assertEqual(sorted(row[0] for row in rows[1:]), ['INV-1', 'INV-2'])
+
+    def test_report_filters_are_applied(self):
+        _response, content = self.export('inventory_export', {'status': 'maintenance', 'format': 'ndjson'})
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([line['inventory_number'] for line in lines], ['INV-2'])
+        self.assertEqual(lines[0]['product_name'], 'حاسوب')
+
+        _response, content = self.export('movements_export', {'date_to': '2024-01-31', 'format': 'ndjson'})
+        self.assertEqual([json.loads(line)['voucher_number'] for line in content.splitlines()], ['ENT-1'])
+
+    def test_gzip_stream_when_accepted(self):
+        _plain, expected = self.export('inventory_export')
+        response, content = self.export('inventory_export', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(content, expected)
+
+    def test_write_only_workbook_rows(self):
+        fileobj = io.BytesIO()
+        write_inventory_excel(fileobj, self.tenant.pk, {'status': 'maintenance'})
+        fileobj.seek(0)
+        rows = list(load_workbook(fileobj, read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:3], ('رقم الجرد', 'الرقم التسلسلي', 'المنتج'))
+        self.assertEqual(rows[1:], [('INV-2', None, 'حاسوب', None, 'في الصيانة', 'جديد', None, 0)])
+
+
+class InventoryReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        other = Tenant.objects.create(name='كلية الطب', code='FM')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        computers = Category.objects.create(name='حواسيب', code='IT', tenant=cls.tenant)
+        lab = Category.objects.create(name='مخبر', code='LAB', tenant=cls.tenant)
+        cls.computer = Product.objects.create(
+            name='حاسوب', code='PC', nature='asset', category=computers, tenant=cls.tenant,
+        )
+        microscope = Product.objects.create(name='مجهر', code='MIC', nature='asset', category=lab, tenant=cls.tenant)
+        InventoryItem.objects.create(product=cls.computer, inventory_number='INV-1', purchase_price=100, tenant=cls.tenant)
+        InventoryItem.objects.create(
+            product=cls.computer, inventory_number='INV-2', purchase_price=200, status='maintenance', tenant=cls.tenant,
+        )
+        InventoryItem.objects.create(product=microscope, inventory_number='LAB-1', purchase_price=50, tenant=cls.tenant)
+        scanner = Product.objects.create(name='ماسح', code='SC', nature='asset', tenant=other)
+        InventoryItem.objects.create(product=scanner, inventory_number='MED-1', purchase_price=999, tenant=other)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.enterContext(mock.patch('reports.views.INVENTORY_REPORT_PAGE_SIZE', 2))
+
+    def report(self, **params):
+        return self.client.get(reverse('inventory_report'), params).context
+
+    def test_rows_are_paginated_and_totals_cover_the_whole_set(self):
+        context = self.report()
+        self.assertEqual([item.inventory_number for item in context['items']], ['LAB-1', 'INV-2'])
+        self.assertEqual(context['items'].paginator.count, 3)
+        self.assertEqual([item.inventory_number for item in self.report(page=2)['items']], ['INV-1'])
+
+        summary = context['summary']
+        self.assertEqual((summary['total_assets'], summary['total_asset_value']), (3, 350))
+        self.assertEqual((summary['available_assets'], summary['available_value']), (2, 150))
+        self.assertEqual((summary['maintenance_assets'], summary['disposed_value']), (1, 0))
+        self.assertEqual(
+            [(row['category'], row['count'], row['value'], row['statuses']) for row in context['category_totals']],
+            [('حواسيب', 2, 300, [1, 0, 1, 0]), ('مخبر', 1, 50, [1, 0, 0, 0])],
+        )
+
+        context = self.report(status='maintenance')
+        self.assertEqual([item.inventory_number for item in context['items']], ['INV-2'])
+        self.assertEqual((context['summary']['total_assets'], context['summary']['total_asset_value']), (1, 200))
+
+    def test_query_count_does_not_grow_with_the_items(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.report()
+        for i in range(10):
+            InventoryItem.objects.create(product=self.computer, inventory_number=f'NEW-{i}', tenant=self.tenant)
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            context = self.report()
+        self.assertEqual(context['summary']['total_assets'], 13)
+
+
+class DailyStatsRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.other = Tenant.objects.create(name='كلية الطب', code='FM')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        paper = Product.objects.create(
+            name='ورق', code='PAP', nature='consumable', unit_price=Decimal('4.00'), tenant=cls.tenant,
+        )
+        ink = Product.objects.create(name='حبر', code='INK', nature='consumable', tenant=cls.tenant)
+        gloves = Product.objects.create(name='قفازات', code='GLV', nature='consumable', tenant=cls.other)
+        today = timezone.now().date()
+        cls.confirmed = []
+        for tenant, lines in [
+            (cls.tenant, [(paper, 3, '10.00'), (ink, 1, '5.00')]),
+            (cls.tenant, [(paper, 2, '7.00')]),
+            (cls.other, [(gloves, 1, '100.00')]),
+        ]:
+            voucher = EntryVoucher.objects.create(
+                voucher_number=f'ENT-{len(cls.confirmed)}', date=today, status='confirmed', tenant=tenant,
+            )
+            for product, quantity, price in lines:
+                EntryVoucherItem.objects.create(
+                    voucher=voucher, product=product, quantity=quantity, unit_price=Decimal(price),
+                )
+            cls.confirmed.append(('entry', voucher))
+        exit_voucher = ExitVoucher.objects.create(
+            voucher_number='EXT-1', date=today - timedelta(days=1), status='confirmed', tenant=cls.tenant,
+        )
+        ExitVoucherItem.objects.create(voucher=exit_voucher, product=paper, quantity=2)
+        cls.confirmed.append(('exit', exit_voucher))
+        # Drafts are not part of the rollup
+        draft = EntryVoucher.objects.create(voucher_number='ENT-D', date=today, tenant=cls.tenant)
+        EntryVoucherItem.objects.create(voucher=draft, product=paper, quantity=50, unit_price=Decimal('1.00'))
+
+    def setUp(self):
+        cache.clear()
+        for voucher_type, voucher in self.confirmed:
+            record_voucher(voucher_type, voucher)
+
+    def snapshot(self):
+        return set(DailyStats.objects.unscoped().values_list(
+            'tenant_id', 'date', 'voucher_type', 'voucher_count', 'line_quantity', 'line_value',
+        ))
+
+    def test_incremental_rollup_matches_rebuild(self):
+        incremental = self.snapshot()
+        today = timezone.now().date()
+        self.assertIn((self.tenant.pk, today, 'entry', 2, 6, Decimal('49.00')), incremental)
+        self.assertIn((self.tenant.pk, today - timedelta(days=1), 'exit', 1, 2, Decimal('8.00')), incremental)
+        call_command('rebuild_daily_stats', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_statistics_api_reads_the_rollup(self):
+        self.client.force_login(self.user)
+        entries = self.client.get(reverse('statistics_api')).json()['monthly_movements']['entry']
+        self.assertEqual(sum(month['count'] for month in entries), 2)
+        self.assertEqual(sum(month['value'] for month in entries), 49.0)
+
+        admin = User.objects.create_user('root', password='pass12345', role='super_admin')
+        self.client.force_login(admin)
+        data = self.client.get(reverse('statistics_api')).json()
+        self.assertEqual(sum(month['count'] for month in data['monthly_movements']['entry']), 3)
+        self.assertEqual(sum(month['quantity'] for month in data['monthly_movements']['exit']), 2)
+
+
+class ReportPayloadCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        product = Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+        cls.item = InventoryItem.objects.create(
+            product=product, inventory_number='INV-1', purchase_price=Decimal('300.00'), tenant=cls.tenant,
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches[REPORT_CACHE_ALIAS].clear()
+        self.client.force_login(self.user)
+
+    def test_voucher_change_invalidates_movements_report(self):
+        url = reverse('movements_report')
+        self.assertEqual(self.client.get(url).context['summary']['entries_count'], 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            EntryVoucher.objects.create(voucher_number='ENT-1', date=date(2024, 1, 10), tenant=self.tenant)
+        # Served from the cache until the change is committed
+        self.assertEqual(self.client.get(url).context['summary']['entries_count'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url).context['summary']['entries_count'], 1)
+
+    def test_stock_change_invalidates_disposed_report(self):
+        url = reverse('disposed_report')
+        self.assertEqual(self.client.get(url).context['summary']['disposed_items'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.status = 'disposed'
+            self.item.save()
+        summary = self.client.get(url).context['summary']
+        self.assertEqual((summary['disposed_items'], summary['total_value']), (1, Decimal('300.00')))
+
+    def test_large_payloads_are_not_cached(self):
+        small = mock.Mock(return_value={'rows': [1, 2, 3]})
+        large = mock.Mock(return_value={'rows': 'x' * MAX_REPORT_PAYLOAD_SIZE})
+        for _ in range(2):
+            get_report_payload('small', self.tenant.pk, small)
+            get_report_payload('large', self.tenant.pk, large)
+        self.assertEqual((small.call_count, large.call_count), (1, 2))
+
+
+class ConsumptionAnalysisTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.today = date(2024, 6, 30)
+        for code, price, movements in [
+            ('TON', '10.00', [('in', 100, 200), ('out', -3, 1), ('out', -5, 2)]),
+            ('PAP', '1.00', [('in', 20, 200), ('out', -15, 10)]),
+            ('INK', '5.00', [('in', 4, 200), ('out', -4, 120)]),
+        ]:
+            product = Product.objects.create(
+                name=code, code=code, nature='consumable', unit_price=Decimal(price), tenant=cls.tenant,
+            )
+            for movement_type, quantity, days_ago in movements:
+                movement = StockMovement.objects.create(
+                    product=product, movement_type=movement_type, quantity=quantity, tenant=cls.tenant,
+                )
+                created_at = datetime.combine(cls.today - timedelta(days=days_ago), time(10))
+                StockMovement.objects.filter(pk=movement.pk).update(created_at=timezone.make_aware(created_at))
+
+    def test_abc_thresholds(self):
+        self.assertEqual(abc_classes(np.array([70.0, 15.0, 10.0, 5.0, 0.0])).tolist(), [0, 0, 1, 2, 2])
+        # A product starting at exactly 80% of the value is in class B
+        self.assertEqual(abc_classes(np.array([5.0, 80.0, 15.0])).tolist(), [2, 0, 1])
+        self.assertEqual(abc_classes(np.zeros(3)).tolist(), [2, 2, 2])
+
+    def test_totals_classes_and_order(self):
+        analysis = consumption_analysis(Product.objects.filter(nature='consumable'), self.today)
+        rows = {row[0]: row for row in analysis['rows']}
+        # (class, consumed, value, peak, stock, reorder point, order quantity, reorder)
+        self.assertEqual(rows['TON'][3:], ('A', 8, 80.0, 0.09, 5, 92, 5, 0, False))
+        self.assertEqual(rows['PAP'][3:], ('B', 15, 15.0, 0.17, 15, 5, 13, 13, True))
+        # Issues outside the window are not consumption
+        self.assertEqual(rows['INK'][3:6], ('C', 0, 0.0))
+        # Products to reorder first, then by class and consumed value
+        self.assertEqual([row[0] for row in analysis['rows']], ['PAP', 'TON', 'INK'])
+        self.assertEqual(
+            analysis['classes'],
+            [{'name': 'A', 'count': 1, 'value': 80.0}, {'name': 'B', 'count': 1, 'value': 15.0},
+             {'name': 'C', 'count': 1, 'value': 0.0}],
+        )
+        self.assertEqual(analysis['summary'], {
+            'products': 3, 'to_reorder': 1, 'consumed_value': 95.0, 'order_value': 13.0,
+        })
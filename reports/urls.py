@@ -6,8 +6,21 @@ urlpatterns = [
     path('inventory/', views.inventory_report, name='inventory_report'),
     path('inventory/pdf/', views.inventory_report_pdf, name='inventory_report_pdf'),
     path('inventory/excel/', views.inventory_report_excel, name='inventory_report_excel'),
+    path('inventory/export/', views.inventory_export, name='inventory_export'),
     path('movements/', views.movements_report, name='movements_report'),
+    path('movements/export/', views.movements_export, name='movements_export'),
+    path('stock-movements/export/', views.stock_movements_export, name='stock_movements_export'),
+    path('stock-ledger/', views.stock_ledger_report, name='stock_ledger_report'),
+    path('stock-ledger/export/', views.stock_ledger_export, name='stock_ledger_export'),
+    path('depreciation/', views.depreciation_report, name='depreciation_report'),
+    path('depreciation/export/', views.depreciation_export, name='depreciation_export'),
+    path('consumption/', views.consumption_report, name='consumption_report'),
+    path('consumption/export/', views.consumption_export, name='consumption_export'),
     path('disposed/', views.disposed_report, name='disposed_report'),
+    path('disposed/export/', views.disposed_export, name='disposed_export'),
     path('api/statistics/', views.statistics_api, name='statistics_api'),
     path('voucher/<str:voucher_type>/<int:pk>/pdf/', views.voucher_pdf, name='voucher_pdf'),
+    path('jobs/<int:pk>/', views.report_job_detail, name='report_job_detail'),
+    path('jobs/<int:pk>/status/', views.report_job_status, name='report_job_status'),
+    path('jobs/<int:pk>/download/', views.report_job_download, name='report_job_download'),
 ]
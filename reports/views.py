@@ -1,24 +1,72 @@
 """
 Reports views - PDF and Excel exports
 """
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-from django.template.loader import render_to_string
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.db.models import Sum, Count, Q
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-from datetime import timedelta
+from datetime import MAXYEAR, MINYEAR, timedelta
 import json
 
-from inventory.models import Product, InventoryItem, Category, StockMovement
+from core.cache import get_report_payload
+from core.statistics import summarize_items, get_item_totals_by_category
+from inventory.models import Product, InventoryItem, StockMovement
+from inventory.reference import get_categories
 from transactions.models import EntryVoucher, ExitVoucher, ReturnVoucher, DisposalVoucher
+from .models import DailyStats, ReportJob
+from .jobs import enqueue_job, job_result_path
+from .rendering import VOUCHER_MODELS, render_voucher_pdf
+from .pdf_cache import ensure_voucher_pdf, is_cacheable, voucher_etag
+from .consumption import CONSUMPTION_COLUMNS, ABC_CLASSES, consumption_analysis
+from .depreciation import VALUATION_COLUMNS, valuation_by_category, valuation_rows, fiscal_years
+from .ledger import LEDGER_COLUMNS, period_bounds, ledger_summaries, ledger_lines, ledger_rows, with_balances
+from .exports import (
+    streaming_export,
+    inventory_rows, movement_rows, stock_movement_rows, disposed_rows,
+    INVENTORY_COLUMNS, MOVEMENT_COLUMNS, STOCK_MOVEMENT_COLUMNS, DISPOSED_COLUMNS,
+)
 
+INVENTORY_REPORT_PAGE_SIZE = 50
+LEDGER_PAGE_SIZE = 50
+INVENTORY_FILTER_KEYS = ('status', 'category')
+LEDGER_LINES_PAGE_SIZE = 100
+CONSUMPTION_PAGE_SIZE = 50
 
-def get_tenant_queryset(request, model):
-    """Get queryset filtered by tenant"""
+
+def get_report_tenant(request):
+    """Cache scope of the reports: the user's tenant, None for the global view"""
     if request.user.is_super_admin:
-        return model.objects.all()
-    return model.objects.filter(tenant=request.user.tenant)
+        return None
+    return request.user.tenant_id
+
+
+def filter_inventory_items(request, items):
+    """Apply the inventory report filters (status, category)"""
+    status = request.GET.get('status')
+    if status:
+        items = items.filter(status=status)
+    
+    category_id = request.GET.get('category')
+    if category_id:
+        items = items.filter(product__category_id=category_id)
+    return items
+
+
+def filter_date_range(request, queryset, field='date'):
+    """Apply the date_from / date_to filters of the movement reports"""
+    date_from = request.GET.get('date_from')
+    date_to = request.GET.get('date_to')
+    if date_from:
+        queryset = queryset.filter(**{f'{field}__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{field}__lte': date_to})
+    return queryset
 
 
 @login_required
@@ -30,105 +78,72 @@ def reports_index(request):
 @login_required
 def inventory_report(request):
     """تقرير جرد المخزون"""
-    items = get_tenant_queryset(request, InventoryItem).select_related('product', 'assigned_to')
-    
-    # Filters
-    status = request.GET.get('status')
-    if status:
-        items = items.filter(status=status)
+    items = filter_inventory_items(request, InventoryItem.objects.all())
+    
+    # Summary and per-category totals, computed in SQL on the whole filtered set
+    def build_totals():
+        summary, _assets_by_status = summarize_items(items)
+        return {
+            'summary': summary,
+            'status_totals': [
+                {'label': label, 'count': summary[f'{status}_assets'], 'value': summary[f'{status}_value']}
+                for status, label in InventoryItem.STATUS_CHOICES
+            ],
+            'category_totals': get_item_totals_by_category(items),
+        }
+    
+    totals = get_report_payload(
+        'inventory', get_report_tenant(request), build_totals,
+        request.GET, INVENTORY_FILTER_KEYS,
+    )
+    summary = totals['summary']
     
-    category_id = request.GET.get('category')
-    if category_id:
-        items = items.filter(product__category_id=category_id)
+    # Only one page of rows is rendered, the full list is in the exports
+    paginator = Paginator(
+        items.select_related('product__category', 'assigned_to').order_by('-created_at', '-pk'),
+        INVENTORY_REPORT_PAGE_SIZE,
+    )
+    paginator.count = summary['total_assets']
+    page = paginator.get_page(request.GET.get('page', 1))
     
-    # Summary
-    summary = {
-        'total': items.count(),
-        'available': items.filter(status='available').count(),
-        'assigned': items.filter(status='assigned').count(),
-        'disposed': items.filter(status='disposed').count(),
-        'total_value': items.aggregate(total=Sum('purchase_price'))['total'] or 0,
-    }
+    query = request.GET.copy()
+    query.pop('page', None)
     
-    categories = get_tenant_queryset(request, Category)
+    categories = get_categories(get_report_tenant(request))
     
     context = {
-        'items': items,
+        'items': page,
         'summary': summary,
+        'status_totals': totals['status_totals'],
+        'category_totals': totals['category_totals'],
         'categories': categories,
         'status_choices': InventoryItem.STATUS_CHOICES,
+        'filter_query': query.urlencode(),
     }
     return render(request, 'reports/inventory_report.html', context)
 
 
+def enqueue_inventory_job(request, kind):
+    """Queue an inventory report for the background worker"""
+    user = request.user
+    job = enqueue_job(
+        kind, user,
+        tenant_id=None if user.is_super_admin else user.tenant_id,
+        filters={key: request.GET.get(key) for key in ('status', 'category') if request.GET.get(key)},
+    )
+    return redirect('report_job_detail', pk=job.pk)
+
+
 @login_required
 def inventory_report_pdf(request):
     """تقرير جرد المخزون - PDF"""
-    items = get_tenant_queryset(request, InventoryItem).select_related('product', 'assigned_to')
-    
-    status = request.GET.get('status')
-    if status:
-        items = items.filter(status=status)
-    
-    summary = {
-        'total': items.count(),
-        'total_value': items.aggregate(total=Sum('purchase_price'))['total'] or 0,
-    }
-    
-    html = render_to_string('reports/inventory_report_pdf.html', {
-        'items': items,
-        'summary': summary,
-        'tenant': request.user.tenant,
-        'date': timezone.now(),
-    })
-    
-    try:
-        from weasyprint import HTML
-        pdf = HTML(string=html).write_pdf()
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="inventory_report_{timezone.now().strftime("%Y%m%d")}.pdf"'
-        return response
-    except ImportError:
-        return HttpResponse("WeasyPrint غير مثبت. يرجى تثبيته لتوليد PDF.", status=500)
+    return enqueue_inventory_job(request, 'inventory_pdf')
 
 
 @login_required
 def inventory_report_excel(request):
     """تقرير جرد المخزون - Excel"""
-    items = get_tenant_queryset(request, InventoryItem).select_related('product', 'assigned_to')
-    
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "تقرير الجرد"
-        
-        # Headers
-        headers = ['رقم الجرد', 'الرقم التسلسلي', 'المنتج', 'الصنف', 'الحالة', 'حالة المادة', 'المصلحة', 'سعر الشراء']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Data
-        for row, item in enumerate(items, 2):
-            ws.cell(row=row, column=1, value=item.inventory_number)
-            ws.cell(row=row, column=2, value=item.serial_number)
-            ws.cell(row=row, column=3, value=item.product.name)
-            ws.cell(row=row, column=4, value=item.product.category.name if item.product.category else '')
-            ws.cell(row=row, column=5, value=item.get_status_display())
-            ws.cell(row=row, column=6, value=item.get_condition_display())
-            ws.cell(row=row, column=7, value=item.assigned_to.name if item.assigned_to else '')
-            ws.cell(row=row, column=8, value=float(item.purchase_price))
-        
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="inventory_report_{timezone.now().strftime("%Y%m%d")}.xlsx"'
-        wb.save(response)
-        return response
-    except ImportError:
-        return HttpResponse("openpyxl غير مثبت. يرجى تثبيته لتوليد Excel.", status=500)
+    return enqueue_inventory_job(request, 'inventory_excel')
 
 
 @login_required
@@ -138,146 +153,386 @@ def movements_report(request):
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
     
-    entries = get_tenant_queryset(request, EntryVoucher).select_related('supplier')
-    exits = get_tenant_queryset(request, ExitVoucher).select_related('department')
-    returns = get_tenant_queryset(request, ReturnVoucher).select_related('department')
-    
-    if date_from:
-        entries = entries.filter(date__gte=date_from)
-        exits = exits.filter(date__gte=date_from)
-        returns = returns.filter(date__gte=date_from)
-    
-    if date_to:
-        entries = entries.filter(date__lte=date_to)
-        exits = exits.filter(date__lte=date_to)
-        returns = returns.filter(date__lte=date_to)
-    
-    summary = {
-        'entries_count': entries.count(),
-        'exits_count': exits.count(),
-        'returns_count': returns.count(),
-    }
+    def build_report():
+        entries = filter_date_range(request, EntryVoucher.objects.select_related('supplier'))
+        exits = filter_date_range(request, ExitVoucher.objects.select_related('department'))
+        returns = filter_date_range(request, ReturnVoucher.objects.select_related('department'))
+        return {
+            'entries': list(entries[:50]),
+            'exits': list(exits[:50]),
+            'returns': list(returns[:50]),
+            'summary': {
+                'entries_count': entries.count(),
+                'exits_count': exits.count(),
+                'returns_count': returns.count(),
+            },
+        }
     
     context = {
-        'entries': entries[:50],
-        'exits': exits[:50],
-        'returns': returns[:50],
-        'summary': summary,
+        **get_report_payload(
+            'movements', get_report_tenant(request), build_report,
+            request.GET, ('date_from', 'date_to'),
+        ),
         'date_from': date_from,
         'date_to': date_to,
     }
     return render(request, 'reports/movements_report.html', context)
 
 
+def filter_ledger_products(request):
+    """Consumables selected for the stock ledger (product or category filter)"""
+    products = Product.objects.filter(nature='consumable')
+    
+    product_id = request.GET.get('product')
+    if product_id:
+        products = products.filter(pk=product_id)
+    
+    category_id = request.GET.get('category')
+    if category_id:
+        products = products.filter(category_id=category_id)
+    return products
+
+
 @login_required
-def disposed_report(request):
-    """تقرير المواد التالفة"""
-    disposals = get_tenant_queryset(request, DisposalVoucher).prefetch_related('items')
-    disposed_items = get_tenant_queryset(request, InventoryItem).filter(status='disposed')
+def stock_ledger_report(request):
+    """سجل المخزون للمواد"""
+    products = filter_ledger_products(request)
+    start, end = period_bounds(request.GET.get('date_from'), request.GET.get('date_to'))
+    
+    # Opening, period totals and closing balance of every selected product
+    paginator = Paginator(ledger_summaries(products, start, end), LEDGER_PAGE_SIZE)
+    summaries = paginator.get_page(request.GET.get('page', 1))
+    
+    # Movement lines with running balance when a single product is selected
+    lines = None
+    product_summary = None
+    if request.GET.get('product') and summaries.object_list:
+        product_summary = summaries.object_list[0]
+        lines_paginator = Paginator(ledger_lines(products, start, end), LEDGER_LINES_PAGE_SIZE)
+        lines = lines_paginator.get_page(request.GET.get('lines_page', 1))
+        lines.object_list = list(with_balances(lines.object_list, product_summary.opening))
+    
+    query = request.GET.copy()
+    query.pop('page', None)
+    query.pop('lines_page', None)
+    
+    # The product list itself is searched through the product picker endpoint
+    selected_product = None
+    if request.GET.get('product'):
+        selected_product = Product.objects.filter(
+            pk=request.GET['product'], nature='consumable',
+        ).only('pk', 'code', 'name').first()
     
-    summary = {
-        'disposal_vouchers': disposals.count(),
-        'disposed_items': disposed_items.count(),
-        'total_value': disposed_items.aggregate(total=Sum('purchase_price'))['total'] or 0,
+    context = {
+        'summaries': summaries,
+        'lines': lines,
+        'product_summary': product_summary,
+        'movement_types': StockMovement.MOVEMENT_TYPES,
+        'selected_product': selected_product,
+        'categories': get_categories(get_report_tenant(request)),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+        'filter_query': query.urlencode(),
     }
+    return render(request, 'reports/stock_ledger.html', context)
+
+
+def get_fiscal_year(request):
+    """Fiscal year of the valuation report (?year=), this year by default or when out of range"""
+    try:
+        year = int(request.GET.get('year', ''))
+    except ValueError:
+        return timezone.now().year
+    # The valuation also reads the end of the previous year
+    if not MINYEAR < year <= MAXYEAR:
+        return timezone.now().year
+    return year
+
+
+@login_required
+def depreciation_report(request):
+    """تقرير اهتلاك الأصول والقيمة الصافية"""
+    items = InventoryItem.objects.all()
+    year = get_fiscal_year(request)
+    
+    valuation = get_report_payload(
+        'depreciation', get_report_tenant(request),
+        lambda: valuation_by_category(items, year),
+        {'year': year}, ('year',),
+    )
     
     context = {
-        'disposals': disposals[:50],
-        'disposed_items': disposed_items[:100],
-        'summary': summary,
+        **valuation,
+        'years': fiscal_years(items),
     }
+    return render(request, 'reports/depreciation_report.html', context)
+
+
+def get_consumption_analysis(request):
+    """
+    Consumption analysis of the consumables, cached per day until the stock
+    movements change (the same writes that feed the daily rollup)
+    """
+    products = Product.objects.filter(nature='consumable', is_active=True)
+    today = timezone.localdate()
+    return get_report_payload(
+        'consumption', get_report_tenant(request),
+        lambda: consumption_analysis(products, today),
+        {'today': today.isoformat()}, ('today',),
+    )
+
+
+def filter_consumption_rows(request, rows):
+    """Apply the consumption report filters (ABC class, reorder list only)"""
+    abc_class = request.GET.get('abc')
+    if abc_class in ABC_CLASSES:
+        rows = [row for row in rows if row[3] == abc_class]
+    if request.GET.get('reorder'):
+        rows = [row for row in rows if row[-1]]
+    return rows
+
+
+@login_required
+def consumption_report(request):
+    """تحليل الاستهلاك: تصنيف ABC ونقاط إعادة الطلب"""
+    analysis = get_consumption_analysis(request)
+    rows = filter_consumption_rows(request, analysis['rows'])
+    
+    paginator = Paginator(rows, CONSUMPTION_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page', 1))
+    
+    query = request.GET.copy()
+    query.pop('page', None)
+    
+    context = {
+        **analysis,
+        'page': page,
+        'abc_classes': ABC_CLASSES,
+        'abc': request.GET.get('abc', ''),
+        'reorder': request.GET.get('reorder', ''),
+        'filter_query': query.urlencode(),
+    }
+    return render(request, 'reports/consumption_report.html', context)
+
+
+@login_required
+def disposed_report(request):
+    """تقرير المواد التالفة"""
+    def build_report():
+        disposals = DisposalVoucher.objects.prefetch_related('items')
+        disposed_items = InventoryItem.objects.filter(status='disposed')
+        totals = disposed_items.aggregate(count=Count('id'), total_value=Sum('purchase_price'))
+        return {
+            'disposals': list(disposals[:50]),
+            'disposed_items': list(disposed_items.select_related('product')[:100]),
+            'summary': {
+                'disposal_vouchers': disposals.count(),
+                'disposed_items': totals['count'],
+                'total_value': totals['total_value'] or 0,
+            },
+        }
+    
+    context = get_report_payload('disposed', get_report_tenant(request), build_report)
     return render(request, 'reports/disposed_report.html', context)
 
 
+@login_required
+def inventory_export(request):
+    """تصدير الجرد - CSV / NDJSON"""
+    items = filter_inventory_items(request, InventoryItem.objects.all())
+    return streaming_export(request, 'inventory', INVENTORY_COLUMNS, inventory_rows(items))
+
+
+@login_required
+def movements_export(request):
+    """تصدير حركة الوصلات - CSV / NDJSON"""
+    vouchers_by_type = [
+        ('entry', filter_date_range(request, EntryVoucher.objects.all()), 'supplier__name'),
+        ('exit', filter_date_range(request, ExitVoucher.objects.all()), 'department__name'),
+        ('return', filter_date_range(request, ReturnVoucher.objects.all()), 'department__name'),
+    ]
+    return streaming_export(request, 'movements', MOVEMENT_COLUMNS, movement_rows(vouchers_by_type))
+
+
+@login_required
+def stock_movements_export(request):
+    """تصدير سجل حركات المخزون - CSV / NDJSON"""
+    movements = filter_date_range(request, StockMovement.objects.all(), field='created_at__date')
+    return streaming_export(request, 'stock_movements', STOCK_MOVEMENT_COLUMNS, stock_movement_rows(movements))
+
+
+@login_required
+def stock_ledger_export(request):
+    """تصدير سجل المخزون للمواد - CSV / NDJSON"""
+    products = filter_ledger_products(request)
+    start, end = period_bounds(request.GET.get('date_from'), request.GET.get('date_to'))
+    return streaming_export(request, 'stock_ledger', LEDGER_COLUMNS, ledger_rows(products, start, end))
+
+
+@login_required
+def depreciation_export(request):
+    """تصدير اهتلاك الأصول - CSV / NDJSON"""
+    items = InventoryItem.objects.all()
+    year = get_fiscal_year(request)
+    return streaming_export(request, f'depreciation_{year}', VALUATION_COLUMNS, valuation_rows(items, year))
+
+
+@login_required
+def consumption_export(request):
+    """تصدير قائمة إعادة الطلب - CSV / NDJSON"""
+    rows = filter_consumption_rows(request, get_consumption_analysis(request)['rows'])
+    return streaming_export(request, 'consumption', CONSUMPTION_COLUMNS, (row[:-1] for row in rows))
+
+
+@login_required
+def disposed_export(request):
+    """تصدير المواد المتلفة - CSV / NDJSON"""
+    items = InventoryItem.objects.filter(status='disposed')
+    return streaming_export(request, 'disposed', DISPOSED_COLUMNS, disposed_rows(items))
+
+
 @login_required
 def statistics_api(request):
     """API للإحصائيات - للرسوم البيانية"""
-    user = request.user
-    tenant = user.tenant
+    # Monthly figures cover the last 6 months, so the day is part of the key
+    today = timezone.now().date()
     
-    if user.is_super_admin:
+    def build_data():
         items = InventoryItem.objects.all()
-        products = Product.objects.all()
-    else:
-        items = InventoryItem.objects.filter(tenant=tenant)
-        products = Product.objects.filter(tenant=tenant)
-    
-    # Assets by status
-    assets_by_status = list(items.values('status').annotate(count=Count('id')))
-    
-    # Assets by category
-    assets_by_category = list(
-        items.values('product__category__name')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
-    
-    # Monthly movements (last 6 months)
-    six_months_ago = timezone.now().date() - timedelta(days=180)
-    
-    monthly_entries = list(
-        EntryVoucher.objects.filter(
-            tenant=tenant if not user.is_super_admin else tenant,
-            date__gte=six_months_ago
-        ).extra(select={'month': "strftime('%%Y-%%m', date)"})
-        .values('month')
-        .annotate(count=Count('id'))
-        .order_by('month')
+        daily_stats = DailyStats.objects.all()
+        
+        # Assets by status
+        assets_by_status = list(items.values('status').annotate(count=Count('id')))
+        
+        # Assets by category
+        assets_by_category = list(
+            items.values('product__category__name')
+            .annotate(count=Count('id'))
+            .order_by('-count')[:10]
+        )
+        
+        # Monthly movements (last 6 months) from the daily rollup
+        six_months_ago = today - timedelta(days=180)
+        
+        monthly_rows = (
+            daily_stats.filter(date__gte=six_months_ago)
+            .annotate(month=TruncMonth('date'))
+            .values('month', 'voucher_type')
+            .annotate(
+                count=Sum('voucher_count'),
+                quantity=Sum('line_quantity'),
+                value=Sum('line_value'),
+            )
+            .order_by('month', 'voucher_type')
+        )
+        
+        monthly_movements = {voucher_type: [] for voucher_type, _label in DailyStats.VOUCHER_TYPES}
+        for row in monthly_rows:
+            monthly_movements[row['voucher_type']].append({
+                'month': row['month'].strftime('%Y-%m'),
+                'count': row['count'],
+                'quantity': row['quantity'],
+                'value': float(row['value']),
+            })
+        
+        return {
+            'assets_by_status': assets_by_status,
+            'assets_by_category': assets_by_category,
+            'monthly_entries': monthly_movements['entry'],
+            'monthly_movements': monthly_movements,
+        }
+    
+    data = get_report_payload(
+        'statistics', get_report_tenant(request), build_data,
+        {'today': today.isoformat()}, ('today',),
     )
     
-    data = {
-        'assets_by_status': assets_by_status,
-        'assets_by_category': assets_by_category,
-        'monthly_entries': monthly_entries,
-    }
-    
     return JsonResponse(data)
 
 
 @login_required
 def voucher_pdf(request, voucher_type, pk):
     """طباعة وصل - PDF"""
-    models_map = {
-        'entry': EntryVoucher,
-        'exit': ExitVoucher,
-        'return': ReturnVoucher,
-        'disposal': DisposalVoucher,
-    }
-    
-    templates_map = {
-        'entry': 'reports/voucher_entry_pdf.html',
-        'exit': 'reports/voucher_exit_pdf.html',
-        'return': 'reports/voucher_return_pdf.html',
-        'disposal': 'reports/voucher_disposal_pdf.html',
-    }
+    model = VOUCHER_MODELS.get(voucher_type)
     
-    model = models_map.get(voucher_type)
-    template = templates_map.get(voucher_type)
-    
-    if not model or not template:
+    if not model:
         return HttpResponse("نوع الوصل غير صحيح", status=400)
     
-    voucher = get_object_or_404(model, pk=pk)
-    
-    if not request.user.is_super_admin and voucher.tenant != request.user.tenant:
-        return HttpResponse("ليس لديك صلاحية", status=403)
-    
-    items = voucher.items.select_related('product').prefetch_related('assets__inventory_item')
+    voucher = get_object_or_404(model.objects.select_related('tenant'), pk=pk)
     
-    html = render_to_string(template, {
-        'voucher': voucher,
-        'items': items,
-        'tenant': request.user.tenant,
-    })
-    
-    try:
-        from weasyprint import HTML
-        pdf = HTML(string=html).write_pdf()
-        response = HttpResponse(pdf, content_type='application/pdf')
+    # Confirmed vouchers never change: serve the immutable cached file
+    if is_cacheable(voucher):
+        etag = voucher_etag(voucher_type, voucher)
+        last_modified = int(voucher.updated_at.timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        try:
+            path = ensure_voucher_pdf(voucher_type, voucher)
+        except ImportError:
+            return HttpResponse("WeasyPrint غير مثبت", status=500)
+        
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="{voucher.voucher_number}.pdf"'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, max-age=86400'
         return response
+    
+    try:
+        pdf = render_voucher_pdf(voucher_type, voucher)
     except ImportError:
         return HttpResponse("WeasyPrint غير مثبت", status=500)
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{voucher.voucher_number}.pdf"'
+    return response
 
 
-from django.http import JsonResponse
+# ============== Background report jobs ==============
+
+def get_user_job(request, pk):
+    """A report job visible to the current user, or None"""
+    job = get_object_or_404(ReportJob, pk=pk)
+    if not request.user.is_super_admin and job.created_by_id != request.user.id:
+        return None
+    return job
+
+
+@login_required
+def report_job_detail(request, pk):
+    """متابعة مهمة تقرير"""
+    job = get_user_job(request, pk)
+    if job is None:
+        return HttpResponse("ليس لديك صلاحية", status=403)
+    return render(request, 'reports/job_detail.html', {'job': job})
+
+
+@login_required
+def report_job_status(request, pk):
+    """حالة مهمة تقرير - JSON"""
+    job = get_user_job(request, pk)
+    if job is None:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'download_url': reverse('report_job_download', args=[job.pk]) if job.status == 'done' else None,
+    })
+
+
+@login_required
+def report_job_download(request, pk):
+    """تحميل نتيجة مهمة تقرير"""
+    job = get_user_job(request, pk)
+    if job is None:
+        return HttpResponse("ليس لديك صلاحية", status=403)
+    if job.status != 'done':
+        raise Http404("التقرير غير جاهز")
+    
+    path = job_result_path(job)
+    if not path.exists():
+        raise Http404("ملف التقرير غير موجود")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result_name)
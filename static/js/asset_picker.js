@@ -0,0 +1,146 @@
+/*
+ * Asset picker of the exit, return and disposal voucher forms
+ * اختيار الأصول المجرودة في نماذج الوصلات
+ *
+ * For an asset product, AssetPicker.show() lists in the row's
+ * .assets-container the units the voucher may move, one page at a time
+ * from the product assets endpoint (data-assets-url, with 0 standing for
+ * the product id). Checked units are posted as asset_id_<row position>
+ * when the form is submitted, which is how the server pairs them with the
+ * product_id of the row.
+ */
+(function () {
+    const SEARCH_DELAY = 250;
+
+    function wantedQuantity(container) {
+        const input = container.closest('.item-row').querySelector('input[name="quantity"]');
+        return parseInt(input.value) || 0;
+    }
+
+    function updateCount(container) {
+        const wanted = wantedQuantity(container);
+        const checked = container.querySelectorAll('.asset-check:checked').length;
+        const counter = container.querySelector('.asset-count');
+        counter.textContent = `تم اختيار ${checked} من ${wanted}`;
+        counter.classList.toggle('text-danger', checked !== wanted);
+    }
+
+    function assetOption(asset) {
+        const label = document.createElement('label');
+        label.className = 'list-group-item py-1 small';
+        const box = document.createElement('input');
+        box.type = 'checkbox';
+        box.className = 'form-check-input ms-2 asset-check';
+        box.value = asset.id;
+        let text = asset.inventory_number;
+        if (asset.serial_number) text += ` - ${asset.serial_number}`;
+        if (asset.assigned_to) text += ` (${asset.assigned_to})`;
+        else if (asset.location) text += ` (${asset.location})`;
+        label.append(box, text);
+        return label;
+    }
+
+    function loadPage(container, more) {
+        const state = container.assetPicker;
+        const params = new URLSearchParams({purpose: state.purpose});
+        if (state.department) params.set('department', state.department);
+        const query = container.querySelector('.asset-search').value.trim();
+        if (query) params.set('q', query);
+        if (more && state.next) params.set('after', state.next);
+        const request = state.request = (state.request || 0) + 1;
+        const url = container.dataset.assetsUrl.replace('/0/', `/${state.productId}/`);
+
+        return fetch(`${url}?${params}`, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                // Ignore answers overtaken by a later search
+                if (state.request !== request) return;
+                const list = container.querySelector('.asset-list');
+                if (!more) {
+                    // A new search keeps the units already checked
+                    list.querySelectorAll('.asset-check:not(:checked)').forEach(box => box.closest('label').remove());
+                }
+                const listed = new Set([...list.querySelectorAll('.asset-check')].map(box => box.value));
+                data.results.forEach(asset => {
+                    if (!listed.has(String(asset.id))) list.append(assetOption(asset));
+                });
+                state.next = data.next;
+                container.querySelector('.asset-more').style.display = data.next ? '' : 'none';
+                updateCount(container);
+            });
+    }
+
+    async function fillQuantity(container) {
+        const wanted = wantedQuantity(container);
+        for (;;) {
+            const boxes = [...container.querySelectorAll('.asset-check')];
+            let checked = boxes.filter(box => box.checked).length;
+            for (const box of boxes) {
+                if (checked >= wanted) break;
+                if (!box.checked) {
+                    box.checked = true;
+                    checked++;
+                }
+            }
+            if (checked >= wanted || !container.assetPicker.next) break;
+            await loadPage(container, true);
+        }
+        updateCount(container);
+    }
+
+    function show(container, productId, purpose, department) {
+        container.assetPicker = {productId, purpose, department, next: null};
+        container.innerHTML = `
+            <div class="input-group input-group-sm mb-1">
+                <input type="search" class="form-control asset-search" placeholder="رقم الجرد أو الرقم التسلسلي..." autocomplete="off">
+                <button type="button" class="btn btn-outline-secondary asset-fill">اختيار حسب الكمية</button>
+            </div>
+            <div class="list-group asset-list" style="max-height: 240px; overflow-y: auto;"></div>
+            <button type="button" class="btn btn-link btn-sm asset-more" style="display:none;">عرض المزيد</button>
+            <div class="small asset-count"></div>`;
+        container.style.display = 'block';
+        loadPage(container, false);
+    }
+
+    function clear(container) {
+        delete container.assetPicker;
+        container.innerHTML = '';
+        container.style.display = 'none';
+    }
+
+    const timers = new WeakMap();
+
+    document.addEventListener('input', function (e) {
+        if (e.target.classList.contains('asset-search')) {
+            const container = e.target.closest('.assets-container');
+            clearTimeout(timers.get(container));
+            timers.set(container, setTimeout(() => loadPage(container, false), SEARCH_DELAY));
+        }
+        if (e.target.name === 'quantity') {
+            const container = e.target.closest('.item-row').querySelector('.assets-container');
+            if (container && container.assetPicker) updateCount(container);
+        }
+    });
+
+    document.addEventListener('change', function (e) {
+        if (e.target.classList.contains('asset-check')) updateCount(e.target.closest('.assets-container'));
+    });
+
+    document.addEventListener('click', function (e) {
+        const container = e.target.closest('.assets-container');
+        if (!container || !container.assetPicker) return;
+        if (e.target.classList.contains('asset-more')) loadPage(container, true);
+        if (e.target.classList.contains('asset-fill')) fillQuantity(container);
+    });
+
+    document.addEventListener('submit', function (e) {
+        e.target.querySelectorAll('.item-row').forEach((row, position) => {
+            row.querySelectorAll('.asset-check').forEach(box => {
+                if (box.checked) box.name = `asset_id_${position}`;
+                else box.removeAttribute('name');
+            });
+        });
+    });
+
+    window.AssetPicker = {show, clear};
+})();
@@ -0,0 +1,70 @@
+/*
+ * Product picker of the voucher forms
+ * اختيار المنتجات في نماذج الوصلات
+ *
+ * Every row holds a search input and the product select inside a
+ * .product-picker block. Typing a code or name prefix fills the select with
+ * the matching page of the picker endpoint (data-picker-url on the select);
+ * the options carry data-nature, data-price, data-stock and data-available
+ * (stock not reserved by draft vouchers) for the form scripts. The selected
+ * product is kept when the list is refreshed.
+ */
+(function () {
+    const SEARCH_DELAY = 250;
+    const timers = new WeakMap();
+    const requests = new WeakMap();
+
+    function productOption(product) {
+        const option = document.createElement('option');
+        option.value = product.id;
+        option.textContent = `${product.code} - ${product.name} (المتاح: ${product.available_to_promise} من ${product.stock} ${product.unit})`;
+        option.dataset.nature = product.nature;
+        option.dataset.price = product.unit_price;
+        option.dataset.stock = product.stock;
+        option.dataset.available = product.available_to_promise;
+        return option;
+    }
+
+    function fill(select, data) {
+        const placeholder = select.options[0];
+        const current = select.value ? select.selectedOptions[0] : null;
+        const options = [placeholder];
+        if (current) options.push(current);
+        data.results.forEach(product => {
+            if (!current || String(product.id) !== current.value) options.push(productOption(product));
+        });
+        if (data.has_next) {
+            const more = document.createElement('option');
+            more.disabled = true;
+            more.textContent = '... اكتب المزيد من الحروف لتضييق البحث';
+            options.push(more);
+        }
+        select.replaceChildren(...options);
+        select.value = current ? current.value : '';
+    }
+
+    function load(select, query) {
+        const params = new URLSearchParams({q: query});
+        if (select.dataset.nature) params.set('nature', select.dataset.nature);
+        const request = (requests.get(select) || 0) + 1;
+        requests.set(select, request);
+        fetch(`${select.dataset.pickerUrl}?${params}`, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                // Ignore answers overtaken by a later search
+                if (requests.get(select) === request) fill(select, data);
+            });
+    }
+
+    document.addEventListener('input', function (e) {
+        if (!e.target.classList.contains('product-search')) return;
+        const input = e.target;
+        const select = input.closest('.product-picker').querySelector('.product-select');
+        clearTimeout(timers.get(input));
+        timers.set(input, setTimeout(() => load(select, input.value.trim()), SEARCH_DELAY));
+    });
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('.product-picker .product-select').forEach(select => load(select, ''));
+    });
+})();
@@ -4,6 +4,7 @@ Transaction forms
 from django import forms
 from .models import EntryVoucher, ExitVoucher, ReturnVoucher, DisposalVoucher
 from inventory.models import Supplier, Department
+from inventory.reference import get_departments, get_suppliers, set_choices
 
 
 class EntryVoucherForm(forms.ModelForm):
@@ -22,6 +23,7 @@ class EntryVoucherForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if tenant:
             self.fields['supplier'].queryset = Supplier.objects.filter(tenant=tenant, is_active=True)
+            set_choices(self.fields['supplier'], ((supplier.pk, supplier.name) for supplier in get_suppliers(tenant)))
 
 
 class ExitVoucherForm(forms.ModelForm):
@@ -39,6 +41,9 @@ class ExitVoucherForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if tenant:
             self.fields['department'].queryset = Department.objects.filter(tenant=tenant, is_active=True)
+            set_choices(self.fields['department'], (
+                (department.pk, department.name) for department in get_departments(tenant)
+            ))
 
 
 class ReturnVoucherForm(forms.ModelForm):
@@ -57,6 +62,9 @@ class ReturnVoucherForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if tenant:
             self.fields['department'].queryset = Department.objects.filter(tenant=tenant, is_active=True)
+            set_choices(self.fields['department'], (
+                (department.pk, department.name) for department in get_departments(tenant)
+            ))
             self.fields['original_exit_voucher'].queryset = ExitVoucher.objects.filter(tenant=tenant)
 
 
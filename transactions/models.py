@@ -2,10 +2,15 @@
 Transaction models - Entry, Exit, Return, Disposal vouchers
 نماذج المعاملات - وصلات الدخول والخروج والإرجاع والإتلاف
 """
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from decimal import Decimal
 
+from core.tenancy import TenantManager
+
 
 class BaseVoucher(models.Model):
     """النموذج الأساسي للوصلات"""
@@ -43,6 +48,8 @@ class BaseVoucher(models.Model):
     created_at = models.DateTimeField('تاريخ الإنشاء', auto_now_add=True)
     updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
     
+    objects = TenantManager()
+    
     class Meta:
         abstract = True
         ordering = ['-date', '-created_at']
@@ -333,3 +340,70 @@ class DisposalVoucherAsset(models.Model):
     class Meta:
         verbose_name = 'أصل متلف'
         verbose_name_plural = 'الأصول المتلفة'
+
+
+@receiver(post_save, sender=EntryVoucher)
+@receiver(post_delete, sender=EntryVoucher)
+@receiver(post_save, sender=ExitVoucher)
+@receiver(post_delete, sender=ExitVoucher)
+@receiver(post_save, sender=ReturnVoucher)
+@receiver(post_delete, sender=ReturnVoucher)
+@receiver(post_save, sender=DisposalVoucher)
+@receiver(post_delete, sender=DisposalVoucher)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached dashboard, reports and statistics of the
+    tenant whenever a voucher is created, confirmed or deleted.
+    """
+    from core.cache import bump_data_version
+    bump_data_version(instance.tenant_id, using=kwargs.get('using'))
+
+
+def _reserved_line(item):
+    """(product_id, quantity) an exit or disposal line holds while its voucher is a draft"""
+    try:
+        is_draft = item.voucher.status == 'draft'
+    except ObjectDoesNotExist:
+        is_draft = False
+    return (item.product_id, item.quantity) if is_draft else None
+
+
+@receiver(pre_save, sender=ExitVoucherItem)
+@receiver(pre_save, sender=DisposalVoucherItem)
+def remember_reserved_line(sender, instance, **kwargs):
+    """
+    Signal to remember what a changed draft line reserved before the save.
+    """
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).select_related('voucher').first()
+        if previous is not None:
+            instance._reserved_line = _reserved_line(previous)
+
+
+@receiver(post_save, sender=ExitVoucherItem)
+@receiver(post_save, sender=DisposalVoucherItem)
+def reserve_draft_line(sender, instance, **kwargs):
+    """
+    Signal to move the reservation of a draft exit or disposal line to its
+    new product and quantity. The voucher signals above invalidate the
+    cached stock figures.
+    """
+    from inventory.reservations import release, reserve
+    previous = instance.__dict__.pop('_reserved_line', None)
+    if previous:
+        release({previous[0]: previous[1]})
+    current = _reserved_line(instance)
+    if current:
+        reserve({current[0]: current[1]})
+
+
+@receiver(post_delete, sender=ExitVoucherItem)
+@receiver(post_delete, sender=DisposalVoucherItem)
+def release_draft_line(sender, instance, **kwargs):
+    """
+    Signal to release the reservation of a deleted draft line.
+    """
+    from inventory.reservations import release
+    current = _reserved_line(instance)
+    if current:
+        release({current[0]: current[1]})
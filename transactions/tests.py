@@ -1,3 +1,213 @@
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Tenant, User
+from inventory.assets import AssetSelectionError, clean_asset_ids, move_assets
+from inventory.models import Department, InventoryItem, Product, StockMovement, Supplier
+from .models import DisposalVoucher, DisposalVoucherItem, ExitVoucher, ExitVoucherItem
+
+reserved_quantity_migration = import_module('inventory.migrations.0009_product_reserved_quantity')
+
+
+class ReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        cls.department = Department.objects.create(name='المخبر', tenant=cls.tenant)
+        cls.paper = Product.objects.create(name='ورق', code='PAP', nature='consumable', tenant=cls.tenant)
+        cls.ink = Product.objects.create(name='حبر', code='INK', nature='consumable', tenant=cls.tenant)
+        for product in (cls.paper, cls.ink):
+            StockMovement.objects.create(product=product, movement_type='in', quantity=5, tenant=cls.tenant)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertReserved(self, product, reserved, stock=5):
+        product.refresh_from_db()
+        self.assertEqual((product.reserved_quantity, product.stock_quantity), (reserved, stock))
+
+    def draft(self, number='EXT-1'):
+        return ExitVoucher.objects.create(
+            voucher_number=number, date=timezone.now().date(), department=self.department, tenant=self.tenant,
+        )
+
+    def post_exit(self, quantity):
+        return self.client.post(reverse('exit_voucher_create'), {
+            'date': timezone.now().date(), 'department': self.department.pk,
+            'product_id': [self.paper.pk], 'quantity': [quantity],
+        })
+
+    @mock.patch('transactions.views.generate_voucher_number', side_effect=['EXT-1', 'EXT-2'])
+    def test_competing_drafts(self, _number):
+        self.post_exit(3)
+        self.assertReserved(self.paper, 3)
+        response = self.post_exit(3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ExitVoucher.objects.count(), 1)
+        self.assertReserved(self.paper, 3)
+
+    def test_confirmation_releases_reservation(self):
+        self.post_exit(3)
+        voucher = ExitVoucher.objects.get()
+        self.client.post(reverse('exit_voucher_confirm', args=[voucher.pk]))
+        voucher.refresh_from_db()
+        self.assertEqual(voucher.status, 'confirmed')
+        self.assertReserved(self.paper, 0, stock=2)
+
+    def test_editing_a_line_moves_reservation(self):
+        line = ExitVoucherItem.objects.create(voucher=self.draft(), product=self.paper, quantity=2)
+        line.quantity = 4
+        line.save()
+        self.assertReserved(self.paper, 4)
+        line.product = self.ink
+        line.save()
+        self.assertReserved(self.paper, 0)
+        self.assertReserved(self.ink, 4)
+
+    def test_deleting_draft_lines_releases_reservation(self):
+        voucher = self.draft()
+        line = ExitVoucherItem.objects.create(voucher=voucher, product=self.paper, quantity=2)
+        ExitVoucherItem.objects.create(voucher=voucher, product=self.ink, quantity=1)
+        disposal = DisposalVoucher.objects.create(
+            voucher_number='DSP-1', date=timezone.now().date(), disposal_reason='damaged', tenant=self.tenant,
+        )
+        DisposalVoucherItem.objects.create(voucher=disposal, product=self.paper, quantity=1)
+        self.assertReserved(self.paper, 3)
+        line.delete()
+        self.assertReserved(self.paper, 1)
+        voucher.delete()
+        self.assertReserved(self.ink, 0)
+        disposal.delete()
+        self.assertReserved(self.paper, 0)
+
+    def test_migration_reserves_drafts_and_removes_early_issues(self):
+        voucher = self.draft()
+        ExitVoucherItem.objects.create(voucher=voucher, product=self.paper, quantity=2)
+        # Draft exit vouchers used to issue their stock when created
+        StockMovement.objects.create(
+            product=self.paper, movement_type='out', quantity=-2, reference=voucher.voucher_number, tenant=self.tenant,
+        )
+        confirmed = self.draft('EXT-2')
+        ExitVoucherItem.objects.create(voucher=confirmed, product=self.ink, quantity=1)
+        confirmed.status = 'confirmed'
+        confirmed.save()
+        StockMovement.objects.create(
+            product=self.ink, movement_type='out', quantity=-1, reference=confirmed.voucher_number, tenant=self.tenant,
+        )
+        Product.objects.update(reserved_quantity=0)
+
+        reserved_quantity_migration.reserve_draft_lines(apps, SimpleNamespace(connection=connection))
+
+        self.assertReserved(self.paper, 2)
+        self.assertReserved(self.ink, 0, stock=4)
+        self.assertFalse(StockMovement.objects.filter(reference='EXT-1').exists())
+
+
+class AssetSelectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        other = Tenant.objects.create(name='كلية الطب', code='FM')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+        cls.lab = Department.objects.create(name='المخبر', tenant=cls.tenant)
+        cls.library = Department.objects.create(name='المكتبة', tenant=cls.tenant)
+        cls.pc = Product.objects.create(name='حاسوب', code='PC', nature='asset', tenant=cls.tenant)
+        cls.available = InventoryItem.objects.create(product=cls.pc, inventory_number='INV-1', tenant=cls.tenant)
+        cls.assigned = InventoryItem.objects.create(
+            product=cls.pc, inventory_number='INV-2', status='assigned', assigned_to=cls.lab, tenant=cls.tenant,
+        )
+        microscope = Product.objects.create(name='مجهر', code='MIC', nature='asset', tenant=other)
+        cls.foreign = InventoryItem.objects.create(product=microscope, inventory_number='INV-3', tenant=other)
+
+    def assertRejected(self, purpose, ids, quantity, department=None):
+        with self.assertRaises(AssetSelectionError):
+            clean_asset_ids(self.pc, purpose, [str(pk) for pk in ids], quantity, department)
+
+    def test_selectable_assets_pass(self):
+        self.assertEqual(clean_asset_ids(self.pc, 'exit', [str(self.available.pk)], 1), [self.available])
+        self.assertEqual(clean_asset_ids(self.pc, 'return', [str(self.assigned.pk)], 1, self.lab), [self.assigned])
+
+    def test_wrong_status_is_rejected(self):
+        self.assertRejected('exit', [self.assigned.pk], 1)
+        self.assertRejected('return', [self.available.pk], 1, self.lab)
+
+    def test_wrong_department_is_rejected(self):
+        self.assertRejected('return', [self.assigned.pk], 1, self.library)
+
+    def test_duplicated_id_is_rejected(self):
+        self.assertRejected('exit', [self.available.pk, self.available.pk], 2)
+
+    def test_count_must_match_quantity(self):
+        self.assertRejected('exit', [self.available.pk], 2)
+        self.assertRejected('disposal', [self.available.pk, self.assigned.pk], 1)
+
+    def test_other_tenant_asset_is_rejected(self):
+        self.assertRejected('exit', [self.foreign.pk], 1)
+
+    def test_rejected_selection_moves_nothing(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('exit_voucher_create'), {
+            'date': timezone.now().date(), 'department': self.library.pk,
+            'product_id': [self.pc.pk], 'quantity': [1], 'asset_id_0': [self.foreign.pk],
+        })
+        self.assertFalse(ExitVoucher.objects.exists())
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'available')
+
+    def test_move_invalidates_the_tenant_caches(self):
+        with mock.patch('inventory.assets.bump_data_version') as bump:
+            move_assets(self.pc, [self.available], status='assigned', assigned_to=self.library)
+        bump.assert_called_once_with(self.tenant.pk, using='default')
+        self.available.refresh_from_db()
+        self.assertEqual((self.available.status, self.available.assigned_to), ('assigned', self.library))
+        self.pc.refresh_from_db()
+        self.assertEqual(self.pc.stock_quantity, 0)
+
+
+class VoucherFormQueryTests(TestCase):
+    # (url name, queries with a cold cache, queries once the reference data is cached)
+    FORMS = [
+        ('entry_voucher_create', 3, 1),
+        ('exit_voucher_create', 2, 1),
+        ('return_voucher_create', 2, 2),
+        ('disposal_voucher_create', 1, 1),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='كلية العلوم', code='FS')
+        cls.user = User.objects.create_user('clerk', password='pass12345', tenant=cls.tenant, role='staff')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def create_reference_data(self, count):
+        start = Product.objects.count()
+        for i in range(start, start + count):
+            Department.objects.create(name=f'مصلحة {i}', tenant=self.tenant)
+            Supplier.objects.create(name=f'مورد {i}', tenant=self.tenant)
+            Product.objects.create(name=f'مادة {i}', code=f'P-{i}', nature='consumable', tenant=self.tenant)
 
-# Create your tests here.
+    def test_form_query_count_does_not_grow(self):
+        for count in (1, 20):
+            self.create_reference_data(count)
+            cache.clear()
+            for name, cold, warm in self.FORMS:
+                with self.subTest(name=name, count=count):
+                    with self.assertNumQueries(cold):
+                        self.client.get(reverse(name))
+                    with self.assertNumQueries(warm):
+                        self.client.get(reverse(name))
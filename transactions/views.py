@@ -5,10 +5,10 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
 from django.http import JsonResponse
 from django.utils import timezone
-from django.db import transaction
 
 from .models import (
     EntryVoucher, EntryVoucherItem, EntryVoucherAsset,
@@ -17,7 +17,14 @@ from .models import (
     DisposalVoucher, DisposalVoucherItem, DisposalVoucherAsset,
 )
 from .forms import EntryVoucherForm, ExitVoucherForm, ReturnVoucherForm, DisposalVoucherForm
-from inventory.models import Product, InventoryItem, StockMovement, Department, Supplier
+from inventory.assets import AssetSelectionError, clean_asset_ids, move_assets
+from inventory.models import Product, InventoryItem, StockMovement, Supplier
+from inventory.reservations import StockShortageError, check_available, line_quantities, release
+from inventory.reference import get_departments
+from reports.rollup import record_voucher
+from reports.pdf_cache import schedule_voucher_prerender
+from core.events import publish_event, publish_stock_change
+from core.routers import tenant_atomic
 
 
 def generate_unique_inventory_number(tenant, product_code):
@@ -31,13 +38,6 @@ def generate_unique_inventory_number(tenant, product_code):
             return inv_num
 
 
-def get_tenant_queryset(request, model):
-    """Get queryset filtered by tenant"""
-    if request.user.is_super_admin:
-        return model.objects.all()
-    return model.objects.filter(tenant=request.user.tenant)
-
-
 def generate_voucher_number(prefix, tenant):
     """Generate unique voucher number"""
     year = timezone.now().year
@@ -46,8 +46,32 @@ def generate_voucher_number(prefix, tenant):
 
 def update_product_stock(product, quantity_change):
     """Update product stock_quantity by the given amount"""
+    old_quantity = product.stock_quantity
     product.stock_quantity = max(0, product.stock_quantity + quantity_change)
     product.save(update_fields=['stock_quantity'])
+    publish_stock_change(product, old_quantity)
+
+
+def finish_confirmation(voucher_type, voucher, user, database):
+    """
+    Central side of a confirmation - daily rollup, live event, PDF prerender -
+    run once the voucher is committed in its tenant's database
+    """
+    def record():
+        record_voucher(voucher_type, voucher)
+        schedule_voucher_prerender(voucher_type, voucher, user)
+
+    transaction.on_commit(record, using=database)
+    publish_event(voucher.tenant_id, 'voucher_confirmed', using=database, voucher_type=voucher_type, voucher_id=voucher.pk)
+
+
+def requested_quantities(product_ids, quantities):
+    """Total quantity per product of the posted voucher lines"""
+    return line_quantities(
+        (product_id, int(quantities[i]) if quantities[i] else 1)
+        for i, product_id in enumerate(product_ids)
+        if product_id
+    )
 
 
 def get_product_total_quantity(product, items):
@@ -60,7 +84,7 @@ def get_product_total_quantity(product, items):
 @login_required
 def entry_voucher_list(request):
     """قائمة وصلات الدخول"""
-    vouchers = get_tenant_queryset(request, EntryVoucher)
+    vouchers = EntryVoucher.objects.all()
     
     search = request.GET.get('search', '')
     if search:
@@ -91,7 +115,7 @@ def entry_voucher_create(request):
     if request.method == 'POST':
         form = EntryVoucherForm(request.POST, tenant=tenant)
         if form.is_valid():
-            with transaction.atomic():
+            with tenant_atomic(tenant):
                 voucher = form.save(commit=False)
                 voucher.tenant = tenant
                 voucher.created_by = request.user
@@ -167,12 +191,9 @@ def entry_voucher_create(request):
     else:
         form = EntryVoucherForm(tenant=tenant, initial={'date': timezone.now().date()})
     
-    products = Product.objects.filter(tenant=tenant, is_active=True)
-    
     return render(request, 'transactions/entry_voucher_form.html', {
         'form': form,
         'title': 'إنشاء وصل دخول جديد',
-        'products': products,
     })
 
 
@@ -181,10 +202,6 @@ def entry_voucher_detail(request, pk):
     """تفاصيل وصل الدخول"""
     voucher = get_object_or_404(EntryVoucher, pk=pk)
     
-    if not request.user.is_super_admin and voucher.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا الوصل')
-        return redirect('entry_voucher_list')
-    
     items = voucher.items.select_related('product').prefetch_related('assets__inventory_item')
     
     return render(request, 'transactions/entry_voucher_detail.html', {
@@ -202,7 +219,7 @@ def entry_voucher_confirm(request, pk):
         messages.error(request, 'لا يمكن تأكيد هذا الوصل')
         return redirect('entry_voucher_detail', pk=pk)
     
-    with transaction.atomic():
+    with tenant_atomic(voucher.tenant_id) as database:
         # Update stock quantities for all products
         for item in voucher.items.all():
             if item.product.nature == 'consumable':
@@ -214,6 +231,7 @@ def entry_voucher_confirm(request, pk):
         voucher.status = 'confirmed'
         voucher.confirmed_by = request.user
         voucher.save()
+        finish_confirmation('entry', voucher, request.user, database)
     
     messages.success(request, 'تم تأكيد وصل الدخول بنجاح')
     return redirect('entry_voucher_detail', pk=pk)
@@ -224,7 +242,7 @@ def entry_voucher_confirm(request, pk):
 @login_required
 def exit_voucher_list(request):
     """قائمة وصلات الإخراج"""
-    vouchers = get_tenant_queryset(request, ExitVoucher)
+    vouchers = ExitVoucher.objects.all()
     
     search = request.GET.get('search', '')
     if search:
@@ -252,65 +270,54 @@ def exit_voucher_create(request):
     if request.method == 'POST':
         form = ExitVoucherForm(request.POST, tenant=tenant)
         if form.is_valid():
-            with transaction.atomic():
-                voucher = form.save(commit=False)
-                voucher.tenant = tenant
-                voucher.created_by = request.user
-                voucher.voucher_number = generate_voucher_number('EXT', tenant)
-                voucher.save()
-                
-                # Process items
-                items_data = request.POST.getlist('product_id')
-                quantities = request.POST.getlist('quantity')
-                
-                for i, product_id in enumerate(items_data):
-                    if product_id:
-                        product = Product.objects.get(id=product_id)
-                        quantity = int(quantities[i]) if quantities[i] else 1
-                        
-                        item = ExitVoucherItem.objects.create(
-                            voucher=voucher,
-                            product=product,
-                            quantity=quantity
-                        )
-                        
-                        if product.nature == 'consumable':
-                            StockMovement.objects.create(
+            try:
+                with tenant_atomic(tenant):
+                    voucher = form.save(commit=False)
+                    voucher.tenant = tenant
+                    voucher.created_by = request.user
+                    voucher.voucher_number = generate_voucher_number('EXT', tenant)
+                    voucher.save()
+                    
+                    # Process items
+                    items_data = request.POST.getlist('product_id')
+                    quantities = request.POST.getlist('quantity')
+                    
+                    # Consumables are reserved by the draft and issued on confirmation
+                    check_available(requested_quantities(items_data, quantities))
+                    
+                    for i, product_id in enumerate(items_data):
+                        if product_id:
+                            product = Product.objects.get(id=product_id)
+                            quantity = int(quantities[i]) if quantities[i] else 1
+                            
+                            item = ExitVoucherItem.objects.create(
+                                voucher=voucher,
                                 product=product,
-                                movement_type='out',
-                                quantity=-quantity,
-                                reference=voucher.voucher_number,
-                                tenant=tenant,
-                                created_by=request.user
+                                quantity=quantity
                             )
-                        
-                        # Handle assets
-                        if product.nature == 'asset':
-                            asset_ids = request.POST.getlist(f'asset_id_{i}')
-                            for asset_id in asset_ids:
-                                if asset_id:
-                                    inv_item = InventoryItem.objects.get(id=asset_id)
-                                    inv_item.status = 'assigned'
-                                    inv_item.assigned_to = voucher.department
-                                    inv_item.save()
-                                    
-                                    ExitVoucherAsset.objects.create(
-                                        voucher_item=item,
-                                        inventory_item=inv_item
-                                    )
-                
-                messages.success(request, f'تم إنشاء وصل الإخراج رقم {voucher.voucher_number} بنجاح')
-                return redirect('exit_voucher_detail', pk=voucher.pk)
+                            
+                            # Handle assets
+                            if product.nature == 'asset':
+                                assets = clean_asset_ids(
+                                    product, 'exit', request.POST.getlist(f'asset_id_{i}'), quantity
+                                )
+                                move_assets(product, assets, status='assigned', assigned_to=voucher.department)
+                                ExitVoucherAsset.objects.bulk_create(
+                                    ExitVoucherAsset(voucher_item=item, inventory_item=asset) for asset in assets
+                                )
+                    
+                    messages.success(request, f'تم إنشاء وصل الإخراج رقم {voucher.voucher_number} بنجاح')
+                    return redirect('exit_voucher_detail', pk=voucher.pk)
+            except (AssetSelectionError, StockShortageError) as error:
+                messages.error(request, str(error))
     else:
         form = ExitVoucherForm(tenant=tenant, initial={'date': timezone.now().date()})
     
-    products = Product.objects.filter(tenant=tenant, is_active=True)
-    departments = Department.objects.filter(tenant=tenant, is_active=True)
+    departments = get_departments(tenant)
     
     return render(request, 'transactions/exit_voucher_form.html', {
         'form': form,
         'title': 'إنشاء وصل إخراج جديد',
-        'products': products,
         'departments': departments,
     })
 
@@ -320,10 +327,6 @@ def exit_voucher_detail(request, pk):
     """تفاصيل وصل الإخراج"""
     voucher = get_object_or_404(ExitVoucher, pk=pk)
     
-    if not request.user.is_super_admin and voucher.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا الوصل')
-        return redirect('exit_voucher_list')
-    
     items = voucher.items.select_related('product').prefetch_related('assets__inventory_item')
     
     return render(request, 'transactions/exit_voucher_detail.html', {
@@ -341,25 +344,38 @@ def exit_voucher_confirm(request, pk):
         messages.error(request, 'لا يمكن تأكيد هذا الوصل')
         return redirect('exit_voucher_detail', pk=pk)
     
-    with transaction.atomic():
-        # Check sufficient stock for consumables
-        for item in voucher.items.all():
-            if item.product.nature == 'consumable':
-                if item.product.stock_quantity < item.quantity:
-                    messages.error(request, f'لا يوجد مخزون كافٍ للمنتج {item.product.name}')
-                    return redirect('exit_voucher_detail', pk=pk)
+    with tenant_atomic(voucher.tenant_id) as database:
+        items = list(voucher.items.select_related('product'))
+        reserved = line_quantities((item.product_id, item.quantity) for item in items)
+        
+        # Check sufficient stock for consumables (one query on the counters)
+        try:
+            check_available(reserved, held=True)
+        except StockShortageError as error:
+            messages.error(request, str(error))
+            return redirect('exit_voucher_detail', pk=pk)
         
         # Update stock quantities for all products
-        for item in voucher.items.all():
+        for item in items:
             if item.product.nature == 'consumable':
-                update_product_stock(item.product, -item.quantity)
+                # Issued from the stock now (the movement signal recomputes stock_quantity)
+                StockMovement.objects.create(
+                    product=item.product,
+                    movement_type='out',
+                    quantity=-item.quantity,
+                    reference=voucher.voucher_number,
+                    tenant=voucher.tenant,
+                    created_by=request.user
+                )
             elif item.product.nature == 'asset':
                 # Update stock for assets based on item quantity
                 update_product_stock(item.product, -item.quantity)
+        release(reserved)
         
         voucher.status = 'confirmed'
         voucher.confirmed_by = request.user
         voucher.save()
+        finish_confirmation('exit', voucher, request.user, database)
     
     messages.success(request, 'تم تأكيد وصل الإخراج بنجاح')
     return redirect('exit_voucher_detail', pk=pk)
@@ -370,7 +386,7 @@ def exit_voucher_confirm(request, pk):
 @login_required
 def return_voucher_list(request):
     """قائمة وصلات الإرجاع"""
-    vouchers = get_tenant_queryset(request, ReturnVoucher)
+    vouchers = ReturnVoucher.objects.all()
     
     search = request.GET.get('search', '')
     if search:
@@ -397,69 +413,65 @@ def return_voucher_create(request):
     if request.method == 'POST':
         form = ReturnVoucherForm(request.POST, tenant=tenant)
         if form.is_valid():
-            with transaction.atomic():
-                voucher = form.save(commit=False)
-                voucher.tenant = tenant
-                voucher.created_by = request.user
-                voucher.voucher_number = generate_voucher_number('RET', tenant)
-                voucher.save()
-                
-                # Process items
-                items_data = request.POST.getlist('product_id')
-                quantities = request.POST.getlist('quantity')
-                conditions = request.POST.getlist('condition')
-                
-                for i, product_id in enumerate(items_data):
-                    if product_id:
-                        product = Product.objects.get(id=product_id)
-                        quantity = int(quantities[i]) if quantities[i] else 1
-                        condition = conditions[i] if i < len(conditions) else 'good'
-                        
-                        item = ReturnVoucherItem.objects.create(
-                            voucher=voucher,
-                            product=product,
-                            quantity=quantity,
-                            condition=condition
-                        )
-                        
-                        if product.nature == 'consumable':
-                            StockMovement.objects.create(
+            try:
+                with tenant_atomic(tenant):
+                    voucher = form.save(commit=False)
+                    voucher.tenant = tenant
+                    voucher.created_by = request.user
+                    voucher.voucher_number = generate_voucher_number('RET', tenant)
+                    voucher.save()
+                    
+                    # Process items
+                    items_data = request.POST.getlist('product_id')
+                    quantities = request.POST.getlist('quantity')
+                    conditions = request.POST.getlist('condition')
+                    
+                    for i, product_id in enumerate(items_data):
+                        if product_id:
+                            product = Product.objects.get(id=product_id)
+                            quantity = int(quantities[i]) if quantities[i] else 1
+                            condition = conditions[i] if i < len(conditions) else 'good'
+                            
+                            item = ReturnVoucherItem.objects.create(
+                                voucher=voucher,
                                 product=product,
-                                movement_type='return',
                                 quantity=quantity,
-                                reference=voucher.voucher_number,
-                                tenant=tenant,
-                                created_by=request.user
+                                condition=condition
                             )
-                        
-                        # Handle assets
-                        if product.nature == 'asset':
-                            asset_ids = request.POST.getlist(f'asset_id_{i}')
-                            for asset_id in asset_ids:
-                                if asset_id:
-                                    inv_item = InventoryItem.objects.get(id=asset_id)
-                                    inv_item.status = 'available'
-                                    inv_item.assigned_to = None
-                                    inv_item.condition = condition
-                                    inv_item.save()
-                                    
-                                    ReturnVoucherAsset.objects.create(
-                                        voucher_item=item,
-                                        inventory_item=inv_item
-                                    )
-                
-                messages.success(request, f'تم إنشاء وصل الإرجاع رقم {voucher.voucher_number} بنجاح')
-                return redirect('return_voucher_detail', pk=voucher.pk)
+                            
+                            if product.nature == 'consumable':
+                                StockMovement.objects.create(
+                                    product=product,
+                                    movement_type='return',
+                                    quantity=quantity,
+                                    reference=voucher.voucher_number,
+                                    tenant=tenant,
+                                    created_by=request.user
+                                )
+                            
+                            # Handle assets
+                            if product.nature == 'asset':
+                                assets = clean_asset_ids(
+                                    product, 'return', request.POST.getlist(f'asset_id_{i}'), quantity,
+                                    department=voucher.department,
+                                )
+                                move_assets(product, assets, status='available', assigned_to=None, condition=condition)
+                                ReturnVoucherAsset.objects.bulk_create(
+                                    ReturnVoucherAsset(voucher_item=item, inventory_item=asset) for asset in assets
+                                )
+                    
+                    messages.success(request, f'تم إنشاء وصل الإرجاع رقم {voucher.voucher_number} بنجاح')
+                    return redirect('return_voucher_detail', pk=voucher.pk)
+            except AssetSelectionError as error:
+                messages.error(request, str(error))
     else:
         form = ReturnVoucherForm(tenant=tenant, initial={'date': timezone.now().date()})
     
-    products = Product.objects.filter(tenant=tenant, is_active=True)
-    departments = Department.objects.filter(tenant=tenant, is_active=True)
+    departments = get_departments(tenant)
     
     return render(request, 'transactions/return_voucher_form.html', {
         'form': form,
         'title': 'إنشاء وصل إرجاع جديد',
-        'products': products,
         'departments': departments,
     })
 
@@ -469,10 +481,6 @@ def return_voucher_detail(request, pk):
     """تفاصيل وصل الإرجاع"""
     voucher = get_object_or_404(ReturnVoucher, pk=pk)
     
-    if not request.user.is_super_admin and voucher.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا الوصل')
-        return redirect('return_voucher_list')
-    
     items = voucher.items.select_related('product').prefetch_related('assets__inventory_item')
     
     return render(request, 'transactions/return_voucher_detail.html', {
@@ -490,7 +498,7 @@ def return_voucher_confirm(request, pk):
         messages.error(request, 'لا يمكن تأكيد هذا الوصل')
         return redirect('return_voucher_detail', pk=pk)
     
-    with transaction.atomic():
+    with tenant_atomic(voucher.tenant_id) as database:
         # Update stock quantities for all products
         for item in voucher.items.all():
             if item.product.nature == 'consumable':
@@ -502,6 +510,7 @@ def return_voucher_confirm(request, pk):
         voucher.status = 'confirmed'
         voucher.confirmed_by = request.user
         voucher.save()
+        finish_confirmation('return', voucher, request.user, database)
     
     messages.success(request, 'تم تأكيد وصل الإرجاع بنجاح')
     return redirect('return_voucher_detail', pk=pk)
@@ -512,7 +521,7 @@ def return_voucher_confirm(request, pk):
 @login_required
 def disposal_voucher_list(request):
     """قائمة وصلات الإتلاف"""
-    vouchers = get_tenant_queryset(request, DisposalVoucher)
+    vouchers = DisposalVoucher.objects.all()
     
     search = request.GET.get('search', '')
     if search:
@@ -536,57 +545,55 @@ def disposal_voucher_create(request):
     if request.method == 'POST':
         form = DisposalVoucherForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                voucher = form.save(commit=False)
-                voucher.tenant = tenant
-                voucher.created_by = request.user
-                voucher.voucher_number = generate_voucher_number('DIS', tenant)
-                voucher.save()
-                
-                # Process items
-                items_data = request.POST.getlist('product_id')
-                quantities = request.POST.getlist('quantity')
-                damage_descriptions = request.POST.getlist('damage_description')
-                
-                for i, product_id in enumerate(items_data):
-                    if product_id:
-                        product = Product.objects.get(id=product_id)
-                        quantity = int(quantities[i]) if quantities[i] else 1
-                        damage_desc = damage_descriptions[i] if i < len(damage_descriptions) else ''
-                        
-                        item = DisposalVoucherItem.objects.create(
-                            voucher=voucher,
-                            product=product,
-                            quantity=quantity,
-                            damage_description=damage_desc
-                        )
-                        
-                        # Handle assets
-                        if product.nature == 'asset':
-                            asset_ids = request.POST.getlist(f'asset_id_{i}')
-                            for asset_id in asset_ids:
-                                if asset_id:
-                                    inv_item = InventoryItem.objects.get(id=asset_id)
-                                    inv_item.status = 'disposed'
-                                    inv_item.condition = 'damaged'
-                                    inv_item.save()
-                                    
-                                    DisposalVoucherAsset.objects.create(
-                                        voucher_item=item,
-                                        inventory_item=inv_item
-                                    )
-                
-                messages.success(request, f'تم إنشاء وصل الإتلاف رقم {voucher.voucher_number} بنجاح')
-                return redirect('disposal_voucher_detail', pk=voucher.pk)
+            try:
+                with tenant_atomic(tenant):
+                    voucher = form.save(commit=False)
+                    voucher.tenant = tenant
+                    voucher.created_by = request.user
+                    voucher.voucher_number = generate_voucher_number('DIS', tenant)
+                    voucher.save()
+                    
+                    # Process items
+                    items_data = request.POST.getlist('product_id')
+                    quantities = request.POST.getlist('quantity')
+                    damage_descriptions = request.POST.getlist('damage_description')
+                    
+                    # Consumables are reserved by the draft and disposed of on confirmation
+                    check_available(requested_quantities(items_data, quantities))
+                    
+                    for i, product_id in enumerate(items_data):
+                        if product_id:
+                            product = Product.objects.get(id=product_id)
+                            quantity = int(quantities[i]) if quantities[i] else 1
+                            damage_desc = damage_descriptions[i] if i < len(damage_descriptions) else ''
+                            
+                            item = DisposalVoucherItem.objects.create(
+                                voucher=voucher,
+                                product=product,
+                                quantity=quantity,
+                                damage_description=damage_desc
+                            )
+                            
+                            # Handle assets
+                            if product.nature == 'asset':
+                                assets = clean_asset_ids(
+                                    product, 'disposal', request.POST.getlist(f'asset_id_{i}'), quantity
+                                )
+                                move_assets(product, assets, status='disposed', condition='damaged')
+                                DisposalVoucherAsset.objects.bulk_create(
+                                    DisposalVoucherAsset(voucher_item=item, inventory_item=asset) for asset in assets
+                                )
+                    
+                    messages.success(request, f'تم إنشاء وصل الإتلاف رقم {voucher.voucher_number} بنجاح')
+                    return redirect('disposal_voucher_detail', pk=voucher.pk)
+            except (AssetSelectionError, StockShortageError) as error:
+                messages.error(request, str(error))
     else:
         form = DisposalVoucherForm(initial={'date': timezone.now().date()})
     
-    products = Product.objects.filter(tenant=tenant, is_active=True)
-    
     return render(request, 'transactions/disposal_voucher_form.html', {
         'form': form,
         'title': 'إنشاء وصل إتلاف جديد',
-        'products': products,
     })
 
 
@@ -595,10 +602,6 @@ def disposal_voucher_detail(request, pk):
     """تفاصيل وصل الإتلاف"""
     voucher = get_object_or_404(DisposalVoucher, pk=pk)
     
-    if not request.user.is_super_admin and voucher.tenant != request.user.tenant:
-        messages.error(request, 'ليس لديك صلاحية للوصول لهذا الوصل')
-        return redirect('disposal_voucher_list')
-    
     items = voucher.items.select_related('product').prefetch_related('assets__inventory_item')
     
     return render(request, 'transactions/disposal_voucher_detail.html', {
@@ -616,25 +619,39 @@ def disposal_voucher_confirm(request, pk):
         messages.error(request, 'لا يمكن تأكيد هذا الوصل')
         return redirect('disposal_voucher_detail', pk=pk)
     
-    with transaction.atomic():
-        # Check sufficient stock for consumables
-        for item in voucher.items.all():
-            if item.product.nature == 'consumable':
-                if item.product.stock_quantity < item.quantity:
-                    messages.error(request, f'لا يوجد مخزون كافٍ للمنتج {item.product.name}')
-                    return redirect('disposal_voucher_detail', pk=pk)
+    with tenant_atomic(voucher.tenant_id) as database:
+        items = list(voucher.items.select_related('product'))
+        reserved = line_quantities((item.product_id, item.quantity) for item in items)
+        
+        # Check sufficient stock for consumables (one query on the counters)
+        try:
+            check_available(reserved, held=True)
+        except StockShortageError as error:
+            messages.error(request, str(error))
+            return redirect('disposal_voucher_detail', pk=pk)
         
         # Update stock quantities for all products
-        for item in voucher.items.all():
+        for item in items:
             if item.product.nature == 'consumable':
-                update_product_stock(item.product, -item.quantity)
+                # Recorded as a movement so the stock ledger shows the disposal
+                # (the movement signal recomputes stock_quantity)
+                StockMovement.objects.create(
+                    product=item.product,
+                    movement_type='disposal',
+                    quantity=-item.quantity,
+                    reference=voucher.voucher_number,
+                    tenant=voucher.tenant,
+                    created_by=request.user
+                )
             elif item.product.nature == 'asset':
                 # Update stock for disposed assets
                 update_product_stock(item.product, -item.quantity)
+        release(reserved)
         
         voucher.status = 'confirmed'
         voucher.confirmed_by = request.user
         voucher.save()
+        finish_confirmation('disposal', voucher, request.user, database)
     
     messages.success(request, 'تم تأكيد وصل الإتلاف بنجاح')
     return redirect('disposal_voucher_detail', pk=pk)